@@ -1,5 +1,6 @@
 import genai_core.parameters
 import genai_core.kendra
+from datetime import datetime
 from pydantic import BaseModel
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.event_handler.appsync import Router
@@ -35,3 +36,25 @@ def kendra_is_syncing(workspaceId: str):
     result = genai_core.kendra.kendra_is_syncing(workspace_id=workspaceId)
 
     return result
+
+
+@router.resolver(field_name="getKendraDataSyncState")
+@tracer.capture_method
+def kendra_data_sync_state(workspaceId: str):
+    state = genai_core.kendra.get_kendra_data_sync_state(workspace_id=workspaceId)
+
+    return {
+        "status": state["status"],
+        "pendingChanges": state["pending_changes"],
+        "syncRequested": state["sync_requested"],
+        "lastChangeAt": _convert_timestamp(state["last_change_at"]),
+        "lastSyncStartedAt": _convert_timestamp(state["last_sync_started_at"]),
+        "lastSyncChanges": state["last_sync_changes"],
+    }
+
+
+def _convert_timestamp(value):
+    if value is None:
+        return None
+
+    return datetime.utcfromtimestamp(value).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
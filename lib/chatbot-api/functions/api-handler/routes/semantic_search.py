@@ -1,4 +1,5 @@
 import genai_core.semantic_search
+from typing import Optional
 from pydantic import BaseModel
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.event_handler.appsync import Router
@@ -8,9 +9,26 @@ router = Router()
 logger = Logger()
 
 
+class SemanticSearchFilterRequest(BaseModel):
+    documentIds: Optional[list[str]] = None
+    documentTypes: Optional[list[str]] = None
+    documentSubTypes: Optional[list[str]] = None
+    pathPrefix: Optional[str] = None
+
+
 class SemanticSearchRequest(BaseModel):
     workspaceId: str
     query: str
+    filters: Optional[SemanticSearchFilterRequest] = None
+    searchProfile: Optional[str] = None
+    rerankBudgetMs: Optional[int] = None
+    rerankMaxCandidates: Optional[int] = None
+
+
+class FederatedSearchRequest(BaseModel):
+    workspaceIds: list[str]
+    query: str
+    filters: Optional[SemanticSearchFilterRequest] = None
 
 
 @router.resolver(field_name="performSemanticSearch")
@@ -27,12 +45,68 @@ def semantic_search(input: dict):
         query=request.query,
         limit=25,
         full_response=True,
+        filters=_convert_semantic_search_filters(request.filters),
+        search_profile=request.searchProfile,
+        rerank=_convert_rerank_options(request),
     )
     result = _convert_semantic_search_result(request.workspaceId, result)
 
     return result
 
 
+@router.resolver(field_name="performFederatedSearch")
+@tracer.capture_method
+def federated_search(input: dict):
+    request = FederatedSearchRequest(**input)
+    if len(request.query) == 0 or len(request.query) > 1000:
+        raise genai_core.types.CommonError(
+            "Query must be between 1 and 1000 characters"
+        )
+
+    result = genai_core.semantic_search.federated_search(
+        workspace_ids=request.workspaceIds,
+        query=request.query,
+        limit=25,
+        filters=_convert_semantic_search_filters(request.filters),
+    )
+
+    return {
+        "items": [_convert_semantic_search_item(item) for item in result["items"]],
+        "sources": [
+            {
+                "workspaceId": source["workspace_id"],
+                "engine": source["engine"],
+                "status": source["status"],
+                "items": source["items"],
+            }
+            for source in result["sources"]
+        ],
+    }
+
+
+def _convert_semantic_search_filters(filters: Optional[SemanticSearchFilterRequest]):
+    if filters is None:
+        return None
+
+    return {
+        "document_ids": filters.documentIds,
+        "document_types": filters.documentTypes,
+        "document_sub_types": filters.documentSubTypes,
+        "path_prefix": filters.pathPrefix,
+    }
+
+
+def _convert_rerank_options(request: SemanticSearchRequest):
+    if request.rerankBudgetMs is None and request.rerankMaxCandidates is None:
+        return None
+
+    ret_value = {"budget_ms": request.rerankBudgetMs}
+    if request.rerankMaxCandidates is not None:
+        ret_value["max_candidates"] = request.rerankMaxCandidates
+
+    return ret_value
+
+
 def _convert_semantic_search_result(workspace_id: str, result: dict):
     vector_search_items = result.get("vector_search_items")
     keyword_search_items = result.get("keyword_search_items")
@@ -57,13 +131,31 @@ def _convert_semantic_search_result(workspace_id: str, result: dict):
         "detectedLanguages": result.get("detected_languages"),
         "items": items,
         "vectorSearchMetric": result.get("vector_search_metric"),
+        "rerankMode": result.get("rerank_mode"),
         "vectorSearchItems": vector_search_items,
         "keywordSearchItems": keyword_search_items,
+        "searchProfile": _convert_search_profile(
+            result.get("search_profile"), result.get("search_params")
+        ),
     }
 
     return ret_value
 
 
+def _convert_search_profile(name: Optional[str], params: Optional[dict]):
+    if name is None:
+        return None
+
+    return {
+        "name": name,
+        "k": params["k"],
+        "candidates": params["candidates"],
+        "efSearch": params["ef_search"],
+        "efConstruction": params["ef_construction"],
+        "m": params["m"],
+    }
+
+
 def _convert_semantic_search_item(item: dict):
     ret_value = {
         "sources": item["sources"],
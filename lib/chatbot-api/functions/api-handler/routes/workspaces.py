@@ -1,8 +1,12 @@
 import re
 import genai_core.types
 import genai_core.kendra
+import genai_core.opensearch.profiles
+import genai_core.opensearch.utils
+import genai_core.opensearch.vectors
 import genai_core.parameters
 import genai_core.workspaces
+from typing import Optional
 from pydantic import BaseModel
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.event_handler.appsync import Router
@@ -46,6 +50,11 @@ class CreateWorkspaceOpenSearchRequest(BaseModel):
     chunkingStrategy: str
     chunkSize: int
     chunkOverlap: int
+    searchProfile: Optional[str] = None
+    aossEngine: Optional[str] = None
+    metric: Optional[str] = None
+    vectorEncoding: Optional[str] = None
+    rescore: Optional[bool] = None
 
 
 class CreateWorkspaceKendraRequest(BaseModel):
@@ -161,7 +170,7 @@ def _create_workspace_aurora(request: CreateWorkspaceAuroraRequest, config: dict
     if request.metric not in ["inner", "cosine", "l2"]:
         raise genai_core.types.CommonError("Invalid metric")
 
-    if request.chunkingStrategy not in ["recursive"]:
+    if request.chunkingStrategy not in ["recursive", "linear", "linear_tokens"]:
         raise genai_core.types.CommonError("Invalid chunking strategy")
 
     if request.chunkSize < 100 or request.chunkSize > 10000:
@@ -234,7 +243,7 @@ def _create_workspace_open_search(
     if len(request.languages) == 0 or len(request.languages) > 3:
         raise genai_core.types.CommonError("Invalid languages")
 
-    if request.chunkingStrategy not in ["recursive"]:
+    if request.chunkingStrategy not in ["recursive", "linear", "linear_tokens"]:
         raise genai_core.types.CommonError("Invalid chunking strategy")
 
     if request.chunkSize < 100 or request.chunkSize > 10000:
@@ -243,6 +252,27 @@ def _create_workspace_open_search(
     if request.chunkOverlap < 0 or request.chunkOverlap >= request.chunkSize:
         raise genai_core.types.CommonError("Invalid chunk overlap")
 
+    search_profile = (
+        request.searchProfile or genai_core.opensearch.profiles.DEFAULT_SEARCH_PROFILE
+    )
+    if search_profile not in genai_core.opensearch.profiles.SEARCH_PROFILES:
+        raise genai_core.types.CommonError("Invalid search profile")
+
+    # Shared indexes need an engine filtering inside the knn search
+    opensearch_config = config["rag"]["engines"].get("opensearch", {})
+    default_engine = genai_core.opensearch.vectors.DEFAULT_ENGINE
+    if opensearch_config.get("storageLayout") == "shared":
+        default_engine = genai_core.opensearch.utils.SHARED_LAYOUT_ENGINES[0]
+
+    aoss_engine = request.aossEngine or default_engine
+    metric = request.metric or genai_core.opensearch.vectors.DEFAULT_METRIC
+    vector_encoding = (
+        request.vectorEncoding or genai_core.opensearch.vectors.DEFAULT_VECTOR_ENCODING
+    )
+    genai_core.opensearch.vectors.validate_vector_options(
+        aoss_engine, metric, vector_encoding
+    )
+
     return _convert_workspace(
         genai_core.workspaces.create_workspace_open_search(
             workspace_name=workspace_name,
@@ -256,6 +286,11 @@ def _create_workspace_open_search(
             chunking_strategy=request.chunkingStrategy,
             chunk_size=request.chunkSize,
             chunk_overlap=request.chunkOverlap,
+            search_profile=search_profile,
+            aoss_engine=aoss_engine,
+            metric=metric,
+            vector_encoding=vector_encoding,
+            rescore=request.rescore if request.rescore is not None else True,
         )
     )
 
@@ -314,6 +349,8 @@ def _convert_workspace(workspace: dict):
         "vectors": workspace.get("vectors", 0),
         "documents": workspace.get("documents", 0),
         "aossEngine": workspace.get("aoss_engine"),
+        "searchProfile": workspace.get("search_profile"),
+        "vectorEncoding": workspace.get("vector_encoding"),
         "hasIndex": workspace.get("has_index"),
         "formatVersion": workspace.get("format_version"),
         "sizeInBytes": workspace.get("size_in_bytes"),
@@ -16,6 +16,10 @@ from genai_core.types import ChatbotMode
 
 logger = Logger()
 COMPANY_PARAMETER_NAME = os.environ["COMPANY_PARAMETER_NAME"]
+# Chat answers interactively and reranks what fits in a tight budget,
+# RFP workbooks run offline and rerank every candidate.
+CHAT_RERANK = {"budget_ms": 300}
+RFP_RERANK = {"budget_ms": None}
 
 class Mode(Enum):
     CHAIN = "chain"
@@ -109,7 +113,7 @@ class ModelAdapter:
             if self.session_type == "chat": 
                 conversation = ConversationalRetrievalChain.from_llm(
                     self.llm,
-                    WorkspaceRetriever(workspace_id=workspace_id),
+                    WorkspaceRetriever(workspace_id=workspace_id, rerank=CHAT_RERANK),
                     condense_question_llm=self.get_llm({"streaming": False}),
                     condense_question_prompt=self.get_condense_question_prompt(),
                     combine_docs_chain_kwargs={"prompt": self.get_qa_prompt({"CompanyName":companyName})},
@@ -154,7 +158,9 @@ class ModelAdapter:
                 qa = RetrievalQA.from_chain_type(
                         llm=self.llm,
                         chain_type="stuff",
-                        retriever=WorkspaceRetriever(workspace_id=workspace_id),
+                        retriever=WorkspaceRetriever(
+                            workspace_id=workspace_id, rerank=RFP_RERANK
+                        ),
                         return_source_documents=True,
                         chain_type_kwargs={"prompt": self.get_qa_prompt({"CompanyName":companyName})},
                         callbacks=[self.callback_handler]
@@ -15,6 +15,7 @@ def lambda_handler(event, context: LambdaContext):
     if not workspace:
         raise Exception(f"Workspace {workspace_id} does not exist")
 
-    genai_core.aurora.create.create_workspace_table(workspace)
+    tsvector_languages = genai_core.aurora.create.create_workspace_table(workspace)
+    genai_core.workspaces.set_tsvector_languages(workspace_id, tsvector_languages)
 
     return {"ok": True}
@@ -54,14 +54,27 @@ export class FileImportWorkflow extends Construct {
         ),
       },
       updateExpression: "set #status=:statusValue",
+      // A newer upload of the file owns the status once it was submitted
+      conditionExpression:
+        "attribute_not_exists(fingerprint) OR fingerprint = :fingerprintValue",
       expressionAttributeNames: {
         "#status": "status",
       },
       expressionAttributeValues: {
         ":statusValue": tasks.DynamoAttributeValue.fromString("processed"),
+        ":fingerprintValue": tasks.DynamoAttributeValue.fromString(
+          sfn.JsonPath.stringAt("$.fingerprint")
+        ),
       },
       resultPath: sfn.JsonPath.DISCARD,
-    }).next(new sfn.Succeed(this, "Success"));
+    });
+
+    const success = new sfn.Succeed(this, "Success");
+    setProcessed.addCatch(success, {
+      errors: ["DynamoDB.ConditionalCheckFailedException"],
+      resultPath: sfn.JsonPath.DISCARD,
+    });
+    setProcessed.next(success);
 
     const fileImportJob = new sfn.CustomState(this, "FileImportJob", {
       stateJson: {
@@ -99,6 +112,10 @@ export class FileImportWorkflow extends Construct {
                 Name: "PROCESSING_OBJECT_KEY",
                 "Value.$": "$.processing_object_key",
               },
+              {
+                Name: "FINGERPRINT",
+                "Value.$": "$.fingerprint",
+              },
             ],
           },
         },
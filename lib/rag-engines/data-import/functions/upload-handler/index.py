@@ -4,6 +4,8 @@ import boto3
 import urllib.parse
 import genai_core.documents
 import genai_core.workspaces
+import genai_core.kendra.ingestion
+import genai_core.kendra.data_sync
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.data_classes import SQSEvent, event_source
 from aws_lambda_powertools.utilities.typing import LambdaContext
@@ -25,21 +27,32 @@ DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME = os.environ.get(
 @logger.inject_lambda_context(log_event=True)
 @event_source(data_class=SQSEvent)
 def lambda_handler(event: SQSEvent, context: LambdaContext):
-    for sqs_record in event.records:
-        records = get_records_from_sqs_record(sqs_record)
+    # Documents pushed straight to Kendra, batched per workspace
+    kendra_documents = {}
+    try:
+        for sqs_record in event.records:
+            records = get_records_from_sqs_record(sqs_record)
 
-        for record in records:
-            process_record(record)
+            for record in records:
+                process_record(record, kendra_documents)
+    finally:
+        # Also when a later record fails, a redelivery would otherwise skip
+        # the buffered documents as unchanged
+        put_all_kendra_documents(kendra_documents)
 
 
-def process_record(record):
+def process_record(record, kendra_documents: dict):
     bucket_name = record["s3"]["bucket"]["name"]
     object_key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
     object_size = record["s3"]["object"]["size"]
+    fingerprint = genai_core.documents.get_file_fingerprint(
+        record["s3"]["object"].get("eTag"), object_size
+    )
 
     logger.debug(f"bucket_name: {bucket_name}")
     logger.debug(f"object_key: {object_key}")
     logger.debug(f"object_size: {object_size}")
+    logger.debug(f"fingerprint: {fingerprint}")
 
     key_split = object_key.split("/")
     workspace_id = key_split[0]
@@ -57,42 +70,76 @@ def process_record(record):
         document_type="file",
         path=file_name,
         size_in_bytes=object_size,
+        fingerprint=fingerprint,
     )
 
     document_id = result["document_id"]
-    if workspace["engine"] == "kendra":
-        kendra_object_key = f"documents/{object_key}"
-        kendra_metadata_key = f"metadata/documents/{object_key}.metadata.json"
-
-        metadata = {
-            "DocumentId": document_id,
-            "Attributes": {
-                "workspace_id": workspace_id,
-                "document_type": "file",
-            },
-        }
-
-        title = workspace.get("title")
-        if title:
-            metadata["Title"] = title
-
-        s3.copy_object(
-            CopySource={"Bucket": bucket_name, "Key": object_key},
-            Bucket=DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME,
-            Key=kendra_object_key,
-        )
+    if result.get("unchanged"):
+        logger.info(f"Skipping unchanged file {object_key}")
+        return
 
-        s3.put_object(
-            Body=json.dumps(metadata),
-            Bucket=DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME,
-            Key=kendra_metadata_key,
-            ContentType="application/json",
+    try:
+        import_document(
+            workspace,
+            document_id,
+            bucket_name,
+            object_key,
+            file_name,
+            object_size,
+            fingerprint,
+            kendra_documents,
         )
+    except Exception as error:
+        # Lets a redelivery or a new upload of the same content import it
+        genai_core.documents.set_status(workspace_id, document_id, "error")
+        raise error
 
-        genai_core.documents.set_status(
-            workspace_id=workspace_id, document_id=document_id, status="processed"
-        )
+
+def import_document(
+    workspace: dict,
+    document_id: str,
+    bucket_name: str,
+    object_key: str,
+    file_name: str,
+    object_size: int,
+    fingerprint: str,
+    kendra_documents: dict,
+):
+    workspace_id = workspace["workspace_id"]
+    if workspace["engine"] == "kendra":
+        if genai_core.kendra.ingestion.is_direct_ingestion(
+            workspace
+        ) and genai_core.kendra.ingestion.can_put_document_kendra(
+            file_name, object_size
+        ):
+            response = s3.get_object(Bucket=bucket_name, Key=object_key)
+            workspace_documents = kendra_documents.setdefault(
+                workspace_id, {"workspace": workspace, "documents": []}
+            )
+            workspace_documents["documents"].append(
+                {
+                    "document_id": document_id,
+                    "document_type": "file",
+                    "path": file_name,
+                    "content": response["Body"].read(),
+                }
+            )
+
+            if (
+                len(workspace_documents["documents"])
+                >= genai_core.kendra.ingestion.BATCH_MAX_DOCUMENTS
+            ):
+                put_kendra_documents(kendra_documents, workspace_id)
+        else:
+            add_kendra_data_source_document(
+                workspace, bucket_name, object_key, document_id
+            )
+    elif genai_core.documents.can_import_inline(file_name, object_size):
+        import_file_inline(workspace, document_id, bucket_name, object_key)
     else:
+        genai_core.documents.record_document_import(
+            genai_core.documents.IMPORT_PATH_WORKFLOW, object_size
+        )
         processing_object_key = f"{workspace_id}/{document_id}/content.txt"
         response = sfn_client.start_execution(
             stateMachineArn=FILE_IMPORT_WORKFLOW_ARN,
@@ -104,6 +151,7 @@ def process_record(record):
                     "input_object_key": object_key,
                     "processing_bucket_name": PROCESSING_BUCKET_NAME,
                     "processing_object_key": processing_object_key,
+                    "fingerprint": fingerprint or "",
                 }
             ),
         )
@@ -111,6 +159,103 @@ def process_record(record):
         logger.info(response)
 
 
+def import_file_inline(
+    workspace: dict, document_id: str, bucket_name: str, object_key: str
+):
+    workspace_id = workspace["workspace_id"]
+    document = genai_core.documents.get_document(workspace_id, document_id)
+    response = s3.get_object(Bucket=bucket_name, Key=object_key)
+    data = response["Body"].read()
+    content = data.decode("utf-8", errors="replace")
+
+    # Kept next to the chunks like the import job does
+    s3.put_object(
+        Body=content.encode("utf-8"),
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=f"{workspace_id}/{document_id}/content.txt",
+        ContentType="text/plain",
+    )
+
+    genai_core.documents.import_document_inline(workspace, document, content, len(data))
+
+
+def put_all_kendra_documents(kendra_documents: dict):
+    errors = []
+    for workspace_id in list(kendra_documents.keys()):
+        try:
+            put_kendra_documents(kendra_documents, workspace_id)
+        except Exception as error:
+            logger.exception(f"Failed to put Kendra documents of {workspace_id}")
+            errors.append(error)
+
+    if errors:
+        raise errors[0]
+
+
+def put_kendra_documents(kendra_documents: dict, workspace_id: str):
+    workspace_documents = kendra_documents.pop(workspace_id)
+    documents = workspace_documents["documents"]
+    try:
+        failed = genai_core.kendra.ingestion.put_documents_kendra(
+            workspace_documents["workspace"], documents
+        )
+    except Exception as error:
+        for document in documents:
+            genai_core.documents.set_status(
+                workspace_id=workspace_id,
+                document_id=document["document_id"],
+                status="error",
+            )
+
+        raise error
+
+    for document in documents:
+        status = "error" if document["document_id"] in failed else "processed"
+        genai_core.documents.set_status(
+            workspace_id=workspace_id,
+            document_id=document["document_id"],
+            status=status,
+        )
+
+
+def add_kendra_data_source_document(
+    workspace: dict, bucket_name: str, object_key: str, document_id: str
+):
+    workspace_id = workspace["workspace_id"]
+    kendra_object_key = f"documents/{object_key}"
+    kendra_metadata_key = f"metadata/documents/{object_key}.metadata.json"
+
+    metadata = {
+        "DocumentId": document_id,
+        "Attributes": {
+            "workspace_id": workspace_id,
+            "document_type": "file",
+        },
+    }
+
+    title = workspace.get("title")
+    if title:
+        metadata["Title"] = title
+
+    s3.copy_object(
+        CopySource={"Bucket": bucket_name, "Key": object_key},
+        Bucket=DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME,
+        Key=kendra_object_key,
+    )
+
+    s3.put_object(
+        Body=json.dumps(metadata),
+        Bucket=DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME,
+        Key=kendra_metadata_key,
+        ContentType="application/json",
+    )
+
+    genai_core.kendra.data_sync.record_kendra_changes(workspace)
+    genai_core.documents.set_status(
+        workspace_id=workspace_id, document_id=document_id, status="processed"
+    )
+
+
 def get_records_from_sqs_record(record):
     logger.debug(f"Getting records from SQS record: {record}")
 
@@ -200,6 +200,9 @@ export class DataImport extends Construct {
         ...props.shared.defaultEnvironmentVariables,
         CONFIG_PARAMETER_NAME: props.shared.configParameter.parameterName,
         API_KEYS_SECRETS_ARN: props.shared.apiKeysSecret.secretArn,
+        AURORA_DB_SECRET_ID: props.auroraDatabase?.secret?.secretArn ?? "",
+        OPEN_SEARCH_COLLECTION_ENDPOINT:
+          props.openSearchVector?.openSearchCollectionEndpoint ?? "",
         PROCESSING_BUCKET_NAME: processingBucket.bucketName,
         UPLOAD_BUCKET_NAME: uploadBucket.bucketName,
         WORKSPACES_TABLE_NAME: props.workspacesTable?.tableName ?? "",
@@ -212,6 +215,10 @@ export class DataImport extends Construct {
           props.sageMakerRagModels?.model.endpoint.attrEndpointName ?? "",
         FILE_IMPORT_WORKFLOW_ARN:
           fileImportWorkflow?.stateMachine.stateMachineArn ?? "",
+        DEFAULT_KENDRA_INDEX_ID:
+          props.kendraRetrieval?.kendraIndex?.attrId ?? "",
+        DEFAULT_KENDRA_S3_DATA_SOURCE_ID:
+          props.kendraRetrieval?.kendraS3DataSource?.attrId ?? "",
         DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME:
           props.kendraRetrieval?.kendraS3DataSourceBucket?.bucketName ?? "",
       },
@@ -227,9 +234,67 @@ export class DataImport extends Construct {
       uploadHandler
     );
 
+    if (props.kendraRetrieval?.kendraIndex) {
+      uploadHandler.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: [
+            "kendra:BatchPutDocument",
+            "kendra:StartDataSourceSyncJob",
+            "kendra:ListDataSourceSyncJobs",
+          ],
+          resources: [
+            props.kendraRetrieval.kendraIndex.attrArn,
+            `${props.kendraRetrieval.kendraIndex.attrArn}/*`,
+          ],
+        })
+      );
+    }
+
     ingestionQueue.grantConsumeMessages(uploadHandler);
     fileImportWorkflow.stateMachine.grantStartExecution(uploadHandler);
 
+    // Small text files are embedded and stored by the upload handler itself
+    if (props.auroraDatabase) {
+      props.auroraDatabase.secret?.grantRead(uploadHandler);
+      props.auroraDatabase.connections.allowDefaultPortFrom(uploadHandler);
+    }
+
+    if (props.openSearchVector) {
+      uploadHandler.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ["aoss:APIAccessAll"],
+          resources: [props.openSearchVector.openSearchCollection.attrArn],
+        })
+      );
+
+      props.openSearchVector.addToAccessPolicy(
+        "upload-handler",
+        [uploadHandler.role?.roleArn],
+        ["aoss:DescribeIndex", "aoss:ReadDocument", "aoss:WriteDocument"]
+      );
+    }
+
+    if (props.sageMakerRagModels) {
+      uploadHandler.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ["sagemaker:InvokeEndpoint"],
+          resources: [props.sageMakerRagModels.model.endpoint.ref],
+        })
+      );
+    }
+
+    if (props.config.bedrock?.enabled) {
+      uploadHandler.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: [
+            "bedrock:InvokeModel",
+            "bedrock:InvokeModelWithResponseStream",
+          ],
+          resources: ["arn:aws:bedrock:*"],
+        })
+      );
+    }
+
     if (props.config.bedrock?.roleArn) {
       uploadHandler.addToRolePolicy(
         new iam.PolicyStatement({
@@ -0,0 +1,13 @@
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+import genai_core.kendra
+
+logger = Logger()
+tracer = Tracer()
+
+
+@tracer.capture_lambda_handler()
+@logger.inject_lambda_context(log_event=True)
+def lambda_handler(event, context: LambdaContext):
+    logger.debug("Starting scheduled Kendra data sync check")
+    genai_core.kendra.schedule_kendra_data_syncs()
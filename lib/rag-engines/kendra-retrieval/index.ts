@@ -9,6 +9,11 @@ import * as sfn from "aws-cdk-lib/aws-stepfunctions";
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as iam from "aws-cdk-lib/aws-iam";
 import * as kendra from "aws-cdk-lib/aws-kendra";
+import * as lambda from "aws-cdk-lib/aws-lambda";
+import * as logs from "aws-cdk-lib/aws-logs";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as path from "path";
 
 export interface KendraRetrievalProps {
   readonly config: SystemConfig;
@@ -122,6 +127,54 @@ export class KendraRetrieval extends Construct {
         })
       );
 
+      const syncSchedulerFunction = new lambda.Function(
+        this,
+        "SyncSchedulerFunction",
+        {
+          code: props.shared.sharedCode.bundleWithLambdaAsset(
+            path.join(__dirname, "./functions/sync-scheduler")
+          ),
+          description:
+            "Starts a Kendra data source sync once pending changes are due",
+          architecture: props.shared.lambdaArchitecture,
+          runtime: props.shared.pythonRuntime,
+          tracing: lambda.Tracing.ACTIVE,
+          handler: "index.lambda_handler",
+          layers: [props.shared.powerToolsLayer, props.shared.commonLayer],
+          timeout: cdk.Duration.minutes(1),
+          logRetention: logs.RetentionDays.ONE_WEEK,
+          environment: {
+            ...props.shared.defaultEnvironmentVariables,
+            CONFIG_PARAMETER_NAME: props.shared.configParameter.parameterName,
+            WORKSPACES_TABLE_NAME:
+              props.ragDynamoDBTables.workspacesTable.tableName,
+            WORKSPACES_BY_OBJECT_TYPE_INDEX_NAME:
+              props.ragDynamoDBTables.workspacesByObjectTypeIndexName,
+            DEFAULT_KENDRA_INDEX_ID: kendraIndex.attrId,
+            DEFAULT_KENDRA_S3_DATA_SOURCE_ID: s3DataSource.attrId,
+          },
+        }
+      );
+
+      props.shared.configParameter.grantRead(syncSchedulerFunction);
+      props.ragDynamoDBTables.workspacesTable.grantReadWriteData(
+        syncSchedulerFunction
+      );
+      syncSchedulerFunction.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: [
+            "kendra:StartDataSourceSyncJob",
+            "kendra:ListDataSourceSyncJobs",
+          ],
+          resources: [kendraIndex.attrArn, `${kendraIndex.attrArn}/*`],
+        })
+      );
+
+      new events.Rule(this, "SyncSchedulerSchedule", {
+        schedule: events.Schedule.rate(cdk.Duration.minutes(1)),
+        targets: [new targets.LambdaFunction(syncSchedulerFunction)],
+      });
+
       this.kendraIndex = kendraIndex;
       this.kendraS3DataSource = s3DataSource;
       this.kendraS3DataSourceBucket = dataBucket;
@@ -61,6 +61,8 @@ export class DeleteWorkspace extends Construct {
             props.ragDynamoDBTables?.documentsByCompoundKeyIndexName ?? "",
           DOCUMENTS_BY_STATUS_INDEX:
             props.ragDynamoDBTables.documentsByStatusIndexName ?? "",
+          DEFAULT_KENDRA_INDEX_ID:
+            props.kendraRetrieval?.kendraIndex?.attrId ?? "",
           DEFAULT_KENDRA_S3_DATA_SOURCE_BUCKET_NAME:
             props.kendraRetrieval?.kendraS3DataSourceBucket?.bucketName ?? "",
           OPEN_SEARCH_COLLECTION_ENDPOINT:
@@ -105,6 +107,15 @@ export class DeleteWorkspace extends Construct {
     props.kendraRetrieval?.kendraS3DataSourceBucket?.grantReadWrite(
       deleteFunction
     );
+
+    if (props.kendraRetrieval?.kendraIndex) {
+      deleteFunction.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ["kendra:BatchDeleteDocument"],
+          resources: [props.kendraRetrieval.kendraIndex.attrArn],
+        })
+      );
+    }
     props.ragDynamoDBTables.workspacesTable.grantReadWriteData(deleteFunction);
     props.ragDynamoDBTables.documentsTable.grantReadWriteData(deleteFunction);
 
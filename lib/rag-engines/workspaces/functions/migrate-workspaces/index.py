@@ -0,0 +1,81 @@
+import genai_core.types
+import genai_core.workspaces
+import genai_core.aurora.migrate
+import genai_core.opensearch.migrate
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+logger = Logger()
+
+# Stored tsvector columns, filter indexes and versioned chunks, in place
+MIGRATION_AURORA_COLUMNS = "aurora-columns"
+# Table per workspace to the shared partitioned table
+MIGRATION_AURORA_PARTITIONED = "aurora-partitioned"
+# Index per workspace to the shared index
+MIGRATION_OPENSEARCH_SHARED = "opensearch-shared"
+# Retrains the ivfflat vector indexes on the loaded chunks
+MIGRATION_AURORA_REINDEX = "aurora-reindex"
+
+
+@logger.inject_lambda_context(log_event=True)
+def lambda_handler(event, context: LambdaContext):
+    """
+    Moves existing workspaces to the current storage layouts. The event
+    names the migration and optionally the workspaces to migrate, all the
+    ready workspaces of the engine otherwise:
+
+        {"migration": "aurora-partitioned", "workspace_ids": ["..."]}
+    """
+    migration = event.get("migration")
+    workspace_ids = event.get("workspace_ids")
+
+    if migration == MIGRATION_AURORA_COLUMNS:
+        engine = "aurora"
+        migrate = genai_core.aurora.migrate.migrate_workspace
+    elif migration == MIGRATION_AURORA_PARTITIONED:
+        engine = "aurora"
+        migrate = genai_core.aurora.migrate.migrate_workspace_to_partitioned
+    elif migration == MIGRATION_AURORA_REINDEX:
+        engine = "aurora"
+        migrate = genai_core.aurora.migrate.reindex_workspace_vectors
+    elif migration == MIGRATION_OPENSEARCH_SHARED:
+        engine = "opensearch"
+        migrate = genai_core.opensearch.migrate.migrate_workspace_to_shared
+    else:
+        raise genai_core.types.CommonError(f"Unknown migration {migration}")
+
+    migrated = []
+    skipped = []
+    for workspace in get_workspaces(engine, workspace_ids):
+        workspace_id = workspace["workspace_id"]
+        logger.info(f"Running {migration} on workspace {workspace_id}")
+
+        if migrate(workspace):
+            migrated.append(workspace_id)
+        else:
+            skipped.append(workspace_id)
+
+    logger.info(f"Migrated {len(migrated)} workspaces, skipped {len(skipped)}")
+
+    return {"migration": migration, "migrated": migrated, "skipped": skipped}
+
+
+def get_workspaces(engine: str, workspace_ids):
+    if workspace_ids is None:
+        workspaces = genai_core.workspaces.list_workspaces()
+    else:
+        workspaces = []
+        for workspace_id in workspace_ids:
+            workspace = genai_core.workspaces.get_workspace(workspace_id)
+            if workspace is None:
+                raise genai_core.types.CommonError(
+                    f"Workspace {workspace_id} not found"
+                )
+
+            workspaces.append(workspace)
+
+    return [
+        workspace
+        for workspace in workspaces
+        if workspace["engine"] == engine and workspace.get("status") == "ready"
+    ]
@@ -1,3 +1,4 @@
+import * as lambda from "aws-cdk-lib/aws-lambda";
 import * as sfn from "aws-cdk-lib/aws-stepfunctions";
 import { Construct } from "constructs";
 import { Shared } from "../../shared";
@@ -8,6 +9,7 @@ import { KendraRetrieval } from "../kendra-retrieval";
 import { OpenSearchVector } from "../opensearch-vector";
 import { RagDynamoDBTables } from "../rag-dynamodb-tables";
 import { DeleteWorkspace } from "./delete-workspace";
+import { MigrateWorkspaces } from "./migrate-workspaces";
 
 export interface WorkkspacesProps {
   readonly config: SystemConfig;
@@ -21,6 +23,7 @@ export interface WorkkspacesProps {
 
 export class Workspaces extends Construct {
   public readonly deleteWorkspaceWorkflow?: sfn.StateMachine;
+  public readonly migrateWorkspacesFunction: lambda.Function;
 
   constructor(scope: Construct, id: string, props: WorkkspacesProps) {
     super(scope, id);
@@ -36,5 +39,15 @@ export class Workspaces extends Construct {
     });
 
     this.deleteWorkspaceWorkflow = workflow.stateMachine;
+
+    const migrateWorkspaces = new MigrateWorkspaces(this, "MigrateWorkspaces", {
+      config: props.config,
+      shared: props.shared,
+      ragDynamoDBTables: props.ragDynamoDBTables,
+      auroraPgVector: props.auroraPgVector,
+      openSearchVector: props.openSearchVector,
+    });
+
+    this.migrateWorkspacesFunction = migrateWorkspaces.migrateFunction;
   }
 }
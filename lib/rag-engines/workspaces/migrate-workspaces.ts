@@ -0,0 +1,102 @@
+import * as cdk from "aws-cdk-lib";
+import * as iam from "aws-cdk-lib/aws-iam";
+import * as lambda from "aws-cdk-lib/aws-lambda";
+import * as logs from "aws-cdk-lib/aws-logs";
+import { Construct } from "constructs";
+import * as path from "path";
+import { Shared } from "../../shared";
+import { SystemConfig } from "../../shared/types";
+import { AuroraPgVector } from "../aurora-pgvector";
+import { OpenSearchVector } from "../opensearch-vector";
+import { RagDynamoDBTables } from "../rag-dynamodb-tables";
+
+export interface MigrateWorkspacesProps {
+  readonly config: SystemConfig;
+  readonly shared: Shared;
+  readonly ragDynamoDBTables: RagDynamoDBTables;
+  readonly auroraPgVector?: AuroraPgVector;
+  readonly openSearchVector?: OpenSearchVector;
+}
+
+export class MigrateWorkspaces extends Construct {
+  public readonly migrateFunction: lambda.Function;
+
+  constructor(scope: Construct, id: string, props: MigrateWorkspacesProps) {
+    super(scope, id);
+
+    // Invoked by hand to move existing workspaces to the current storage
+    // layouts, see "Migrate existing workspaces" in the README
+    const migrateFunction = new lambda.Function(
+      this,
+      "MigrateWorkspacesFunction",
+      {
+        vpc: props.shared.vpc,
+        code: props.shared.sharedCode.bundleWithLambdaAsset(
+          path.join(__dirname, "./functions/migrate-workspaces")
+        ),
+        runtime: props.shared.pythonRuntime,
+        architecture: props.shared.lambdaArchitecture,
+        handler: "index.lambda_handler",
+        layers: [props.shared.powerToolsLayer, props.shared.commonLayer],
+        timeout: cdk.Duration.minutes(15),
+        memorySize: 1024,
+        logRetention: logs.RetentionDays.ONE_WEEK,
+        environment: {
+          ...props.shared.defaultEnvironmentVariables,
+          CONFIG_PARAMETER_NAME: props.shared.configParameter.parameterName,
+          AURORA_DB_SECRET_ID: props.auroraPgVector?.database.secret
+            ?.secretArn as string,
+          WORKSPACES_TABLE_NAME:
+            props.ragDynamoDBTables.workspacesTable.tableName,
+          WORKSPACES_BY_OBJECT_TYPE_INDEX_NAME:
+            props.ragDynamoDBTables.workspacesByObjectTypeIndexName,
+          OPEN_SEARCH_COLLECTION_ENDPOINT:
+            props.openSearchVector?.openSearchCollectionEndpoint ?? "",
+        },
+      }
+    );
+
+    props.shared.configParameter.grantRead(migrateFunction);
+    props.ragDynamoDBTables.workspacesTable.grantReadWriteData(migrateFunction);
+
+    if (props.auroraPgVector) {
+      props.auroraPgVector.database.secret?.grantRead(migrateFunction);
+      props.auroraPgVector.database.connections.allowDefaultPortFrom(
+        migrateFunction
+      );
+    }
+
+    if (props.openSearchVector) {
+      migrateFunction.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: [
+            "aoss:APIAccessAll",
+            "aoss:DescribeIndex",
+            "aoss:CreateIndex",
+            "aoss:DeleteIndex",
+          ],
+          resources: [props.openSearchVector.openSearchCollection.attrArn],
+        })
+      );
+
+      props.openSearchVector.addToAccessPolicy(
+        "migrate-workspaces",
+        [migrateFunction.role?.roleArn],
+        [
+          "aoss:CreateIndex",
+          "aoss:DeleteIndex",
+          "aoss:UpdateIndex",
+          "aoss:DescribeIndex",
+          "aoss:ReadDocument",
+          "aoss:WriteDocument",
+        ]
+      );
+    }
+
+    new cdk.CfnOutput(this, "MigrateWorkspacesFunctionName", {
+      value: migrateFunction.functionName,
+    });
+
+    this.migrateFunction = migrateFunction;
+  }
+}
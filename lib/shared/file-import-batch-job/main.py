@@ -1,10 +1,13 @@
 import os
+import codecs
+import tempfile
 import boto3
 import genai_core.types
 import genai_core.chunks
 import genai_core.documents
 import genai_core.workspaces
 import genai_core.aurora.create
+from pypdf import PdfReader
 from langchain.document_loaders import S3FileLoader
 
 WORKSPACE_ID = os.environ.get("WORKSPACE_ID")
@@ -13,6 +16,12 @@ INPUT_BUCKET_NAME = os.environ.get("INPUT_BUCKET_NAME")
 INPUT_OBJECT_KEY = os.environ.get("INPUT_OBJECT_KEY")
 PROCESSING_BUCKET_NAME = os.environ.get("PROCESSING_BUCKET_NAME")
 PROCESSING_OBJECT_KEY = os.environ.get("PROCESSING_OBJECT_KEY")
+FINGERPRINT = os.environ.get("FINGERPRINT")
+
+# The document text flows through the pipeline in windows of about this many
+# characters, and is copied to the processing bucket in parts of this size.
+CONTENT_WINDOW_SIZE = 64 * 1024
+CONTENT_PART_SIZE = 8 * 1024 * 1024
 
 s3_client = boto3.client("s3")
 
@@ -25,6 +34,7 @@ def main():
     print("Input object key: {}".format(INPUT_OBJECT_KEY))
     print("Output bucket name: {}".format(PROCESSING_BUCKET_NAME))
     print("Output object key: {}".format(PROCESSING_OBJECT_KEY))
+    print("Fingerprint: {}".format(FINGERPRINT))
 
     workspace = genai_core.workspaces.get_workspace(WORKSPACE_ID)
     if not workspace:
@@ -36,46 +46,179 @@ def main():
             f"Document {WORKSPACE_ID}/{DOCUMENT_ID} does not exist"
         )
 
-    try:
-        extension = os.path.splitext(INPUT_OBJECT_KEY)[-1].lower()
-        if extension == ".txt":
-            object = s3_client.get_object(
-                Bucket=INPUT_BUCKET_NAME, Key=INPUT_OBJECT_KEY
-            )
-            content = object["Body"].read().decode("utf-8")
-        else:
-            loader = S3FileLoader(INPUT_BUCKET_NAME, INPUT_OBJECT_KEY)
-            print(f"loader: {loader}")
-            docs = loader.load()
-            content = docs[0].page_content
+    if not is_current_content(document):
+        return
 
+    try:
+        texts = read_content()
         if (
             INPUT_BUCKET_NAME != PROCESSING_BUCKET_NAME
             and INPUT_OBJECT_KEY != PROCESSING_OBJECT_KEY
         ):
-            s3_client.put_object(
-                Bucket=PROCESSING_BUCKET_NAME, Key=PROCESSING_OBJECT_KEY, Body=content
-            )
+            texts = upload_content(texts)
 
-        add_chunks(workspace, document, content)
+        add_chunks(workspace, document, texts)
     except Exception as error:
         genai_core.documents.set_status(WORKSPACE_ID, DOCUMENT_ID, "error")
         print(error)
         raise error
 
 
-def add_chunks(workspace: dict, document: dict, content: str):
-    chunks = genai_core.chunks.split_content(workspace, content)
+def is_current_content(document: dict):
+    # Imports of text documents carry no fingerprint
+    if not FINGERPRINT:
+        return True
+
+    # A newer upload of the file was submitted after this import and is
+    # imported by its own job
+    if document.get("fingerprint") != FINGERPRINT:
+        print(f"Document fingerprint is {document.get('fingerprint')}, skipping")
+        return False
+
+    # The file was replaced since it was submitted, its upload submits it again
+    response = s3_client.head_object(Bucket=INPUT_BUCKET_NAME, Key=INPUT_OBJECT_KEY)
+    fingerprint = genai_core.documents.get_file_fingerprint(
+        response["ETag"], response["ContentLength"]
+    )
+    if fingerprint != FINGERPRINT:
+        print(f"File fingerprint is {fingerprint}, skipping")
+        return False
+
+    return True
+
 
-    genai_core.chunks.add_chunks(
+def add_chunks(workspace: dict, document: dict, texts):
+    genai_core.chunks.add_chunks_stream(
         workspace=workspace,
         document=document,
         document_sub_id=None,
-        chunks=chunks,
-        chunk_complements=None,
+        texts=texts,
         replace=True,
     )
 
 
+def read_content():
+    extension = os.path.splitext(INPUT_OBJECT_KEY)[-1].lower()
+    if extension == ".txt":
+        object = s3_client.get_object(Bucket=INPUT_BUCKET_NAME, Key=INPUT_OBJECT_KEY)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for data in object["Body"].iter_chunks(chunk_size=CONTENT_WINDOW_SIZE):
+            text = decoder.decode(data)
+            if text:
+                yield text
+
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+        return
+
+    if extension == ".pdf":
+        yield from read_pdf_content()
+        return
+
+    # Other formats are partitioned whole by unstructured, only the
+    # documents of the elements are built one at a time
+    loader = S3FileLoader(INPUT_BUCKET_NAME, INPUT_OBJECT_KEY, mode="elements")
+    print(f"loader: {loader}")
+
+    yield from group_windows(doc.page_content for doc in loader.lazy_load())
+
+
+def read_pdf_content():
+    # The file is downloaded to disk and its pages are extracted one at a time
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "document.pdf")
+        s3_client.download_file(INPUT_BUCKET_NAME, INPUT_OBJECT_KEY, file_path)
+
+        reader = PdfReader(file_path)
+        print(f"PDF pages: {len(reader.pages)}")
+
+        yield from group_windows(page.extract_text() for page in reader.pages)
+
+
+def group_windows(contents):
+    # Contents are grouped in windows instead of being joined in one string
+    window = []
+    window_size = 0
+    for idx, content in enumerate(contents):
+        text = content if idx == 0 else "\n\n" + content
+        window.append(text)
+        window_size += len(text)
+
+        if window_size >= CONTENT_WINDOW_SIZE:
+            yield "".join(window)
+            window = []
+            window_size = 0
+
+    if window:
+        yield "".join(window)
+
+
+def upload_content(texts):
+    # Copies the text to the processing bucket while it flows through
+    upload_id = None
+    parts = []
+    buffer = []
+    buffer_size = 0
+
+    try:
+        for text in texts:
+            data = text.encode("utf-8")
+            buffer.append(data)
+            buffer_size += len(data)
+
+            if buffer_size >= CONTENT_PART_SIZE:
+                if upload_id is None:
+                    response = s3_client.create_multipart_upload(
+                        Bucket=PROCESSING_BUCKET_NAME, Key=PROCESSING_OBJECT_KEY
+                    )
+                    upload_id = response["UploadId"]
+
+                parts.append(upload_part(upload_id, len(parts) + 1, b"".join(buffer)))
+                buffer = []
+                buffer_size = 0
+
+            yield text
+
+        if upload_id is None:
+            s3_client.put_object(
+                Bucket=PROCESSING_BUCKET_NAME,
+                Key=PROCESSING_OBJECT_KEY,
+                Body=b"".join(buffer),
+            )
+        else:
+            if buffer:
+                parts.append(upload_part(upload_id, len(parts) + 1, b"".join(buffer)))
+
+            s3_client.complete_multipart_upload(
+                Bucket=PROCESSING_BUCKET_NAME,
+                Key=PROCESSING_OBJECT_KEY,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+    except BaseException:
+        if upload_id is not None:
+            s3_client.abort_multipart_upload(
+                Bucket=PROCESSING_BUCKET_NAME,
+                Key=PROCESSING_OBJECT_KEY,
+                UploadId=upload_id,
+            )
+
+        raise
+
+
+def upload_part(upload_id: str, part_number: int, data: bytes):
+    response = s3_client.upload_part(
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=PROCESSING_OBJECT_KEY,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data,
+    )
+
+    return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+
 if __name__ == "__main__":
     main()
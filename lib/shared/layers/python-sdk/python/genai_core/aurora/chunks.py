@@ -1,10 +1,19 @@
+import time
 from psycopg2 import sql
 from typing import List, Optional
 from genai_core.aurora.connection import AuroraConnection
+from genai_core.aurora.utils import get_table_name
+from genai_core.types import CommonError
+
+DELETE_BATCH_SIZE = 500
+# Until the previous version of a replaced document is removed, searches
+# return its chunks next to the new ones, failed removals are retried.
+DELETE_MAX_RETRIES = 3
+DELETE_RETRY_BASE_DELAY = 1.0
 
 
 def add_chunks_aurora(
-    workspace_id: str,
+    workspace: dict,
     document_id: str,
     document_sub_id: Optional[str],
     document_type: str,
@@ -16,22 +25,33 @@ def add_chunks_aurora(
     chunks: List[str],
     chunk_complements: List[str],
     replace: bool,
+    ingest_version: Optional[int] = None,
 ):
-    table_name = sql.Identifier(workspace_id.replace("-", ""))
+    workspace_id = workspace["workspace_id"]
+    table_name = sql.Identifier(get_table_name(workspace))
     complements_len = len(chunk_complements) if chunk_complements else 0
     removed_vectors = 0
 
-    with AuroraConnection(autocommit=False) as cursor:
-        if replace:
-            cursor.execute(
-                sql.SQL(
-                    """DELETE FROM {table} WHERE 
-                        workspace_id = %s AND document_id = %s;"""
-                ).format(table=table_name),
-                [workspace_id, document_id],
-            )
+    # Versioned tables keep the previous chunks of a replaced document until
+    # the new ones are committed, the old version is then removed in batches.
+    versioned_chunks = workspace.get("versioned_chunks", False)
+    if ingest_version is None:
+        ingest_version = get_ingest_version()
 
-            removed_vectors = cursor.rowcount
+    if replace and not versioned_chunks:
+        # Tables without the ingest_version column cannot tell the previous
+        # chunks from the new ones, they are removed first, in batches
+        # outside of the insert transaction.
+        removed_vectors = delete_chunks_with_retries(workspace, document_id=document_id)
+
+    with AuroraConnection(autocommit=False) as cursor:
+        version_column = sql.SQL("")
+        version_value = sql.SQL("")
+        version_params = []
+        if versioned_chunks:
+            version_column = sql.SQL(", ingest_version")
+            version_value = sql.SQL(", %s")
+            version_params = [ingest_version]
 
         for idx in range(len(chunk_ids)):
             chunk_id = chunk_ids[idx]
@@ -54,10 +74,15 @@ def add_chunks_aurora(
                         content,
                         content_complement,
                         content_embeddings
+                        {version_column}
                     ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s {version_value}
                     );"""
-                ).format(table=table_name),
+                ).format(
+                    table=table_name,
+                    version_column=version_column,
+                    version_value=version_value,
+                ),
                 [
                     chunk_id,
                     workspace_id,
@@ -70,21 +95,107 @@ def add_chunks_aurora(
                     content,
                     content_complement,
                     chunk_embeddings[idx],
+                    *version_params,
                 ],
             )
 
         cursor.connection.commit()
 
+    if replace and versioned_chunks:
+        removed_vectors = delete_previous_chunks_aurora(
+            workspace, document_id, ingest_version
+        )
+
     return {"removed_vectors": removed_vectors, "added_vectors": len(chunk_ids)}
 
 
-def clean_chunks_aurora(workspace_id: str, document_id: str):
-    table_name = sql.Identifier(workspace_id.replace("-", ""))
-    with AuroraConnection() as cursor:
-        cursor.execute(
-            sql.SQL(
-                """DELETE FROM {table} WHERE 
-                    workspace_id = %s AND document_id = %s;"""
-            ).format(table=table_name),
-            [workspace_id, document_id],
+def get_ingest_version():
+    return int(time.time() * 1000)
+
+
+def delete_previous_chunks_aurora(
+    workspace: dict, document_id: str, ingest_version: int
+):
+    """
+    Removes the chunks of a document older than ingest_version, once the
+    new ones are committed. Raises when they cannot be removed, the import
+    then fails and importing the document again removes them.
+    """
+    try:
+        return delete_chunks_with_retries(
+            workspace, document_id=document_id, before_version=ingest_version
         )
+    except Exception as error:
+        raise CommonError(
+            f"Previous chunks of document {document_id} could not be removed, "
+            "searches return them until the document is imported again"
+        ) from error
+
+
+def delete_chunks_with_retries(workspace: dict, **kwargs):
+    for attempt in range(DELETE_MAX_RETRIES + 1):
+        try:
+            return delete_chunks_aurora(workspace, **kwargs)
+        except Exception as error:
+            print(f"Deleting chunks {kwargs} failed, attempt {attempt + 1}: {error}")
+            if attempt == DELETE_MAX_RETRIES:
+                raise
+
+            time.sleep(DELETE_RETRY_BASE_DELAY * (2**attempt))
+
+
+def clean_chunks_aurora(workspace: dict, document_id: str):
+    return delete_chunks_aurora(workspace, document_id=document_id)
+
+
+def delete_chunks_aurora(
+    workspace: dict,
+    document_id: Optional[str] = None,
+    before_version: Optional[int] = None,
+    ingest_version: Optional[int] = None,
+    batch_size: int = DELETE_BATCH_SIZE,
+):
+    """
+    Deletes the chunks of a workspace (or of one of its documents) in
+    batches of at most batch_size rows. Every batch is its own short
+    transaction, so large deletions do not hold locks on the table or
+    produce a single large WAL burst while queries are running.
+    """
+    workspace_id = workspace["workspace_id"]
+    table_name = sql.Identifier(get_table_name(workspace))
+
+    conditions = [sql.SQL("workspace_id = %s")]
+    params = [workspace_id]
+
+    if document_id is not None:
+        conditions.append(sql.SQL("document_id = %s"))
+        params.append(document_id)
+
+    if before_version is not None:
+        conditions.append(sql.SQL("ingest_version < %s"))
+        params.append(before_version)
+
+    if ingest_version is not None:
+        conditions.append(sql.SQL("ingest_version = %s"))
+        params.append(ingest_version)
+
+    removed_vectors = 0
+    with AuroraConnection() as cursor:
+        while True:
+            cursor.execute(
+                sql.SQL(
+                    """DELETE FROM {table} WHERE workspace_id = %s AND chunk_id IN (
+                        SELECT chunk_id FROM {table} WHERE {conditions} LIMIT %s
+                    );"""
+                ).format(
+                    table=table_name,
+                    conditions=sql.SQL(" AND ").join(conditions),
+                ),
+                [workspace_id, *params, batch_size],
+            )
+
+            removed_vectors += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+
+    return removed_vectors
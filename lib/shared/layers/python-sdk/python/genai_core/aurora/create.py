@@ -1,10 +1,33 @@
 from psycopg2 import sql
 from genai_core.aurora.connection import AuroraConnection
+from genai_core.aurora.utils import (
+    PARTITIONS_COUNT,
+    get_table_name,
+    get_tsvector_column,
+    get_tsvector_index,
+    is_partitioned,
+)
+
+METRIC_OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "inner": "vector_ip_ops",
+}
+# First pgvector version with hnsw indexes
+HNSW_MIN_VERSION = (0, 5, 0)
 
 
 def create_workspace_table(workspace: dict):
+    """
+    Creates the chunks table of a workspace (or its partition of a shared
+    table) and returns the languages that have stored tsvector columns.
+    """
+    if is_partitioned(workspace):
+        return create_workspace_partition(workspace)
+
     workspace_id = workspace["workspace_id"]
-    table_name = sql.Identifier(workspace_id.replace("-", ""))
+    raw_table_name = workspace_id.replace("-", "")
+    table_name = sql.Identifier(raw_table_name)
 
     embeddings_model_dimensions = workspace["embeddings_model_dimensions"]
     hybrid_search = workspace["hybrid_search"]
@@ -29,6 +52,7 @@ def create_workspace_table(workspace: dict):
                     content_complement TEXT, 
                     content_embeddings vector(%s),
                     metadata JSONB,
+                    ingest_version BIGINT NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );"""
             ).format(table=table_name),
@@ -45,13 +69,11 @@ def create_workspace_table(workspace: dict):
             )
         )
 
+        add_filter_indexes(cursor, raw_table_name)
+
         if hybrid_search:
             for language in languages:
-                cursor.execute(
-                    sql.SQL(
-                        "CREATE INDEX ON {table} USING GIN (to_tsvector('{language}', content));"
-                    ).format(table=table_name, language=sql.Identifier(language))
-                )
+                add_tsvector_column(cursor, raw_table_name, language)
 
         if has_index:
             if metric == "cosine":
@@ -75,3 +97,214 @@ def create_workspace_table(workspace: dict):
 
         cursor.connection.commit()
         print("Created workspace table")
+
+    return languages if hybrid_search else []
+
+
+def create_workspace_partition(workspace: dict):
+    """
+    Prepares the shared chunks table of a partitioned workspace. The table,
+    its partitions and indexes are created on first use and shared by all
+    the workspaces with the same embeddings dimensions.
+
+    Stored tsvector columns are only added when the table is created, for
+    the languages of that first workspace. Adding one later would rewrite
+    the table of every workspace under an exclusive lock, so the languages
+    of later workspaces without a column are searched with to_tsvector.
+    Returns the languages of the workspace that have a column.
+    """
+    raw_table_name = get_table_name(workspace)
+    table_name = sql.Identifier(raw_table_name)
+
+    embeddings_model_dimensions = workspace["embeddings_model_dimensions"]
+    hybrid_search = workspace["hybrid_search"]
+    languages = workspace["languages"]
+    has_index = workspace["has_index"]
+    metric = workspace["metric"]
+
+    with AuroraConnection(autocommit=False) as cursor:
+        # Serialize concurrent workspace creations on the same shared table.
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", [raw_table_name])
+
+        cursor.execute("SELECT to_regclass(%s) IS NULL;", [raw_table_name])
+        (table_created,) = cursor.fetchone()
+
+        cursor.execute(
+            sql.SQL(
+                """CREATE TABLE IF NOT EXISTS {table} (
+                    chunk_id UUID NOT NULL,
+                    workspace_id UUID NOT NULL,
+                    document_id UUID,
+                    document_sub_id UUID,
+                    document_type VARCHAR(50),
+                    document_sub_type VARCHAR(50),
+                    path TEXT,
+                    language VARCHAR(15),
+                    title TEXT,
+                    content TEXT,
+                    content_complement TEXT,
+                    content_embeddings vector(%s),
+                    metadata JSONB,
+                    ingest_version BIGINT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (workspace_id, chunk_id)
+                ) PARTITION BY HASH (workspace_id);"""
+            ).format(table=table_name),
+            [embeddings_model_dimensions],
+        )
+
+        add_ingest_version_column(cursor, raw_table_name)
+
+        for remainder in range(PARTITIONS_COUNT):
+            cursor.execute(
+                sql.SQL(
+                    """CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+                        FOR VALUES WITH (MODULUS %s, REMAINDER %s);"""
+                ).format(
+                    partition=sql.Identifier(f"{raw_table_name}_p{remainder}"),
+                    table=table_name,
+                ),
+                [PARTITIONS_COUNT, remainder],
+            )
+
+        for columns in [
+            ["workspace_id", "document_id"],
+            ["workspace_id", "document_sub_id"],
+            ["workspace_id", "document_type"],
+        ]:
+            cursor.execute(
+                sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns});"
+                ).format(
+                    index=sql.Identifier(f"{raw_table_name}_{columns[-1]}_idx"),
+                    table=table_name,
+                    columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+                )
+            )
+
+        cursor.execute(
+            sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {index} ON {table} (workspace_id, path text_pattern_ops);"
+            ).format(
+                index=sql.Identifier(f"{raw_table_name}_path_idx"),
+                table=table_name,
+            )
+        )
+
+        if hybrid_search and table_created:
+            for language in languages:
+                add_tsvector_column(cursor, raw_table_name, language)
+
+        tsvector_languages = []
+        if hybrid_search:
+            table_languages = get_tsvector_languages(cursor, raw_table_name)
+            tsvector_languages = [
+                language for language in languages if language in table_languages
+            ]
+
+        if has_index:
+            operator_class = METRIC_OPERATOR_CLASSES.get(metric)
+            if operator_class is None:
+                raise Exception("Unknown metric")
+
+            # The shared table is empty when its index is created, ivfflat
+            # lists would be trained on no data (see reindex_workspace_vectors)
+            # while hnsw needs no training.
+            if supports_hnsw(cursor):
+                index_method = sql.SQL("hnsw (content_embeddings {operator_class})")
+            else:
+                index_method = sql.SQL(
+                    "ivfflat (content_embeddings {operator_class}) WITH (lists = 100)"
+                )
+
+            cursor.execute(
+                sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {index} ON {table} USING {method};"
+                ).format(
+                    index=sql.Identifier(f"{raw_table_name}_{metric}_idx"),
+                    table=table_name,
+                    method=index_method.format(operator_class=sql.SQL(operator_class)),
+                )
+            )
+
+        cursor.connection.commit()
+        print("Created workspace partition")
+
+    return tsvector_languages
+
+
+def supports_hnsw(cursor):
+    cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+    row = cursor.fetchone()
+    if row is None:
+        return False
+
+    version = tuple(int(part) for part in row[0].split(".")[:3] if part.isdigit())
+
+    return version >= HNSW_MIN_VERSION
+
+
+def add_tsvector_column(cursor, raw_table_name: str, language: str):
+    # The tsvector is computed once at insert time, so keyword search
+    # can match and rank on the stored value instead of re-parsing content.
+    table_name = sql.Identifier(raw_table_name)
+    column_name = sql.Identifier(get_tsvector_column(language))
+    index_name = sql.Identifier(get_tsvector_index(raw_table_name, language))
+
+    cursor.execute(
+        sql.SQL(
+            """ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} tsvector
+                GENERATED ALWAYS AS (to_tsvector('{language}', coalesce(content, ''))) STORED;"""
+        ).format(
+            table=table_name, column=column_name, language=sql.Identifier(language)
+        )
+    )
+
+    cursor.execute(
+        sql.SQL(
+            "CREATE INDEX IF NOT EXISTS {index} ON {table} USING GIN ({column});"
+        ).format(index=index_name, table=table_name, column=column_name)
+    )
+
+
+def get_tsvector_languages(cursor, raw_table_name: str):
+    column_prefix = get_tsvector_column("")
+    cursor.execute(
+        """SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND column_name LIKE %s;""",
+        [raw_table_name, f"{column_prefix}%"],
+    )
+
+    return [column_name[len(column_prefix) :] for (column_name,) in cursor.fetchall()]
+
+
+def get_filter_indexes(raw_table_name: str):
+    # Indexes backing the search filters (see SearchFilter), by name.
+    return {
+        f"{raw_table_name}_document_type_idx": "document_type",
+        f"{raw_table_name}_path_idx": "path text_pattern_ops",
+    }
+
+
+def add_filter_indexes(cursor, raw_table_name: str):
+    table_name = sql.Identifier(raw_table_name)
+
+    for index_name, columns in get_filter_indexes(raw_table_name).items():
+        cursor.execute(
+            sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns});"
+            ).format(
+                index=sql.Identifier(index_name),
+                table=table_name,
+                columns=sql.SQL(columns),
+            )
+        )
+
+
+def add_ingest_version_column(cursor, raw_table_name: str):
+    # A constant default does not rewrite the table, existing rows get 0.
+    cursor.execute(
+        sql.SQL(
+            "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS ingest_version BIGINT NOT NULL DEFAULT 0;"
+        ).format(table=sql.Identifier(raw_table_name))
+    )
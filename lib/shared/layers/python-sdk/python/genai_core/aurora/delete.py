@@ -3,6 +3,8 @@ import boto3
 import genai_core.utils.delete_files_with_prefix
 from psycopg2 import sql
 from genai_core.aurora.connection import AuroraConnection
+from genai_core.aurora.chunks import delete_chunks_aurora
+from genai_core.aurora.utils import get_table_name, is_partitioned
 
 PROCESSING_BUCKET_NAME = os.environ["PROCESSING_BUCKET_NAME"]
 UPLOAD_BUCKET_NAME = os.environ["UPLOAD_BUCKET_NAME"]
@@ -23,11 +25,16 @@ def delete_aurora_workspace(workspace: dict):
         PROCESSING_BUCKET_NAME, workspace_id
     )
 
-    table_name = sql.Identifier(workspace_id.replace("-", ""))
-    with AuroraConnection(autocommit=False) as cursor:
-        cursor.execute(
-            sql.SQL("DROP TABLE IF EXISTS {table};").format(table=table_name)
-        )
+    if is_partitioned(workspace):
+        delete_chunks_aurora(workspace)
+    else:
+        table_name = sql.Identifier(get_table_name(workspace))
+        with AuroraConnection(autocommit=False) as cursor:
+            cursor.execute(
+                sql.SQL("DROP TABLE IF EXISTS {table};").format(table=table_name)
+            )
+
+            cursor.connection.commit()
 
     workspaces_table = dynamodb.Table(WORKSPACES_TABLE_NAME)
     documents_table = dynamodb.Table(DOCUMENTS_TABLE_NAME)
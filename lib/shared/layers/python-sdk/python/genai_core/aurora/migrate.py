@@ -0,0 +1,291 @@
+import os
+import uuid
+import boto3
+from psycopg2 import sql
+from datetime import datetime
+from genai_core.aurora.connection import AuroraConnection
+from genai_core.aurora.create import (
+    add_filter_indexes,
+    add_ingest_version_column,
+    add_tsvector_column,
+    create_workspace_partition,
+    get_filter_indexes,
+)
+from genai_core.aurora.utils import (
+    STORAGE_LAYOUT_PARTITIONED,
+    get_table_name,
+    is_partitioned,
+)
+
+WORKSPACES_TABLE_NAME = os.environ.get("WORKSPACES_TABLE_NAME")
+
+WORKSPACE_OBJECT_TYPE = "workspace"
+# Chunks copied per transaction when moving a workspace to a shared table
+MIGRATE_BATCH_SIZE = 1000
+
+dynamodb = boto3.resource("dynamodb")
+
+
+def migrate_workspace_tsvector_columns(workspace: dict):
+    """
+    Adds the stored tsvector columns (and their GIN indexes) to a workspace
+    table created before they existed, drops the old expression indexes and
+    flags the workspace so keyword search reads the stored columns.
+
+    Adding a stored generated column rewrites the table, so run this outside
+    of peak query traffic.
+    """
+    workspace_id = workspace["workspace_id"]
+    raw_table_name = workspace_id.replace("-", "")
+
+    if workspace["engine"] != "aurora" or not workspace["hybrid_search"]:
+        return False
+
+    if is_partitioned(workspace):
+        return False
+
+    if workspace.get("tsvector_columns", False):
+        return False
+
+    with AuroraConnection(autocommit=False) as cursor:
+        for language in workspace["languages"]:
+            add_tsvector_column(cursor, raw_table_name, language)
+
+        cursor.execute(
+            """SELECT indexname FROM pg_indexes
+                WHERE tablename = %s AND indexdef LIKE %s;""",
+            [raw_table_name, "%to_tsvector(%"],
+        )
+
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(
+                sql.SQL("DROP INDEX IF EXISTS {index};").format(
+                    index=sql.Identifier(index_name)
+                )
+            )
+
+        cursor.connection.commit()
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    workspaces_table = dynamodb.Table(WORKSPACES_TABLE_NAME)
+    workspaces_table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET tsvector_columns=:tsvectorColumnsValue, updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":tsvectorColumnsValue": True,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    print(f"Migrated workspace {workspace_id} to stored tsvector columns")
+
+    return True
+
+
+def migrate_workspace_filter_indexes(workspace: dict):
+    if workspace["engine"] != "aurora" or is_partitioned(workspace):
+        return False
+
+    raw_table_name = workspace["workspace_id"].replace("-", "")
+    index_names = tuple(get_filter_indexes(raw_table_name).keys())
+    with AuroraConnection(autocommit=False) as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_indexes WHERE tablename = %s AND indexname IN %s;",
+            [raw_table_name, index_names],
+        )
+        (existing,) = cursor.fetchone()
+        if existing == len(index_names):
+            return False
+
+        add_filter_indexes(cursor, raw_table_name)
+        cursor.connection.commit()
+
+    return True
+
+
+def migrate_workspace_versioned_chunks(workspace: dict):
+    workspace_id = workspace["workspace_id"]
+
+    if workspace["engine"] != "aurora" or workspace.get("versioned_chunks", False):
+        return False
+
+    with AuroraConnection(autocommit=False) as cursor:
+        add_ingest_version_column(cursor, get_table_name(workspace))
+        cursor.connection.commit()
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    workspaces_table = dynamodb.Table(WORKSPACES_TABLE_NAME)
+    workspaces_table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET versioned_chunks=:versionedChunksValue, updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":versionedChunksValue": True,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    return True
+
+
+def migrate_workspace_to_partitioned(workspace: dict):
+    """
+    Moves the chunks of a table-per-workspace workspace into the shared
+    partitioned chunks table and drops the workspace table. Readers keep
+    using the old table until the workspace item is updated, pause ingestion
+    into the workspace while the migration runs.
+    """
+    workspace_id = workspace["workspace_id"]
+
+    if workspace["engine"] != "aurora" or is_partitioned(workspace):
+        return False
+
+    partitioned_workspace = {
+        **workspace,
+        "storage_layout": STORAGE_LAYOUT_PARTITIONED,
+        "tsvector_columns": workspace["hybrid_search"],
+        "versioned_chunks": True,
+    }
+    tsvector_languages = create_workspace_partition(partitioned_workspace)
+
+    source_table = sql.Identifier(get_table_name(workspace))
+    target_table = sql.Identifier(get_table_name(partitioned_workspace))
+    columns = sql.SQL(", ").join(
+        map(
+            sql.Identifier,
+            [
+                "chunk_id",
+                "workspace_id",
+                "document_id",
+                "document_sub_id",
+                "document_type",
+                "document_sub_type",
+                "path",
+                "language",
+                "title",
+                "content",
+                "content_complement",
+                "content_embeddings",
+                "metadata",
+                "created_at",
+            ],
+        )
+    )
+
+    # Copied in batches of their own transaction, in chunk_id order, so
+    # locks and WAL stay bounded. A new run copies the rest, rows already
+    # copied are skipped by the conflict clause.
+    moved_vectors = 0
+    last_chunk_id = uuid.UUID(int=0)
+    with AuroraConnection(autocommit=False) as cursor:
+        while True:
+            cursor.execute(
+                sql.SQL(
+                    """SELECT chunk_id FROM {source} WHERE chunk_id > %s
+                        ORDER BY chunk_id LIMIT %s;"""
+                ).format(source=source_table),
+                [last_chunk_id, MIGRATE_BATCH_SIZE],
+            )
+            chunk_ids = [chunk_id for (chunk_id,) in cursor.fetchall()]
+            if len(chunk_ids) == 0:
+                break
+
+            cursor.execute(
+                sql.SQL(
+                    """INSERT INTO {target} ({columns})
+                        SELECT {columns} FROM {source}
+                        WHERE chunk_id = ANY(%s::uuid[])
+                        ON CONFLICT DO NOTHING;"""
+                ).format(target=target_table, source=source_table, columns=columns),
+                [chunk_ids],
+            )
+            moved_vectors += cursor.rowcount
+            cursor.connection.commit()
+            last_chunk_id = chunk_ids[-1]
+
+    reindex_workspace_vectors(partitioned_workspace)
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    workspaces_table = dynamodb.Table(WORKSPACES_TABLE_NAME)
+    workspaces_table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET storage_layout=:storageLayoutValue, tsvector_columns=:tsvectorColumnsValue, tsvector_languages=:tsvectorLanguagesValue, versioned_chunks=:versionedChunksValue, updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":storageLayoutValue": STORAGE_LAYOUT_PARTITIONED,
+            ":tsvectorColumnsValue": partitioned_workspace["tsvector_columns"],
+            ":tsvectorLanguagesValue": tsvector_languages,
+            ":versionedChunksValue": True,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    with AuroraConnection(autocommit=False) as cursor:
+        cursor.execute(
+            sql.SQL("DROP TABLE IF EXISTS {table};").format(table=source_table)
+        )
+        cursor.connection.commit()
+
+    print(f"Migrated {moved_vectors} vectors of workspace {workspace_id}")
+
+    return True
+
+
+def reindex_workspace_vectors(workspace: dict):
+    """
+    Rebuilds the ivfflat indexes of the table, or of the shared table
+    partition, holding the workspace chunks so their lists are trained on
+    the loaded data. Indexes created on an empty table have untrained lists
+    and a poor recall. hnsw indexes need no rebuild. Returns whether an
+    index was rebuilt.
+    """
+    workspace_id = workspace["workspace_id"]
+
+    if workspace["engine"] != "aurora" or not workspace.get("has_index", False):
+        return False
+
+    table_name = get_table_name(workspace)
+    # REINDEX CONCURRENTLY cannot run in a transaction
+    with AuroraConnection(autocommit=True) as cursor:
+        if is_partitioned(workspace):
+            cursor.execute(
+                sql.SQL(
+                    "SELECT tableoid::regclass::text FROM {table} WHERE workspace_id = %s LIMIT 1;"
+                ).format(table=sql.Identifier(table_name)),
+                [workspace_id],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return False
+
+            table_name = row[0]
+
+        cursor.execute(
+            """SELECT indexname FROM pg_indexes
+                WHERE tablename = %s AND indexdef LIKE %s;""",
+            [table_name, "%USING ivfflat%"],
+        )
+        index_names = [index_name for (index_name,) in cursor.fetchall()]
+
+        for index_name in index_names:
+            cursor.execute(
+                sql.SQL("REINDEX INDEX CONCURRENTLY {index};").format(
+                    index=sql.Identifier(index_name)
+                )
+            )
+
+    print(f"Rebuilt {len(index_names)} vector indexes of workspace {workspace_id}")
+
+    return len(index_names) > 0
+
+
+def migrate_workspace(workspace: dict):
+    """
+    Brings a workspace table to the current columns and indexes, in place.
+    Returns whether anything changed.
+    """
+    results = [
+        migrate_workspace_filter_indexes(workspace),
+        migrate_workspace_tsvector_columns(workspace),
+        migrate_workspace_versioned_chunks(workspace),
+    ]
+
+    return any(results)
@@ -1,16 +1,52 @@
+import math
 import numpy as np
 import genai_core.embeddings
-import genai_core.cross_encoder
+import genai_core.rerank
 import genai_core.utils.comprehend
-from typing import List
+import uuid
+from typing import List, Optional
 from psycopg2 import sql
 from genai_core.aurora.connection import AuroraConnection
-from genai_core.aurora.utils import convert_types
+from genai_core.aurora.utils import (
+    convert_types,
+    get_table_name,
+    get_tsvector_column,
+    is_partitioned,
+)
 from aws_lambda_powertools import Logger
-from genai_core.types import CommonError, Task
+from genai_core.types import CommonError, RerankOptions, SearchFilter, Task
 
 logger = Logger()
 
+# Filtered queries discard candidates after the index scan, the scan is
+# widened by the share of rows the filters remove, from these values.
+FILTERED_IVFFLAT_PROBES = 10
+FILTERED_HNSW_EF_SEARCH = 40
+IVFFLAT_LISTS = 100
+HNSW_MAX_EF_SEARCH = 1000
+# Searches over up to this many rows are exact: small workspaces of a shared
+# table and selective filters, an index scan followed by the filters would
+# leave few of them.
+EXACT_SEARCH_MAX_VECTORS = 20000
+
+RECORD_COLUMNS = [
+    "chunk_id",
+    "workspace_id",
+    "document_id",
+    "document_sub_id",
+    "document_type",
+    "document_sub_type",
+    "path",
+    "language",
+    "title",
+    "content",
+    "content_complement",
+    "metadata",
+]
+# Columns only loaded for the final items, content stays in the first
+# phase because the cross encoder ranks on it.
+LAZY_COLUMNS = ["path", "title", "content_complement", "metadata"]
+
 
 def query_workspace_aurora(
     workspace_id: str,
@@ -19,17 +55,18 @@ def query_workspace_aurora(
     limit: int,
     full_response: bool,
     threshold: int = 0,
+    filters: Optional[SearchFilter] = None,
+    rerank: Optional[RerankOptions] = None,
 ):
-    table_name = sql.Identifier(workspace_id.replace("-", ""))
+    table_name = sql.Identifier(get_table_name(workspace))
     embeddings_model_provider = workspace["embeddings_model_provider"]
     embeddings_model_name = workspace["embeddings_model_name"]
-    cross_encoder_model_provider = workspace["cross_encoder_model_provider"]
-    cross_encoder_model_name = workspace["cross_encoder_model_name"]
     metric = workspace["metric"]
     hybrid_search = workspace["hybrid_search"]
     languages = workspace["languages"]
     vector_search_limit = 25
     keyword_search_limit = 25
+    rerank_options = genai_core.rerank.get_rerank_options(rerank)
 
     selected_model = genai_core.embeddings.get_embeddings_model(
         embeddings_model_provider, embeddings_model_name
@@ -38,13 +75,10 @@ def query_workspace_aurora(
     if selected_model is None:
         raise CommonError("Embeddings model not found")
 
-    cross_encoder_model = genai_core.cross_encoder.get_cross_encoder_model(
-        cross_encoder_model_provider, cross_encoder_model_name
+    cross_encoder_model = genai_core.rerank.get_cross_encoder_model(
+        workspace, rerank_options
     )
 
-    if cross_encoder_model is None:
-        raise CommonError("Cross encoder model not found")
-
     query_embeddings = genai_core.embeddings.generate_embeddings(
         selected_model, [query], Task.RETRIEVE
     )[0]
@@ -56,240 +90,372 @@ def query_workspace_aurora(
     items = []
     vector_search_records = []
     keyword_search_records = []
+    if metric == "cosine":
+        distance_operator = sql.SQL("<=>")
+    elif metric == "l2":
+        distance_operator = sql.SQL("<->")
+    elif metric == "inner":
+        distance_operator = sql.SQL("<#>")
+    else:
+        raise Exception("Unknown metric")
+
+    filter_conditions, filter_params = _get_filter_conditions(filters)
+    filtered = len(filter_conditions) > 0
+    if is_partitioned(workspace):
+        # Shared tables hold many workspaces, the condition also prunes
+        # the query down to the workspace partition.
+        filter_conditions.insert(0, sql.SQL("workspace_id = %s"))
+        filter_params.insert(0, workspace_id)
+
+    # Only the final items reach the caller when the full response is not
+    # requested, so the heavy columns are loaded for those items only.
+    lazy_columns = not full_response
+    columns = RECORD_COLUMNS
+    if lazy_columns:
+        columns = [column for column in RECORD_COLUMNS if column not in LAZY_COLUMNS]
+    select_columns = sql.SQL(", ").join(map(sql.Identifier, columns))
+
     with AuroraConnection() as cursor:
-        if metric == "cosine":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id, 
-                        workspace_id,
-                        document_id, 
-                        document_sub_id, 
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <=> %s AS vector_search_score 
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
-            )
-        elif metric == "l2":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id, 
-                        workspace_id,
-                        document_id, 
-                        document_sub_id, 
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <-> %s AS vector_search_score 
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
+        exact_search = (
+            is_partitioned(workspace)
+            and int(workspace.get("vectors", 0)) <= EXACT_SEARCH_MAX_VECTORS
+        )
+        if filtered and not exact_search:
+            matching_rows, index_rows = _estimate_filtered_rows(
+                cursor, table_name, workspace_id, filter_conditions, filter_params
             )
-        elif metric == "inner":
-            cursor.execute(
-                sql.SQL(
-                    """SELECT chunk_id, 
-                        workspace_id,
-                        document_id, 
-                        document_sub_id, 
-                        document_type,
-                        document_sub_type,
-                        path,
-                        language,
-                        title,
-                        content,
-                        content_complement,
-                        metadata,
-                        content_embeddings <#> %s AS vector_search_score 
-                FROM {table} ORDER BY vector_search_score LIMIT %s;"""
-                ).format(table=table_name),
-                [np.array(query_embeddings), vector_search_limit],
+            exact_search = matching_rows <= EXACT_SEARCH_MAX_VECTORS
+
+            if not exact_search:
+                scan_factor = max(index_rows, matching_rows) / matching_rows
+                probes = min(
+                    IVFFLAT_LISTS, math.ceil(FILTERED_IVFFLAT_PROBES * scan_factor)
+                )
+                ef_search = min(
+                    HNSW_MAX_EF_SEARCH, math.ceil(FILTERED_HNSW_EF_SEARCH * scan_factor)
+                )
+                cursor.execute("SET ivfflat.probes = %s;", [probes])
+                cursor.execute("SET hnsw.ef_search = %s;", [ef_search])
+
+        if exact_search:
+            # Reads the workspace rows through a bitmap scan of the
+            # workspace_id index and sorts them by distance instead of
+            # using the vector index
+            cursor.execute("SET enable_indexscan = off;")
+
+        vector_search_where = sql.SQL("")
+        if filter_conditions:
+            vector_search_where = sql.SQL("WHERE ") + sql.SQL(" AND ").join(
+                filter_conditions
             )
-        else:
-            raise Exception("Unknown metric")
+
+        cursor.execute(
+            sql.SQL(
+                """SELECT {columns},
+                    content_embeddings {operator} %s AS vector_search_score 
+            FROM {table} {where} ORDER BY vector_search_score LIMIT %s;"""
+            ).format(
+                columns=select_columns,
+                table=table_name,
+                operator=distance_operator,
+                where=vector_search_where,
+            ),
+            [np.array(query_embeddings), *filter_params, vector_search_limit],
+        )
 
         vector_search_records = cursor.fetchall()
-        vector_search_records = _convert_records("vector_search", vector_search_records)
+        if exact_search:
+            cursor.execute("RESET enable_indexscan;")
+        vector_search_records = _convert_records(
+            "vector_search", vector_search_records, columns
+        )
         items.extend(vector_search_records)
 
         if hybrid_search:
             language = sql.Identifier(language_name)
+            tsvector = _get_tsvector_expression(workspace, language_name)
+
+            keyword_search_filters = sql.SQL("")
+            if filter_conditions:
+                keyword_search_filters = sql.SQL("AND ") + sql.SQL(" AND ").join(
+                    filter_conditions
+                )
 
             cursor.execute(
                 sql.SQL(
-                    """SELECT chunk_id, 
-                            workspace_id,
-                            document_id, 
-                            document_sub_id, 
-                            document_type,
-                            document_sub_type,
-                            path,
-                            language,
-                            title,
-                            content,
-                            content_complement,
-                            metadata,
-                            ts_rank_cd(to_tsvector('{language}', content), query) AS keyword_search_score
+                    """SELECT {columns},
+                            ts_rank_cd({tsvector}, query) AS keyword_search_score
                             FROM {table}, 
                             plainto_tsquery('{language}', %s) query 
-                            WHERE to_tsvector('{language}', content) @@ query 
+                            WHERE {tsvector} @@ query {filters}
                             ORDER BY keyword_search_score DESC 
                             LIMIT %s;"""
-                ).format(table=table_name, language=language),
-                [query, keyword_search_limit],
+                ).format(
+                    columns=select_columns,
+                    table=table_name,
+                    language=language,
+                    tsvector=tsvector,
+                    filters=keyword_search_filters,
+                ),
+                [query, *filter_params, keyword_search_limit],
             )
 
             keyword_search_records = cursor.fetchall()
             keyword_search_records = _convert_records(
-                "keyword_search", keyword_search_records
+                "keyword_search", keyword_search_records, columns
             )
             items.extend(keyword_search_records)
 
-    unique_items = dict({})
-    for item in items:
-        chunk_id = item["chunk_id"]
-
-        if chunk_id not in unique_items:
-            unique_items[chunk_id] = item
-        else:
-            current = unique_items[chunk_id]
-            for source in item["sources"]:
-                if source not in current["sources"]:
-                    current["sources"].append(source)
-            current["sources"] = sorted(current["sources"])
-
-            for source in current["sources"]:
-                if source not in item["sources"]:
-                    item["sources"].append(source)
-            item["sources"] = sorted(item["sources"])
-
-            if current["vector_search_score"] is None:
-                current["vector_search_score"] = item["vector_search_score"]
-            if current["keyword_search_score"] is None:
-                current["keyword_search_score"] = item["keyword_search_score"]
-
-            if item["vector_search_score"] is None:
-                item["vector_search_score"] = current["vector_search_score"]
-            if item["keyword_search_score"] is None:
-                item["keyword_search_score"] = current["keyword_search_score"]
-
-    unique_items = list(unique_items.values())
-    score_dict = dict({})
-    if len(unique_items) > 0:
-        passages = [record["content"] for record in unique_items]
-        passage_scores = genai_core.cross_encoder.rank_passages(
-            cross_encoder_model, query, passages
-        )
+        unique_items = dict({})
+        for item in items:
+            chunk_id = item["chunk_id"]
 
-        for i in range(len(unique_items)):
-            score = passage_scores[i]
-            unique_items[i]["score"] = score
-            score_dict[unique_items[i]["chunk_id"]] = score
-
-    unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
-
-    for record in vector_search_records:
-        record["score"] = score_dict[record["chunk_id"]]
-    for record in keyword_search_records:
-        record["score"] = score_dict[record["chunk_id"]]
-
-    if full_response:
-        unique_items = unique_items[:limit]
-        ret_value = {
-            "engine": "aurora",
-            "query_language": language_name,
-            "supported_languages": languages,
-            "detected_languages": detected_languages,
-            "items": convert_types(unique_items),
-            "vector_search_metric": metric,
-            "vector_search_items": convert_types(vector_search_records),
-            "keyword_search_items": convert_types(keyword_search_records),
-        }
-    else:
-        ret_items = list(filter(lambda val: val["score"] > threshold, unique_items))[
-            :limit
-        ]
-        if len(ret_items) < limit:
-            # inner product metric is negative hence we sort ascending
-            if metric == "inner":
-                unique_items = sorted(
-                    unique_items,
-                    key=lambda x: x["vector_search_score"] or 1,
-                    reverse=False,
-                )
-                ret_items = ret_items + (
-                    list(
-                        filter(
-                            lambda val: (val["vector_search_score"] or 1) < -0.5,
-                            unique_items,
-                        )
-                    )[: (limit - len(ret_items))]
-                )
+            if chunk_id not in unique_items:
+                unique_items[chunk_id] = item
             else:
-                unique_items = sorted(
-                    unique_items,
-                    key=lambda x: x["vector_search_score"] or -1,
-                    reverse=True,
-                )
-                ret_items = ret_items + (
-                    list(
-                        filter(
-                            lambda val: (val["vector_search_score"] or -1) > 0.5,
-                            unique_items,
-                        )
-                    )[: (limit - len(ret_items))]
-                )
+                current = unique_items[chunk_id]
+                for source in item["sources"]:
+                    if source not in current["sources"]:
+                        current["sources"].append(source)
+                current["sources"] = sorted(current["sources"])
+
+                for source in current["sources"]:
+                    if source not in item["sources"]:
+                        item["sources"].append(source)
+                item["sources"] = sorted(item["sources"])
+
+                if current["vector_search_score"] is None:
+                    current["vector_search_score"] = item["vector_search_score"]
+                if current["keyword_search_score"] is None:
+                    current["keyword_search_score"] = item["keyword_search_score"]
+
+                if item["vector_search_score"] is None:
+                    item["vector_search_score"] = current["vector_search_score"]
+                if item["keyword_search_score"] is None:
+                    item["keyword_search_score"] = current["keyword_search_score"]
+
+        unique_items = list(unique_items.values())
+        first_stage_scores = genai_core.rerank.fuse_ranks(
+            vector_search_records, keyword_search_records
+        )
+        for item in unique_items:
+            item["score"] = first_stage_scores[item["chunk_id"]]
+        unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
 
-        ret_value = {
-            "engine": "aurora",
-            "query_language": language_name,
-            "supported_languages": languages,
-            "detected_languages": detected_languages,
-            "items": convert_types(ret_items),
-        }
+        unique_items, rerank_mode = genai_core.rerank.rerank_items(
+            cross_encoder_model, query, unique_items, rerank_options
+        )
+        score_dict = {item["chunk_id"]: item["score"] for item in unique_items}
+
+        for record in vector_search_records:
+            record["score"] = score_dict[record["chunk_id"]]
+        for record in keyword_search_records:
+            record["score"] = score_dict[record["chunk_id"]]
+
+        if full_response:
+            unique_items = unique_items[:limit]
+            ret_value = {
+                "engine": "aurora",
+                "query_language": language_name,
+                "supported_languages": languages,
+                "detected_languages": detected_languages,
+                "items": convert_types(unique_items),
+                "vector_search_metric": metric,
+                "rerank_mode": rerank_mode,
+                "vector_search_items": convert_types(vector_search_records),
+                "keyword_search_items": convert_types(keyword_search_records),
+            }
+        else:
+            ret_items = genai_core.rerank.filter_by_threshold(unique_items, threshold)[
+                :limit
+            ]
+            if len(ret_items) < limit:
+                # inner product metric is negative hence we sort ascending
+                if metric == "inner":
+                    unique_items = sorted(
+                        unique_items,
+                        key=lambda x: x["vector_search_score"] or 1,
+                        reverse=False,
+                    )
+                    ret_items = ret_items + (
+                        list(
+                            filter(
+                                lambda val: (val["vector_search_score"] or 1) < -0.5,
+                                unique_items,
+                            )
+                        )[: (limit - len(ret_items))]
+                    )
+                else:
+                    unique_items = sorted(
+                        unique_items,
+                        key=lambda x: x["vector_search_score"] or -1,
+                        reverse=True,
+                    )
+                    ret_items = ret_items + (
+                        list(
+                            filter(
+                                lambda val: (val["vector_search_score"] or -1) > 0.5,
+                                unique_items,
+                            )
+                        )[: (limit - len(ret_items))]
+                    )
+
+            if lazy_columns:
+                _load_lazy_columns(cursor, table_name, workspace_id, ret_items)
+
+            ret_value = {
+                "engine": "aurora",
+                "query_language": language_name,
+                "supported_languages": languages,
+                "detected_languages": detected_languages,
+                "rerank_mode": rerank_mode,
+                "items": convert_types(ret_items),
+            }
 
     logger.info(ret_value)
 
     return ret_value
 
 
-def _convert_records(source: str, records: List[dict]):
+def _get_filter_conditions(filters: Optional[SearchFilter]):
+    conditions = []
+    params = []
+
+    if filters is None:
+        return conditions, params
+
+    if filters.document_ids is not None:
+        try:
+            document_ids = [str(uuid.UUID(value)) for value in filters.document_ids]
+        except ValueError:
+            raise CommonError("Invalid document id in filter")
+
+        conditions.append(sql.SQL("document_id = ANY(%s::uuid[])"))
+        params.append(document_ids)
+
+    if filters.document_types is not None:
+        conditions.append(sql.SQL("document_type = ANY(%s)"))
+        params.append(filters.document_types)
+
+    if filters.document_sub_types is not None:
+        conditions.append(sql.SQL("document_sub_type = ANY(%s)"))
+        params.append(filters.document_sub_types)
+
+    if filters.path_prefix:
+        escaped_prefix = (
+            filters.path_prefix.replace("\\", "\\\\")
+            .replace("%", "\\%")
+            .replace("_", "\\_")
+        )
+        conditions.append(sql.SQL("path LIKE %s"))
+        params.append(f"{escaped_prefix}%")
+
+    return conditions, params
+
+
+def _get_tsvector_expression(workspace: dict, language_name: str):
+    # Tables created or migrated with stored tsvector columns have one
+    # column per workspace language, shared tables only for the languages
+    # they were created with. Older tables (and other languages) fall back
+    # to parsing content.
+    tsvector_languages = workspace.get(
+        "tsvector_languages", workspace.get("languages", [])
+    )
+    if workspace.get("tsvector_columns", False) and language_name in (
+        tsvector_languages
+    ):
+        return sql.Identifier(get_tsvector_column(language_name))
+
+    return sql.SQL("to_tsvector('{language}', content)").format(
+        language=sql.Identifier(language_name)
+    )
+
+
+def _load_lazy_columns(
+    cursor, table_name: sql.Identifier, workspace_id: str, items: List[dict]
+):
+    if len(items) == 0:
+        return
+
+    chunk_ids = list(set([item["chunk_id"] for item in items]))
+    cursor.execute(
+        sql.SQL(
+            """SELECT chunk_id, {columns} FROM {table}
+                WHERE workspace_id = %s AND chunk_id = ANY(%s);"""
+        ).format(
+            columns=sql.SQL(", ").join(map(sql.Identifier, LAZY_COLUMNS)),
+            table=table_name,
+        ),
+        [workspace_id, chunk_ids],
+    )
+
+    lazy_values = dict({})
+    for record in cursor.fetchall():
+        lazy_values[record[0]] = record[1:]
+
+    for item in items:
+        values = lazy_values.get(item["chunk_id"])
+        if values is None:
+            continue
+
+        for idx, column in enumerate(LAZY_COLUMNS):
+            item[column] = values[idx]
+
+
+def _estimate_filtered_rows(
+    cursor,
+    table_name: sql.Identifier,
+    workspace_id: str,
+    filter_conditions: List[sql.Composable],
+    filter_params: list,
+):
+    """
+    Returns the planner estimate of the rows matching the filters and the
+    row count of the table, or shared table partition, the vector index
+    scans.
+    """
+    cursor.execute(
+        sql.SQL(
+            "EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {conditions};"
+        ).format(
+            table=table_name,
+            conditions=sql.SQL(" AND ").join(filter_conditions),
+        ),
+        filter_params,
+    )
+    matching_rows = cursor.fetchone()[0][0]["Plan"]["Plan Rows"]
+
+    cursor.execute(
+        sql.SQL(
+            """SELECT reltuples FROM pg_class WHERE oid = (
+                SELECT tableoid FROM {table} WHERE workspace_id = %s LIMIT 1
+            );"""
+        ).format(table=table_name),
+        [workspace_id],
+    )
+    row = cursor.fetchone()
+    # reltuples is -1 until the table is analyzed
+    index_rows = row[0] if row is not None else 0
+
+    return matching_rows, index_rows
+
+
+def _convert_records(source: str, records: List[dict], columns: List[str]):
     converted_records = []
     for record in records:
-        converted = {
-            "chunk_id": record[0],
-            "workspace_id": record[1],
-            "document_id": record[2],
-            "document_sub_id": record[3],
-            "document_type": record[4],
-            "document_sub_type": record[5],
-            "path": record[6],
-            "language": record[7],
-            "title": record[8],
-            "content": record[9],
-            "content_complement": record[10],
-            "metadata": record[11],
-            "sources": [source],
-            "score": None,
-        }
+        converted = {column: None for column in RECORD_COLUMNS}
+        for idx, column in enumerate(columns):
+            converted[column] = record[idx]
+
+        converted["sources"] = [source]
+        converted["score"] = None
+        score = record[len(columns)]
 
         if source == "vector_search":
-            converted["vector_search_score"] = record[12]
+            converted["vector_search_score"] = score
             converted["keyword_search_score"] = None
         elif source == "keyword_search":
-            converted["keyword_search_score"] = record[12]
+            converted["keyword_search_score"] = score
             converted["vector_search_score"] = None
         else:
             raise CommonError("Unknown source")
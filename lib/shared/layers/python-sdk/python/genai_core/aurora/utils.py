@@ -10,3 +10,35 @@ def convert_types(data):
         return str(data)
     else:
         return data
+
+
+def get_tsvector_column(language: str):
+    return f"content_tsv_{language}"
+
+
+def get_tsvector_index(table_name: str, language: str):
+    return f"{table_name}_{get_tsvector_column(language)}_idx"
+
+
+STORAGE_LAYOUT_TABLE = "table"
+STORAGE_LAYOUT_PARTITIONED = "partitioned"
+
+# Number of hash partitions of each shared chunks table.
+PARTITIONS_COUNT = 16
+
+
+def is_partitioned(workspace: dict):
+    return workspace.get("storage_layout", STORAGE_LAYOUT_TABLE) == (
+        STORAGE_LAYOUT_PARTITIONED
+    )
+
+
+def get_table_name(workspace: dict):
+    # Partitioned workspaces share one chunks table per embeddings dimension
+    # (the vector column type is fixed per table), hash partitioned by
+    # workspace_id. Other workspaces have a table of their own.
+    if is_partitioned(workspace):
+        dimensions = int(workspace["embeddings_model_dimensions"])
+        return f"workspace_chunks_{dimensions}"
+
+    return workspace["workspace_id"].replace("-", "")
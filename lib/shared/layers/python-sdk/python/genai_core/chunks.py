@@ -1,16 +1,29 @@
 import os
+import gzip
+import json
 import uuid
 import boto3
 import genai_core.documents
 import genai_core.embeddings
 import genai_core.aurora.chunks
 import genai_core.opensearch.chunks
+import genai_core.splitters
+import genai_core.utils.pipeline
 from genai_core.types import CommonError,Task
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 PROCESSING_BUCKET_NAME = os.environ.get("PROCESSING_BUCKET_NAME", "")
-s3 = boto3.resource("s3")
+# Chunks are stored in packs, a pack holds the chunks of one add_chunks call
+# (of one batch when pipelined) as JSON lines, each compressed as its own
+# gzip member (so the pack is a valid gzip file), next to an index of the
+# byte range of every chunk.
+CHUNKS_PACK_EXTENSION = ".jsonl.gz"
+CHUNKS_INDEX_EXTENSION = ".index.json"
+# Chunks embedded per request, and per pipeline batch in add_chunks
+EMBEDDINGS_BATCH_SIZE = 50
+
+s3_client = boto3.client("s3")
 
 
 def add_chunks(
@@ -22,85 +35,342 @@ def add_chunks(
     chunk_complements: List[str],
     path: Optional[str] = None,
 ):
+    """
+    Embeds and stores the chunks of a document. Documents with more than one
+    embeddings batch are pipelined: while a batch is embedded the previous
+    one is written to the vector store and the chunk texts to S3. Replacing
+    chunks of unversioned Aurora tables needs a single transaction, those
+    are still embedded first and written at once.
+    """
+    if len(chunks) > EMBEDDINGS_BATCH_SIZE and _can_pipeline(workspace, replace):
+        complements_len = len(chunk_complements) if chunk_complements else 0
+        batches = (
+            (
+                chunks[idx : idx + EMBEDDINGS_BATCH_SIZE],
+                chunk_complements[idx : idx + EMBEDDINGS_BATCH_SIZE]
+                if idx < complements_len
+                else None,
+            )
+            for idx in range(0, len(chunks), EMBEDDINGS_BATCH_SIZE)
+        )
+
+        return _add_chunk_batches(
+            replace, workspace, document, document_sub_id, batches, [], path
+        )
+
+    workspace_id = workspace["workspace_id"]
+    document_id = document["document_id"]
+    document_type = document["document_type"]
+    document_sub_type = document["document_sub_type"]
+    path = path if path else document["path"]
+    title = document["title"]
+
+    embeddings_model = _get_embeddings_model(workspace)
+    chunk_embeddings = genai_core.embeddings.generate_embeddings(
+        embeddings_model, chunks, Task.STORE.value
+    )
+    chunk_ids = [uuid.uuid4() for _ in chunks]
+
+    pack_id = store_chunks_on_s3(
+        workspace_id, document_id, document_sub_id, chunk_ids, chunks
+    )
+
+    result = _add_chunks_to_engine(
+        workspace=workspace,
+        document_id=document_id,
+        document_sub_id=document_sub_id,
+        document_type=document_type,
+        document_sub_type=document_sub_type,
+        path=path,
+        title=title,
+        chunk_ids=chunk_ids,
+        chunk_embeddings=chunk_embeddings,
+        chunks=chunks,
+        chunk_complements=chunk_complements,
+        replace=replace,
+    )
+
+    if replace:
+        _clean_chunks_on_s3(workspace_id, document_id, document_sub_id, [pack_id])
+
+    added_vectors = result["added_vectors"]
+    genai_core.documents.set_document_vectors(
+        workspace_id, document_id, added_vectors, replace=replace
+    )
+
+
+def add_chunks_stream(
+    replace: bool,
+    workspace: dict,
+    document: dict,
+    document_sub_id: Optional[str],
+    texts: Iterable[str],
+    path: Optional[str] = None,
+):
+    """
+    Adds the chunks of a document whose text arrives as a stream of windows.
+    Extraction (iterating texts) and splitting run as two more stages in
+    front of the add_chunks pipeline, every window of chunks is committed on
+    its own, so memory use does not grow with the size of the document.
+    """
+
+    def split(windows):
+        for chunks in split_content_stream(workspace, windows):
+            yield chunks, None
+
+    return _add_chunk_batches(
+        replace, workspace, document, document_sub_id, texts, [split], path
+    )
+
+
+def _can_pipeline(workspace: dict, replace: bool):
+    if workspace["engine"] != "aurora" or not replace:
+        return True
+
+    return workspace.get("versioned_chunks", False)
+
+
+def _add_chunk_batches(
+    replace: bool,
+    workspace: dict,
+    document: dict,
+    document_sub_id: Optional[str],
+    source: Iterable,
+    source_stages: list,
+    path: Optional[str] = None,
+):
+    """
+    Runs source_stages, which turn source into batches of (chunks,
+    chunk_complements), then the S3, embeddings and vector store writers as
+    concurrent stages connected by bounded queues. Every batch is committed
+    on its own. When replacing, versioned Aurora workspaces keep the previous
+    chunks until the last batch is stored (and drop the new ones if a stage
+    fails), other engines remove them up front.
+    """
     workspace_id = workspace["workspace_id"]
     engine = workspace["engine"]
-    embeddings_model_provider = workspace["embeddings_model_provider"]
-    embeddings_model_name = workspace["embeddings_model_name"]
     document_id = document["document_id"]
     document_type = document["document_type"]
     document_sub_type = document["document_sub_type"]
     path = path if path else document["path"]
     title = document["title"]
 
+    embeddings_model = _get_embeddings_model(workspace)
+
+    ingest_version = None
+    versioned_chunks = engine == "aurora" and workspace.get("versioned_chunks", False)
+    if versioned_chunks:
+        ingest_version = genai_core.aurora.chunks.get_ingest_version()
+    elif replace:
+        _clean_chunks(workspace, document_id)
+
+    pack_ids = []
+
+    def store_on_s3(batches):
+        for chunks, chunk_complements in batches:
+            chunk_ids = [uuid.uuid4() for _ in chunks]
+            pack_ids.append(
+                store_chunks_on_s3(
+                    workspace_id, document_id, document_sub_id, chunk_ids, chunks
+                )
+            )
+
+            yield chunk_ids, chunks, chunk_complements
+
+    def embed(batches):
+        for chunk_ids, chunks, chunk_complements in batches:
+            chunk_embeddings = genai_core.embeddings.generate_embeddings(
+                embeddings_model, chunks, Task.STORE.value
+            )
+
+            yield chunk_ids, chunks, chunk_complements, chunk_embeddings
+
+    def store(batches):
+        for chunk_ids, chunks, chunk_complements, chunk_embeddings in batches:
+            result = _add_chunks_to_engine(
+                workspace=workspace,
+                document_id=document_id,
+                document_sub_id=document_sub_id,
+                document_type=document_type,
+                document_sub_type=document_sub_type,
+                path=path,
+                title=title,
+                chunk_ids=chunk_ids,
+                chunk_embeddings=chunk_embeddings,
+                chunks=chunks,
+                chunk_complements=chunk_complements,
+                replace=False,
+                ingest_version=ingest_version,
+            )
+
+            yield result["added_vectors"]
+
+    try:
+        added_vectors = sum(
+            genai_core.utils.pipeline.run_pipeline(
+                source, [*source_stages, store_on_s3, embed, store]
+            )
+        )
+    except Exception:
+        if versioned_chunks:
+            try:
+                genai_core.aurora.chunks.delete_chunks_with_retries(
+                    workspace, document_id=document_id, ingest_version=ingest_version
+                )
+            except Exception as error:
+                # The import error is the one raised, these chunks are
+                # removed when the document is imported again
+                print(f"Chunks of the failed import were not removed: {error}")
+
+        raise
+
+    if replace and versioned_chunks:
+        genai_core.aurora.chunks.delete_previous_chunks_aurora(
+            workspace, document_id, ingest_version
+        )
+    if replace:
+        _clean_chunks_on_s3(workspace_id, document_id, document_sub_id, pack_ids)
+
+    genai_core.documents.set_document_vectors(
+        workspace_id, document_id, added_vectors, replace=replace
+    )
+
+
+def _get_embeddings_model(workspace: dict):
     embeddings_model = genai_core.embeddings.get_embeddings_model(
-        embeddings_model_provider, embeddings_model_name
+        workspace["embeddings_model_provider"], workspace["embeddings_model_name"]
     )
 
     if embeddings_model is None:
         raise CommonError("Embeddings model not found")
 
-    chunk_embeddings = genai_core.embeddings.generate_embeddings(
-        embeddings_model, chunks, Task.STORE.value
-    )
-    chunk_ids = [uuid.uuid4() for _ in chunks]
+    return embeddings_model
 
-    store_chunks_on_s3(workspace_id, document_id, document_sub_id, chunk_ids, chunks)
+
+def _add_chunks_to_engine(
+    workspace: dict, ingest_version: Optional[int] = None, **kwargs
+):
+    engine = workspace["engine"]
 
     if engine == "aurora":
-        result = genai_core.aurora.chunks.add_chunks_aurora(
-            workspace_id=workspace_id,
-            document_id=document_id,
-            document_sub_id=document_sub_id,
-            document_type=document_type,
-            document_sub_type=document_sub_type,
-            path=path,
-            title=title,
-            chunk_ids=chunk_ids,
-            chunk_embeddings=chunk_embeddings,
-            chunks=chunks,
-            chunk_complements=chunk_complements,
-            replace=replace,
+        return genai_core.aurora.chunks.add_chunks_aurora(
+            workspace=workspace, ingest_version=ingest_version, **kwargs
         )
     elif engine == "opensearch":
-        result = genai_core.opensearch.chunks.add_chunks_open_search(
-            workspace_id=workspace_id,
-            document_id=document_id,
-            document_sub_id=document_sub_id,
-            document_type=document_type,
-            document_sub_type=document_sub_type,
-            path=path,
-            title=title,
-            chunk_ids=chunk_ids,
-            chunk_embeddings=chunk_embeddings,
-            chunks=chunks,
-            chunk_complements=chunk_complements,
-            replace=replace,
+        return genai_core.opensearch.chunks.add_chunks_open_search(
+            workspace=workspace, **kwargs
         )
-    else:
-        raise CommonError("Engine not supported")
 
-    added_vectors = result["added_vectors"]
-    genai_core.documents.set_document_vectors(
-        workspace_id, document_id, added_vectors, replace=replace
-    )
+    raise CommonError("Engine not supported")
+
+
+def _clean_chunks(workspace: dict, document_id: str):
+    engine = workspace["engine"]
+
+    if engine == "aurora":
+        return genai_core.aurora.chunks.clean_chunks_aurora(workspace, document_id)
+    elif engine == "opensearch":
+        return genai_core.opensearch.chunks.clean_chunks_open_search(
+            workspace, document_id
+        )
+
+    raise CommonError("Engine not supported")
+
+
+def _clean_chunks_on_s3(
+    workspace_id: str,
+    document_id: str,
+    document_sub_id: Optional[str],
+    pack_ids: List[Optional[str]],
+):
+    """
+    Removes the chunks stored on S3 for the document except the packs of the
+    current import: packs of earlier or failed imports, and chunks stored as
+    one object each by previous versions. The chunks are already replaced in
+    the vector store, objects left behind are removed by the next replace.
+    """
+    chunks_prefix = _get_chunks_prefix(workspace_id, document_id, document_sub_id)
+
+    try:
+        keys = [
+            key
+            for key in _list_chunk_keys(chunks_prefix)
+            if key[len(chunks_prefix) :].split(".")[0] not in pack_ids
+        ]
+
+        for idx in range(0, len(keys), 1000):
+            s3_client.delete_objects(
+                Bucket=PROCESSING_BUCKET_NAME,
+                Delete={"Objects": [{"Key": key} for key in keys[idx : idx + 1000]]},
+            )
+    except Exception as error:
+        print(f"Previous chunks of {document_id} were not removed from S3: {error}")
 
 
 def split_content(workspace: dict, content: str):
+    text_splitter = _get_text_splitter(workspace)
+
+    return _split_text(text_splitter, content)
+
+
+def split_content_stream(workspace: dict, texts: Iterable[str]):
+    """
+    Splits text arriving in windows and yields the chunks of every window.
+    The text of the last chunk of a window is carried over to the next one,
+    so chunks never end at a window boundary. The next window starts where
+    that chunk started, inside the overlap with the chunk before it, so the
+    chunks at window boundaries overlap as when splitting the whole text.
+    """
+    text_splitter = _get_text_splitter(workspace)
+
+    carry = ""
+    for text in texts:
+        window = carry + text
+        chunks = text_splitter.split_text(window)
+        if len(chunks) == 0:
+            carry = ""
+            continue
+
+        # The raw tail keeps the whitespace the splitter strips. Chunks are
+        # substrings of the window, the last one ends with it (but for
+        # whitespace), so its rightmost occurrence is where it started.
+        last_chunk = chunks.pop()
+        start = window.rfind(last_chunk)
+        carry = window[start:] if start >= 0 else last_chunk
+        if len(chunks) > 0:
+            yield _clean_chunk_texts(chunks)
+
+    if carry:
+        chunks = text_splitter.split_text(carry)
+        if len(chunks) > 0:
+            yield _clean_chunk_texts(chunks)
+
+
+def _get_text_splitter(workspace: dict):
     chunking_strategy = workspace["chunking_strategy"]
     chunk_size = workspace["chunk_size"]
     chunk_overlap = workspace["chunk_overlap"]
 
     if chunking_strategy == "recursive":
-        text_splitter = RecursiveCharacterTextSplitter(
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
         )
+    elif chunking_strategy == "linear":
+        return genai_core.splitters.LinearTextSplitter(chunk_size, chunk_overlap)
+    elif chunking_strategy == "linear_tokens":
+        return genai_core.splitters.LinearTextSplitter(
+            chunk_size, chunk_overlap, use_tokens=True
+        )
 
-        text_data = text_splitter.split_text(content)
-        text_data = [text.replace("\x00", "\uFFFD") for text in text_data]
+    raise CommonError("Chunking strategy not supported")
 
-        return text_data
 
-    raise CommonError("Chunking strategy not supported")
+def _split_text(text_splitter, content: str):
+    return _clean_chunk_texts(text_splitter.split_text(content))
+
+
+def _clean_chunk_texts(chunks: List[str]):
+    return [text.replace("\x00", "\uFFFD") for text in chunks]
 
 
 def store_chunks_on_s3(
@@ -110,11 +380,130 @@ def store_chunks_on_s3(
     chunk_ids: List[str],
     chunks: List[str],
 ):
+    if len(chunk_ids) == 0:
+        return None
+
+    chunks_prefix = _get_chunks_prefix(workspace_id, document_id, document_sub_id)
+    pack_id = str(uuid.uuid4())
+
+    members = []
+    index = dict({})
+    offset = 0
     for chunk_id, chunk in zip(chunk_ids, chunks):
-        path = f"{workspace_id}/{document_id}/chunks/{chunk_id}.txt"
-        if document_sub_id:
-            path = (
-                f"{workspace_id}/{document_id}/{document_sub_id}/chunks/{chunk_id}.txt"
-            )
+        line = json.dumps({"chunk_id": str(chunk_id), "content": chunk}) + "\n"
+        member = gzip.compress(line.encode("utf-8"))
+        index[str(chunk_id)] = [offset, len(member)]
+        members.append(member)
+        offset += len(member)
+
+    s3_client.put_object(
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=f"{chunks_prefix}{pack_id}{CHUNKS_PACK_EXTENSION}",
+        Body=b"".join(members),
+        ContentType="application/gzip",
+    )
+
+    # Written last, a pack is only visible to readers once it is complete
+    s3_client.put_object(
+        Bucket=PROCESSING_BUCKET_NAME,
+        Key=f"{chunks_prefix}{pack_id}{CHUNKS_INDEX_EXTENSION}",
+        Body=json.dumps(index),
+        ContentType="application/json",
+    )
+
+    return pack_id
+
+
+def get_chunk_from_s3(
+    workspace_id: str,
+    document_id: str,
+    document_sub_id: Optional[str],
+    chunk_id: str,
+):
+    """
+    Returns the content of a chunk stored on S3, or None when it is not
+    found. Packed chunks are read with a ranged request, chunks stored as
+    one object each (the previous layout) are read directly.
+    """
+    chunks_prefix = _get_chunks_prefix(workspace_id, document_id, document_sub_id)
+    chunk_id = str(chunk_id)
+
+    for pack_key, index in _list_chunk_packs(chunks_prefix):
+        if chunk_id not in index:
+            continue
+
+        offset, length = index[chunk_id]
+        response = s3_client.get_object(
+            Bucket=PROCESSING_BUCKET_NAME,
+            Key=pack_key,
+            Range=f"bytes={offset}-{offset + length - 1}",
+        )
+
+        return _read_pack_lines(response["Body"].read())[0]["content"]
+
+    try:
+        response = s3_client.get_object(
+            Bucket=PROCESSING_BUCKET_NAME, Key=f"{chunks_prefix}{chunk_id}.txt"
+        )
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+    return response["Body"].read().decode("utf-8")
+
+
+def list_chunks_from_s3(
+    workspace_id: str, document_id: str, document_sub_id: Optional[str]
+):
+    """
+    Yields the chunk_id and content of every chunk stored on S3 for the
+    document, from packs and from the previous one object per chunk layout.
+    """
+    chunks_prefix = _get_chunks_prefix(workspace_id, document_id, document_sub_id)
+
+    for pack_key, _ in _list_chunk_packs(chunks_prefix):
+        response = s3_client.get_object(Bucket=PROCESSING_BUCKET_NAME, Key=pack_key)
+        for line in _read_pack_lines(response["Body"].read()):
+            yield line["chunk_id"], line["content"]
+
+    for key in _list_chunk_keys(chunks_prefix):
+        if key.endswith(".txt"):
+            response = s3_client.get_object(Bucket=PROCESSING_BUCKET_NAME, Key=key)
+            chunk_id = key[len(chunks_prefix) : -len(".txt")]
+
+            yield chunk_id, response["Body"].read().decode("utf-8")
+
+
+def _get_chunks_prefix(
+    workspace_id: str, document_id: str, document_sub_id: Optional[str]
+):
+    if document_sub_id:
+        return f"{workspace_id}/{document_id}/{document_sub_id}/chunks/"
+
+    return f"{workspace_id}/{document_id}/chunks/"
+
+
+def _list_chunk_keys(chunks_prefix: str):
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=PROCESSING_BUCKET_NAME, Prefix=chunks_prefix, Delimiter="/"
+    ):
+        for item in page.get("Contents", []):
+            yield item["Key"]
+
+
+def _list_chunk_packs(chunks_prefix: str):
+    for key in _list_chunk_keys(chunks_prefix):
+        if not key.endswith(CHUNKS_INDEX_EXTENSION):
+            continue
+
+        response = s3_client.get_object(Bucket=PROCESSING_BUCKET_NAME, Key=key)
+        index = json.loads(response["Body"].read())
+        pack_key = key[: -len(CHUNKS_INDEX_EXTENSION)] + CHUNKS_PACK_EXTENSION
+
+        yield pack_key, index
+
+
+def _read_pack_lines(data: bytes):
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
 
-        s3.Object(PROCESSING_BUCKET_NAME, path).put(Body=chunk)
+    return [json.loads(line) for line in lines if line]
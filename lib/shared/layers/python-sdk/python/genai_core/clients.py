@@ -1,12 +1,112 @@
 import boto3
 import openai
+import threading
+import botocore.session
 import genai_core.types
 import genai_core.parameters
+from typing import Optional
+from datetime import timezone
 from botocore.config import Config
+from botocore.credentials import CredentialProvider, RefreshableCredentials
 
+# Sized for the thread pools sharing a client (reranking, federated search)
+MAX_POOL_CONNECTIONS = 16
+ASSUMED_ROLE_DURATION_SECONDS = 3600
 
 sts_client = boto3.client("sts")
 
+_clients = dict({})
+_sessions = dict({})
+# Reentrant, get_client holds it while _get_session takes it as well
+_clients_lock = threading.RLock()
+
+
+def get_client(
+    service_name: str,
+    region_name: Optional[str] = None,
+    role_arn: Optional[str] = None,
+    config: Optional[Config] = None,
+):
+    """
+    Returns a client shared by the whole process for the service, region
+    and role. Clients for a role use credentials that are assumed again
+    before they expire. The config of the first call for a key is used.
+    """
+    key = (service_name, region_name, role_arn)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client_config = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+            if config is not None:
+                client_config = client_config.merge(config)
+
+            session = _get_session(role_arn)
+            client = session.client(
+                service_name, region_name=region_name, config=client_config
+            )
+            _clients[key] = client
+
+    return client
+
+
+class AssumeRoleCredentialProvider(CredentialProvider):
+    METHOD = "sts-assume-role"
+
+    def __init__(self, role_arn: str):
+        super().__init__()
+        self.role_arn = role_arn
+
+    def load(self):
+        return RefreshableCredentials.create_from_metadata(
+            metadata=_assume_role(self.role_arn),
+            refresh_using=lambda: _assume_role(self.role_arn),
+            method=self.METHOD,
+        )
+
+
+def _get_session(role_arn: Optional[str]):
+    if not role_arn:
+        return boto3.Session()
+
+    session = _sessions.get(role_arn)
+    if session is not None:
+        return session
+
+    with _clients_lock:
+        session = _sessions.get(role_arn)
+        if session is None:
+            # The role comes first in the credential chain of the session
+            botocore_session = botocore.session.get_session()
+            resolver = botocore_session.get_component("credential_provider")
+            resolver.insert_before("env", AssumeRoleCredentialProvider(role_arn))
+
+            session = boto3.Session(botocore_session=botocore_session)
+            _sessions[role_arn] = session
+
+    return session
+
+
+def _assume_role(role_arn: str):
+    response = sts_client.assume_role(
+        RoleArn=role_arn,
+        RoleSessionName="AssumedRoleSession",
+        DurationSeconds=ASSUMED_ROLE_DURATION_SECONDS,
+    )
+
+    credentials = response["Credentials"]
+    expiry_time = credentials["Expiration"].astimezone(timezone.utc)
+
+    return {
+        "access_key": credentials["AccessKeyId"],
+        "secret_key": credentials["SecretAccessKey"],
+        "token": credentials["SessionToken"],
+        "expiry_time": expiry_time.isoformat(),
+    }
+
 
 def get_openai_client():
     api_key = genai_core.parameters.get_external_api_key("OPENAI_API_KEY")
@@ -21,7 +121,7 @@ def get_openai_client():
 def get_sagemaker_client():
     config = Config(retries={"max_attempts": 15, "mode": "adaptive"})
 
-    client = boto3.client("sagemaker-runtime", config=config)
+    client = get_client("sagemaker-runtime", config=config)
 
     return client
 
@@ -33,22 +133,7 @@ def get_bedrock_client(service_name="bedrock-runtime"):
     if not bedrock_enabled:
         return None
 
-    bedrock_config_data = {"service_name": service_name}
     region_name = bedrock_config.get("region")
     role_arn = bedrock_config.get("roleArn")
 
-    if region_name:
-        bedrock_config_data["region_name"] = region_name
-
-    if role_arn:
-        assumed_role_object = sts_client.assume_role(
-            RoleArn=role_arn,
-            RoleSessionName="AssumedRoleSession",
-        )
-
-        credentials = assumed_role_object["Credentials"]
-        bedrock_config_data["aws_access_key_id"] = credentials["AccessKeyId"]
-        bedrock_config_data["aws_secret_access_key"] = credentials["SecretAccessKey"]
-        bedrock_config_data["aws_session_token"] = credentials["SessionToken"]
-
-    return boto3.client(**bedrock_config_data)
+    return get_client(service_name, region_name=region_name, role_arn=role_arn)
@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import uuid
 import boto3
 from boto3.dynamodb.conditions import Attr, Key
@@ -7,10 +8,14 @@ import botocore
 import feedparser
 import genai_core.types
 import genai_core.chunks
+import genai_core.kendra.ingestion
+import genai_core.kendra.data_sync
 import genai_core.websites
 import genai_core.utils.json
 import genai_core.workspaces
+import genai_core.parameters
 import genai_core.utils.files
+from aws_lambda_powertools.metrics import MetricUnit, single_metric
 from typing import Optional
 from datetime import datetime
 import hashlib
@@ -33,6 +38,20 @@ DOCUMENTS_BY_STATUS_INDEX = os.environ.get("DOCUMENTS_BY_STATUS_INDEX", "")
 
 WORKSPACE_OBJECT_TYPE = "workspace"
 
+# Small plain text documents are split, embedded and stored right away by
+# the function that receives them, anything else goes to the import workflow
+INLINE_IMPORT_EXTENSIONS = [".txt", ".md"]
+DEFAULT_INLINE_IMPORT_MAX_BYTES = 256 * 1024
+IMPORT_PATH_INLINE = "inline"
+IMPORT_PATH_WORKFLOW = "workflow"
+IMPORT_PATH_UNCHANGED = "unchanged"
+IMPORT_METRICS_NAMESPACE = "GenAIChatbot/DocumentImports"
+# An import still submitted or processing after these many seconds (the
+# file import workflow timeout and the upload handler timeout) is
+# considered dead, and the same content can be submitted again
+IMPORT_WORKFLOW_TIMEOUT = 12 * 60 * 60
+INLINE_IMPORT_TIMEOUT = 15 * 60
+
 s3 = boto3.resource("s3")
 s3_client = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
@@ -230,6 +249,7 @@ def create_document(
     sub_documents: int = 0,
     content: Optional[str] = None,
     content_complement: Optional[str] = None,
+    fingerprint: Optional[str] = None,
     **kwargs,
 ):
     timestamp = _get_timestamp()
@@ -261,22 +281,59 @@ def create_document(
         current_size_in_bytes = document["size_in_bytes"]
         current_vectors = document["vectors"]
 
-        response = documents_table.update_item(
-            Key={
-                "workspace_id": workspace_id,
-                "document_id": document_id,
-            },
-            UpdateExpression="SET compound_sort_key=:compoundKeyValue, #status=:statusValue, size_in_bytes=:sizeValue, vectors=:vectorsValue, updated_at=:timestampValue",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={
-                ":compoundKeyValue": f"{document_type}/{path}",
-                ":statusValue": "submitted",
-                ":sizeValue": size_in_bytes,
-                ":vectorsValue": 0,
-                ":timestampValue": timestamp,
-            },
-            ReturnValues="ALL_NEW",
-        )
+        update_expression = "SET compound_sort_key=:compoundKeyValue, #status=:statusValue, size_in_bytes=:sizeValue, vectors=:vectorsValue, updated_at=:timestampValue"
+        condition_expression = None
+        expression_values = {
+            ":compoundKeyValue": f"{document_type}/{path}",
+            ":statusValue": "submitted",
+            ":sizeValue": size_in_bytes,
+            ":vectorsValue": 0,
+            ":timestampValue": timestamp,
+        }
+
+        if fingerprint:
+            # Same content is skipped once imported, or while its import is
+            # running. An import failing or dying without updating the status
+            # lets the content through again once its deadline has passed.
+            # The check is part of the write, so concurrent uploads of the
+            # same content import it once.
+            now = int(time.time())
+            update_expression += (
+                ", fingerprint=:fingerprintValue, import_expires_at=:expiresValue"
+            )
+            condition_expression = "attribute_not_exists(fingerprint) OR fingerprint <> :fingerprintValue OR NOT (#status = :processedValue OR (#status IN (:submittedValue, :processingValue) AND import_expires_at > :nowValue))"
+            expression_values[":fingerprintValue"] = fingerprint
+            expression_values[":expiresValue"] = now + IMPORT_WORKFLOW_TIMEOUT
+            expression_values[":processedValue"] = "processed"
+            expression_values[":submittedValue"] = "submitted"
+            expression_values[":processingValue"] = "processing"
+            expression_values[":nowValue"] = now
+        else:
+            update_expression += " REMOVE fingerprint, import_expires_at"
+
+        update_params = {}
+        if condition_expression:
+            update_params["ConditionExpression"] = condition_expression
+
+        try:
+            response = documents_table.update_item(
+                Key={
+                    "workspace_id": workspace_id,
+                    "document_id": document_id,
+                },
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues=expression_values,
+                ReturnValues="ALL_NEW",
+                **update_params,
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+
+            return _skip_unchanged_document(
+                workspace_id, document_id, size_in_bytes, timestamp
+            )
 
         document = response["Attributes"]
     else:
@@ -306,6 +363,9 @@ def create_document(
         }
         if document_type in ["rssfeed"] and "crawler_properties" in kwargs:
             document["crawler_properties"] = kwargs["crawler_properties"]
+        if fingerprint:
+            document["fingerprint"] = fingerprint
+            document["import_expires_at"] = int(time.time()) + IMPORT_WORKFLOW_TIMEOUT
 
         response = documents_table.put_item(Item=document)
         print(response)
@@ -353,6 +413,121 @@ def create_document(
     }
 
 
+def get_file_fingerprint(etag: Optional[str], size_in_bytes: int):
+    """
+    Fingerprints the content of an S3 object by its ETag and size. The same
+    bytes uploaded in different parts get different ETags, so a fingerprint
+    can miss unchanged content but never matches changed content.
+    """
+    if not etag:
+        return None
+
+    etag = etag.strip('"')
+
+    return f"{etag}:{size_in_bytes}"
+
+
+def get_inline_import_max_bytes():
+    config = genai_core.parameters.get_config()
+
+    return int(
+        config["rag"].get("inlineImportMaxBytes", DEFAULT_INLINE_IMPORT_MAX_BYTES)
+    )
+
+
+def can_import_inline(path: str, size_in_bytes: int):
+    _, extension = os.path.splitext(path.lower())
+
+    return (
+        extension in INLINE_IMPORT_EXTENSIONS
+        and size_in_bytes <= get_inline_import_max_bytes()
+    )
+
+
+def import_document_inline(
+    workspace: dict, document: dict, content: str, size_in_bytes: int
+):
+    workspace_id = workspace["workspace_id"]
+    document_id = document["document_id"]
+
+    started = time.time()
+    documents_table.update_item(
+        Key={"workspace_id": workspace_id, "document_id": document_id},
+        UpdateExpression="SET #status=:statusValue, import_expires_at=:expiresValue, updated_at=:timestampValue",
+        ExpressionAttributeNames={"#status": "status"},
+        ExpressionAttributeValues={
+            ":statusValue": "processing",
+            ":expiresValue": int(started) + INLINE_IMPORT_TIMEOUT,
+            ":timestampValue": _get_timestamp(),
+        },
+    )
+    try:
+        chunks = genai_core.chunks.split_content(workspace, content)
+        genai_core.chunks.add_chunks(
+            workspace=workspace,
+            document=document,
+            document_sub_id=None,
+            chunks=chunks,
+            chunk_complements=None,
+            replace=True,
+        )
+    except Exception as error:
+        set_status(workspace_id, document_id, "error")
+        record_document_import(IMPORT_PATH_INLINE, size_in_bytes, failed=True)
+        raise error
+
+    set_status(workspace_id, document_id, "processed")
+    record_document_import(
+        IMPORT_PATH_INLINE, size_in_bytes, duration=time.time() - started
+    )
+
+
+def record_document_import(
+    import_path: str,
+    size_in_bytes: int,
+    duration: Optional[float] = None,
+    failed: bool = False,
+):
+    metrics = [
+        ("DocumentImports", MetricUnit.Count, 1),
+        ("DocumentImportBytes", MetricUnit.Bytes, size_in_bytes),
+    ]
+    if duration is not None:
+        metrics.append(
+            ("DocumentImportDuration", MetricUnit.Milliseconds, duration * 1000)
+        )
+    if failed:
+        metrics.append(("DocumentImportErrors", MetricUnit.Count, 1))
+
+    for name, unit, value in metrics:
+        with single_metric(
+            name=name,
+            unit=unit,
+            value=value,
+            namespace=IMPORT_METRICS_NAMESPACE,
+        ) as metric:
+            metric.add_dimension(name="ImportPath", value=import_path)
+
+
+def _skip_unchanged_document(
+    workspace_id: str, document_id: str, size_in_bytes: int, timestamp: str
+):
+    print(f"Document {workspace_id}/{document_id} is unchanged, skipping import")
+    record_document_import(IMPORT_PATH_UNCHANGED, size_in_bytes)
+
+    documents_table.update_item(
+        Key={"workspace_id": workspace_id, "document_id": document_id},
+        UpdateExpression="SET updated_at=:timestampValue",
+        ExpressionAttributeValues={":timestampValue": timestamp},
+    )
+
+    return {
+        "workspace_id": workspace_id,
+        "document_id": document_id,
+        "unchanged": True,
+    }
+
+
 def update_document(workspace_id: str, document_id: str, document_type: str, **kwargs):
     timestamp = _get_timestamp()
     if document_type == "rssfeed":
@@ -394,6 +569,27 @@ def _process_document_kendra(
     document_type = document["document_type"]
 
     if document_type == "text":
+        content_bytes = (content or "").encode("utf-8")
+        if genai_core.kendra.ingestion.is_direct_ingestion(
+            workspace
+        ) and genai_core.kendra.ingestion.can_put_document_kendra(
+            "content.txt", len(content_bytes)
+        ):
+            failed = genai_core.kendra.ingestion.put_documents_kendra(
+                workspace,
+                [
+                    {
+                        "document_id": document_id,
+                        "document_type": document_type,
+                        "path": "content.txt",
+                        "content": content_bytes,
+                    }
+                ],
+            )
+
+            set_status(workspace_id, document_id, "error" if failed else "processed")
+            return
+
         processing_object_key = f"{workspace_id}/{document_id}/content.txt"
         kendra_object_key = f"documents/{processing_object_key}"
         kendra_metadata_key = (
@@ -425,6 +621,7 @@ def _process_document_kendra(
             ContentType="application/json",
         )
 
+        genai_core.kendra.data_sync.record_kendra_changes(workspace)
         set_status(workspace_id, document_id, "processed")
 
 
@@ -441,6 +638,12 @@ def _process_document(
 
     if document_type == "text":
         object_key = f"{workspace_id}/{document_id}/content.txt"
+        size_in_bytes = len(content.encode("utf-8"))
+        if size_in_bytes <= get_inline_import_max_bytes():
+            import_document_inline(workspace, document, content, size_in_bytes)
+            return
+
+        record_document_import(IMPORT_PATH_WORKFLOW, size_in_bytes)
         response = sfn_client.start_execution(
             stateMachineArn=FILE_IMPORT_WORKFLOW_ARN,
             input=json.dumps(
@@ -451,6 +654,7 @@ def _process_document(
                     "input_object_key": object_key,
                     "processing_bucket_name": PROCESSING_BUCKET_NAME,
                     "processing_object_key": object_key,
+                    "fingerprint": "",
                 }
             ),
         )
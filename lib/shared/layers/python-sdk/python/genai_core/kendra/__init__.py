@@ -2,3 +2,4 @@ from .indexes import *
 from .query import *
 from .client import *
 from .data_sync import *
+from .ingestion import *
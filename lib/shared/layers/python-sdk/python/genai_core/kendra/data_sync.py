@@ -1,21 +1,39 @@
 import os
+import time
+import boto3
 import genai_core.types
 import genai_core.workspaces
 from .client import get_kendra_client_for_index
+from .ingestion import is_direct_ingestion
 
+DEFAULT_KENDRA_INDEX_ID = os.environ.get("DEFAULT_KENDRA_INDEX_ID", "")
 DEFAULT_KENDRA_S3_DATA_SOURCE_ID = os.environ.get("DEFAULT_KENDRA_S3_DATA_SOURCE_ID")
+WORKSPACES_TABLE_NAME = os.environ.get("WORKSPACES_TABLE_NAME")
 
+# The sync state of an index is kept next to the workspaces
+SYNC_OBJECT_TYPE = "kendra_sync"
+# A sync starts once no change was recorded for SYNC_QUIET_WINDOW seconds,
+# once SYNC_CHANGE_THRESHOLD changes are pending, or once the oldest pending
+# change waited SYNC_MAX_DELAY seconds, whichever comes first.
+SYNC_QUIET_WINDOW = 300
+SYNC_CHANGE_THRESHOLD = 500
+SYNC_MAX_DELAY = 1800
 
-def start_kendra_data_sync(workspace_id: str):
-    workspace = genai_core.workspaces.get_workspace(workspace_id=workspace_id)
+SYNC_STATUS_IDLE = "idle"
+SYNC_STATUS_PENDING = "pending"
+SYNC_STATUS_SYNCING = "syncing"
+SYNC_RUNNING_STATUSES = ["SYNCING", "SYNCING_INDEXING"]
 
-    if not workspace:
-        raise genai_core.types.CommonError(f"Workspace {workspace_id} not found")
+dynamodb = boto3.resource("dynamodb")
 
-    if workspace["engine"] != "kendra":
-        raise genai_core.types.CommonError(
-            f"Workspace {workspace_id} is not a kendra workspace"
-        )
+
+def start_kendra_data_sync(workspace_id: str):
+    """
+    Requests a sync of the data source of the workspace index. The sync
+    starts right away unless one is running, in which case it is queued and
+    started by the scheduler when the running one completes.
+    """
+    workspace = _get_kendra_workspace(workspace_id)
 
     if workspace["kendra_index_external"]:
         raise genai_core.types.CommonError(
@@ -23,16 +41,110 @@ def start_kendra_data_sync(workspace_id: str):
         )
 
     kendra_index_id = workspace["kendra_index_id"]
+    _get_sync_table().update_item(
+        Key={"workspace_id": kendra_index_id, "object_type": SYNC_OBJECT_TYPE},
+        UpdateExpression="SET sync_requested=:trueValue",
+        ExpressionAttributeValues={":trueValue": True},
+    )
+
+    return schedule_kendra_data_sync(kendra_index_id)
+
+
+def record_kendra_changes(workspace: dict, changes: int = 1):
+    # Only documents written to the S3 data source need a sync
+    if workspace["kendra_index_external"] or is_direct_ingestion(workspace):
+        return
+
+    kendra_index_id = workspace["kendra_index_id"]
+    now = int(time.time())
+    response = _get_sync_table().update_item(
+        Key={"workspace_id": kendra_index_id, "object_type": SYNC_OBJECT_TYPE},
+        UpdateExpression="ADD pending_changes :changesValue SET last_change_at=:nowValue, first_change_at=if_not_exists(first_change_at, :nowValue)",
+        ExpressionAttributeValues={":changesValue": changes, ":nowValue": now},
+        ReturnValues="ALL_NEW",
+    )
+
+    # Bursts start a sync as soon as they reach the threshold, the rest is
+    # picked up by the periodic scheduler once the quiet window has passed.
+    if int(response["Attributes"]["pending_changes"]) >= SYNC_CHANGE_THRESHOLD:
+        schedule_kendra_data_sync(kendra_index_id)
+
+
+def schedule_kendra_data_syncs():
+    if not DEFAULT_KENDRA_INDEX_ID:
+        return
+
+    schedule_kendra_data_sync(DEFAULT_KENDRA_INDEX_ID)
+
+
+def schedule_kendra_data_sync(kendra_index_id: str):
+    """
+    Starts a sync of the index data source when the pending changes are due,
+    at most one at a time. Returns the sync state of the index.
+    """
     kendra = get_kendra_client_for_index(kendra_index_id)
+    state = _get_sync_state(kendra_index_id)
+
+    if _is_sync_running(kendra, kendra_index_id):
+        return _convert_sync_state(state, syncing=True)
 
-    response = kendra.start_data_source_sync_job(
-        Id=DEFAULT_KENDRA_S3_DATA_SOURCE_ID, IndexId=kendra_index_id
+    pending_changes = int(state.get("pending_changes", 0))
+    sync_requested = state.get("sync_requested", False)
+    if not sync_requested and not _is_sync_due(state):
+        return _convert_sync_state(state, syncing=False)
+
+    try:
+        response = kendra.start_data_source_sync_job(
+            Id=DEFAULT_KENDRA_S3_DATA_SOURCE_ID, IndexId=kendra_index_id
+        )
+    except kendra.exceptions.ConflictException:
+        # Started by someone else in the meantime
+        return _convert_sync_state(state, syncing=True)
+
+    print(f"Started sync of {kendra_index_id} for {pending_changes} changes")
+
+    # Changes recorded after the state was read stay pending for the next sync
+    response = _get_sync_table().update_item(
+        Key={"workspace_id": kendra_index_id, "object_type": SYNC_OBJECT_TYPE},
+        UpdateExpression="ADD pending_changes :changesValue SET last_sync_job_id=:jobIdValue, last_sync_started_at=:nowValue, last_sync_changes=:lastChangesValue REMOVE sync_requested, first_change_at",
+        ExpressionAttributeValues={
+            ":changesValue": -pending_changes,
+            ":jobIdValue": response["ExecutionId"],
+            ":nowValue": int(time.time()),
+            ":lastChangesValue": pending_changes,
+        },
+        ReturnValues="ALL_NEW",
     )
 
-    print(response)
+    return _convert_sync_state(response["Attributes"], syncing=True)
+
+
+def get_kendra_data_sync_state(workspace_id: str):
+    workspace = _get_kendra_workspace(workspace_id)
+
+    if workspace["kendra_index_external"]:
+        return _convert_sync_state({}, syncing=False)
+
+    kendra_index_id = workspace["kendra_index_id"]
+    kendra = get_kendra_client_for_index(kendra_index_id)
+    state = _get_sync_state(kendra_index_id)
+
+    return _convert_sync_state(state, syncing=_is_sync_running(kendra, kendra_index_id))
 
 
 def kendra_is_syncing(workspace_id: str):
+    workspace = _get_kendra_workspace(workspace_id)
+
+    if workspace["kendra_index_external"]:
+        return False
+
+    kendra_index_id = workspace["kendra_index_id"]
+    kendra = get_kendra_client_for_index(kendra_index_id)
+
+    return _is_sync_running(kendra, kendra_index_id)
+
+
+def _get_kendra_workspace(workspace_id: str):
     workspace = genai_core.workspaces.get_workspace(workspace_id=workspace_id)
 
     if not workspace:
@@ -43,22 +155,77 @@ def kendra_is_syncing(workspace_id: str):
             f"Workspace {workspace_id} is not a kendra workspace"
         )
 
-    if workspace["kendra_index_external"]:
+    return workspace
+
+
+def _get_sync_table():
+    return dynamodb.Table(WORKSPACES_TABLE_NAME)
+
+
+def _get_sync_state(kendra_index_id: str):
+    response = _get_sync_table().get_item(
+        Key={"workspace_id": kendra_index_id, "object_type": SYNC_OBJECT_TYPE}
+    )
+
+    return response.get("Item", {})
+
+
+def _is_sync_running(kendra, kendra_index_id: str):
+    # Filtered by status, so running jobs are found however many jobs
+    # completed since
+    for status in SYNC_RUNNING_STATUSES:
+        response = kendra.list_data_source_sync_jobs(
+            IndexId=kendra_index_id,
+            Id=DEFAULT_KENDRA_S3_DATA_SOURCE_ID,
+            StatusFilter=status,
+            MaxResults=1,
+        )
+
+        if len(response["History"]) > 0:
+            return True
+
+    return False
+
+
+def _is_sync_due(state: dict):
+    pending_changes = int(state.get("pending_changes", 0))
+    if pending_changes <= 0:
         return False
 
-    kendra_index_id = workspace["kendra_index_id"]
-    kendra = get_kendra_client_for_index(kendra_index_id)
+    if pending_changes >= SYNC_CHANGE_THRESHOLD:
+        return True
+
+    now = int(time.time())
+    last_change_at = int(state.get("last_change_at", 0))
+    first_change_at = int(state.get("first_change_at", last_change_at))
 
-    response = kendra.list_data_source_sync_jobs(
-        IndexId=kendra_index_id, Id=DEFAULT_KENDRA_S3_DATA_SOURCE_ID, MaxResults=5
+    return (
+        now - last_change_at >= SYNC_QUIET_WINDOW
+        or now - first_change_at >= SYNC_MAX_DELAY
     )
 
-    ret_value = False
-    for item in response["History"]:
-        status = item["Status"]
 
-        if status == "SYNCING" or status == "SYNCING_INDEXING":
-            ret_value = True
-            break
+def _convert_sync_state(state: dict, syncing: bool):
+    pending_changes = max(int(state.get("pending_changes", 0)), 0)
+    sync_requested = state.get("sync_requested", False)
+
+    status = SYNC_STATUS_IDLE
+    if syncing:
+        status = SYNC_STATUS_SYNCING
+    elif pending_changes > 0 or sync_requested:
+        status = SYNC_STATUS_PENDING
+
+    return {
+        "status": status,
+        "pending_changes": pending_changes,
+        "sync_requested": sync_requested,
+        "last_change_at": _get_int(state, "last_change_at"),
+        "last_sync_started_at": _get_int(state, "last_sync_started_at"),
+        "last_sync_changes": _get_int(state, "last_sync_changes"),
+    }
+
+
+def _get_int(state: dict, name: str):
+    value = state.get(name)
 
-    return ret_value
+    return int(value) if value is not None else None
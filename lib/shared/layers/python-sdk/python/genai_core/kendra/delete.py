@@ -1,6 +1,7 @@
 import os
 import boto3
 import genai_core.utils.delete_files_with_prefix
+from .ingestion import is_direct_ingestion, delete_documents_kendra
 
 PROCESSING_BUCKET_NAME = os.environ["PROCESSING_BUCKET_NAME"]
 UPLOAD_BUCKET_NAME = os.environ["UPLOAD_BUCKET_NAME"]
@@ -52,6 +53,11 @@ def delete_kendra_workspace(workspace: dict):
         if not last_evaluated_key:
             break
 
+    if is_direct_ingestion(workspace):
+        delete_documents_kendra(
+            workspace, [item["document_id"] for item in items_to_delete]
+        )
+
     # Batch delete in groups of 25
     for i in range(0, len(items_to_delete), 25):
         with documents_table.batch_writer() as batch:
@@ -0,0 +1,195 @@
+import os
+import time
+import random
+import botocore
+import genai_core.parameters
+from typing import List
+from .client import get_kendra_client_for_index
+
+INGESTION_DATA_SOURCE = "dataSource"
+INGESTION_DIRECT = "direct"
+
+# BatchPutDocument accepts at most 10 documents per call and inline
+# documents are sent in the request body, so batches are also capped by size.
+BATCH_MAX_DOCUMENTS = 10
+BATCH_MAX_BYTES = 9 * 1024 * 1024
+DOCUMENT_MAX_BYTES = 5 * 1024 * 1024
+BATCH_MAX_RETRIES = 6
+BATCH_RETRY_BASE_DELAY = 1.0
+BATCH_RETRYABLE_ERRORS = ["ThrottlingException", "InternalServerException"]
+
+CONTENT_TYPES = {
+    ".txt": "PLAIN_TEXT",
+    ".pdf": "PDF",
+    ".html": "HTML",
+    ".htm": "HTML",
+    ".docx": "MS_WORD",
+    ".doc": "MS_WORD",
+    ".pptx": "PPT",
+    ".ppt": "PPT",
+    ".xlsx": "MS_EXCEL",
+    ".rtf": "RTF",
+    ".xml": "XML",
+    ".csv": "CSV",
+    ".json": "JSON",
+    ".md": "MD",
+}
+
+
+def get_kendra_ingestion_mode():
+    config = genai_core.parameters.get_config()
+    kendra_config = config.get("rag", {}).get("engines", {}).get("kendra", {})
+
+    return kendra_config.get("ingestion", INGESTION_DATA_SOURCE)
+
+
+def is_direct_ingestion(workspace: dict):
+    return workspace.get("kendra_ingestion", INGESTION_DATA_SOURCE) == (
+        INGESTION_DIRECT
+    )
+
+
+def get_kendra_content_type(path: str):
+    _, extension = os.path.splitext(path.lower())
+
+    return CONTENT_TYPES.get(extension)
+
+
+def can_put_document_kendra(path: str, size_in_bytes: int):
+    # Anything else goes through the S3 data source
+    return (
+        get_kendra_content_type(path) is not None
+        and size_in_bytes <= DOCUMENT_MAX_BYTES
+    )
+
+
+def put_documents_kendra(workspace: dict, documents: List[dict]):
+    """
+    Pushes documents straight to the workspace index with BatchPutDocument.
+    Each document is a dict with document_id, document_type, path and
+    content (bytes). Throttled calls and documents failing with internal
+    errors are retried with backoff. Returns the ids of the documents that
+    could not be indexed.
+    """
+    workspace_id = workspace["workspace_id"]
+    kendra_index_id = workspace["kendra_index_id"]
+    kendra = get_kendra_client_for_index(kendra_index_id)
+    title = workspace.get("title")
+
+    kendra_documents = []
+    for document in documents:
+        kendra_document = {
+            "Id": document["document_id"],
+            "Blob": document["content"],
+            "ContentType": get_kendra_content_type(document["path"]),
+            "Attributes": [
+                {"Key": "workspace_id", "Value": {"StringValue": workspace_id}},
+                {
+                    "Key": "document_type",
+                    "Value": {"StringValue": document["document_type"]},
+                },
+            ],
+        }
+
+        if title:
+            kendra_document["Title"] = title
+
+        kendra_documents.append(kendra_document)
+
+    failed = []
+    for batch in _get_batches(kendra_documents):
+        failed.extend(
+            _send_batch(
+                lambda items: kendra.batch_put_document(
+                    IndexId=kendra_index_id, Documents=items
+                ),
+                batch,
+                lambda item: item["Id"],
+            )
+        )
+
+    print(f"Put {len(kendra_documents) - len(failed)} documents to {kendra_index_id}")
+
+    return failed
+
+
+def delete_documents_kendra(workspace: dict, document_ids: List[str]):
+    kendra_index_id = workspace["kendra_index_id"]
+    kendra = get_kendra_client_for_index(kendra_index_id)
+
+    failed = []
+    for idx in range(0, len(document_ids), BATCH_MAX_DOCUMENTS):
+        failed.extend(
+            _send_batch(
+                lambda items: kendra.batch_delete_document(
+                    IndexId=kendra_index_id, DocumentIdList=items
+                ),
+                document_ids[idx : idx + BATCH_MAX_DOCUMENTS],
+                lambda item: item,
+            )
+        )
+
+    print(f"Deleted {len(document_ids) - len(failed)} documents from {kendra_index_id}")
+
+    return failed
+
+
+def _get_batches(kendra_documents: List[dict]):
+    batch = []
+    batch_bytes = 0
+    for kendra_document in kendra_documents:
+        document_bytes = len(kendra_document["Blob"])
+        if batch and (
+            len(batch) >= BATCH_MAX_DOCUMENTS
+            or batch_bytes + document_bytes > BATCH_MAX_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        batch.append(kendra_document)
+        batch_bytes += document_bytes
+
+    if batch:
+        yield batch
+
+
+def _send_batch(send, items: list, get_id):
+    # Batches are sent one at a time, a throttled call backs off before the
+    # next attempt so a large import does not starve queries on the index.
+    pending = items
+    failed = []
+    errors = dict({})
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        if attempt > 0:
+            delay = BATCH_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+
+        try:
+            response = send(pending)
+        except botocore.exceptions.ClientError as error:
+            code = error.response["Error"]["Code"]
+            if code not in BATCH_RETRYABLE_ERRORS:
+                raise
+
+            print(f"Kendra batch throttled ({code}), attempt {attempt + 1}")
+            continue
+
+        retry_ids = set()
+        for failed_document in response.get("FailedDocuments", []):
+            document_id = failed_document["Id"]
+            errors[document_id] = failed_document.get("ErrorMessage")
+            if failed_document.get("ErrorCode") == "InternalError":
+                retry_ids.add(document_id)
+            else:
+                failed.append(document_id)
+
+        pending = [item for item in pending if get_id(item) in retry_ids]
+        if not pending:
+            break
+
+    failed.extend(get_id(item) for item in pending)
+    for document_id in failed:
+        print(f"Kendra document {document_id} failed: {errors.get(document_id)}")
+
+    return failed
@@ -1,14 +1,19 @@
 import os
 import re
 import genai_core.types
-from typing import List
+from typing import List, Optional
 from .client import get_kendra_client_for_index
 
 s3_pattern = re.compile(r"(s3-|s3\.)?(.*)\.amazonaws\.com")
 
 
 def query_workspace_kendra(
-    workspace_id: str, workspace: dict, query: str, limit: int, full_response: bool
+    workspace_id: str,
+    workspace: dict,
+    query: str,
+    limit: int,
+    full_response: bool,
+    filters: Optional[genai_core.types.SearchFilter] = None,
 ):
     kendra_index_id = workspace.get("kendra_index_id")
     kendra_index_external = workspace.get("kendra_index_external", True)
@@ -22,17 +27,11 @@ def query_workspace_kendra(
     kendra = get_kendra_client_for_index(kendra_index_id)
     limit = max(1, min(100, limit))
 
-    if kendra_index_external or kendra_use_all_data:
-        result = kendra.retrieve(
-            IndexId=kendra_index_id, QueryText=query, PageSize=limit, PageNumber=1
-        )
-    else:
-        result = kendra.retrieve(
-            IndexId=kendra_index_id,
-            QueryText=query,
-            PageSize=limit,
-            PageNumber=1,
-            AttributeFilter={
+    attribute_filters = _get_attribute_filters(filters)
+    if not (kendra_index_external or kendra_use_all_data):
+        attribute_filters.insert(
+            0,
+            {
                 "EqualsTo": {
                     "Key": "workspace_id",
                     "Value": {
@@ -42,6 +41,20 @@ def query_workspace_kendra(
             },
         )
 
+    retrieve_args = {
+        "IndexId": kendra_index_id,
+        "QueryText": query,
+        "PageSize": limit,
+        "PageNumber": 1,
+    }
+
+    if len(attribute_filters) == 1:
+        retrieve_args["AttributeFilter"] = attribute_filters[0]
+    elif len(attribute_filters) > 1:
+        retrieve_args["AttributeFilter"] = {"AndAllFilters": attribute_filters}
+
+    result = kendra.retrieve(**retrieve_args)
+
     items = result["ResultItems"]
     items = _convert_records("kendra", workspace_id, items)
 
@@ -53,6 +66,46 @@ def query_workspace_kendra(
     return ret_value
 
 
+def _get_attribute_filters(filters: Optional[genai_core.types.SearchFilter]):
+    attribute_filters = []
+
+    if filters is None:
+        return attribute_filters
+
+    if filters.path_prefix:
+        raise genai_core.types.CommonError(
+            "Path prefix filters are not supported for Kendra workspaces"
+        )
+
+    if filters.document_ids is not None:
+        attribute_filters.append(
+            _get_equals_any_filter("_document_id", filters.document_ids)
+        )
+
+    if filters.document_types is not None:
+        attribute_filters.append(
+            _get_equals_any_filter("document_type", filters.document_types)
+        )
+
+    if filters.document_sub_types is not None:
+        raise genai_core.types.CommonError(
+            "Document sub type filters are not supported for Kendra workspaces"
+        )
+
+    return attribute_filters
+
+
+def _get_equals_any_filter(key: str, values: List[str]):
+    equals_filters = [
+        {"EqualsTo": {"Key": key, "Value": {"StringValue": value}}} for value in values
+    ]
+
+    if len(equals_filters) == 1:
+        return equals_filters[0]
+
+    return {"OrAllFilters": equals_filters}
+
+
 def _convert_records(source: str, workspace_id: str, records: List[dict]):
     converted_records = []
     for record in records:
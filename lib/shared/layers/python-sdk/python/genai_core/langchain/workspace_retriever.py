@@ -1,18 +1,36 @@
 import genai_core.semantic_search
-from typing import List
+from typing import List, Optional
 from langchain.callbacks.manager import CallbackManagerForRetrieverRun
 from langchain.schema import BaseRetriever, Document
 
 
 class WorkspaceRetriever(BaseRetriever):
     workspace_id: str
+    # Additional workspaces searched together with workspace_id
+    federated_workspace_ids: Optional[List[str]] = None
+    filters: Optional[dict] = None
+    rerank: Optional[dict] = None
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
-        result = genai_core.semantic_search.semantic_search(
-            self.workspace_id, query, limit=3, full_response=False
-        )
+        if self.federated_workspace_ids:
+            result = genai_core.semantic_search.federated_search(
+                [self.workspace_id, *self.federated_workspace_ids],
+                query,
+                limit=3,
+                filters=self.filters,
+                rerank=self.rerank,
+            )
+        else:
+            result = genai_core.semantic_search.semantic_search(
+                self.workspace_id,
+                query,
+                limit=3,
+                full_response=False,
+                filters=self.filters,
+                rerank=self.rerank,
+            )
 
         return [self._get_document(item) for item in result.get("items", [])]
 
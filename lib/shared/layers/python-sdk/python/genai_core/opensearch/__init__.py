@@ -1,3 +1,5 @@
 from .client import *
 from .create import *
+from .profiles import *
+from .vectors import *
 from .query import *
@@ -1,9 +1,20 @@
+import json
+import time
 from typing import List, Optional
 from .client import get_open_search_client
+from .vectors import RESCORE_VECTOR_FIELD, prepare_rescore_vectors, prepare_vectors
+from .utils import get_index_name
+
+BULK_MAX_DOCUMENTS = 500
+BULK_MAX_BYTES = 5 * 1024 * 1024
+BULK_MAX_RETRIES = 5
+BULK_RETRY_BASE_DELAY = 0.5
+BULK_RETRYABLE_STATUS = [429, 502, 503, 504]
+DELETE_PAGE_SIZE = 1000
 
 
 def add_chunks_open_search(
-    workspace_id: str,
+    workspace: dict,
     document_id: str,
     document_sub_id: Optional[str],
     document_type: str,
@@ -16,22 +27,27 @@ def add_chunks_open_search(
     chunk_complements: List[str],
     replace: bool,
 ):
-    index_name = workspace_id.replace("-", "")
+    workspace_id = workspace["workspace_id"]
+    index_name = get_index_name(workspace)
     complements_len = len(chunk_complements) if chunk_complements else 0
     removed_vectors = 0
 
     client = get_open_search_client()
 
     if replace:
-        removed_vectors = clean_chunks_open_search(workspace_id, document_id)
+        removed_vectors = clean_chunks_open_search(workspace, document_id)
+
+    rescore_embeddings = prepare_rescore_vectors(workspace, chunk_embeddings)
+    chunk_embeddings = prepare_vectors(workspace, chunk_embeddings)
 
+    documents = []
     for idx in range(len(chunk_ids)):
         chunk_id = chunk_ids[idx]
         content = chunks[idx]
         content_complement = chunk_complements[idx] if idx < complements_len else None
 
         add_body = {
-            "chunk_id": chunk_id,
+            "chunk_id": str(chunk_id),
             "workspace_id": workspace_id,
             "document_id": document_id,
             "document_sub_id": document_sub_id,
@@ -43,32 +59,136 @@ def add_chunks_open_search(
             "content_complement": content_complement,
             "content_embeddings": chunk_embeddings[idx],
         }
+        if rescore_embeddings is not None:
+            add_body[RESCORE_VECTOR_FIELD] = rescore_embeddings[idx]
+
+        documents.append(add_body)
+
+    added_vectors = bulk_index_open_search(client, index_name, documents)
+
+    return {"removed_vectors": removed_vectors, "added_vectors": added_vectors}
+
+
+def bulk_index_open_search(client, index_name: str, documents: List[dict]):
+    """
+    Indexes documents with the _bulk API in batches bounded by
+    BULK_MAX_DOCUMENTS and BULK_MAX_BYTES. Items rejected with a retryable
+    status are sent again with exponential backoff, the number of documents
+    actually indexed is returned.
+    """
+    added_vectors = 0
+    for batch in _get_bulk_batches(documents):
+        added_vectors += _bulk_index_batch(client, index_name, batch)
+
+    return added_vectors
+
+
+def _get_bulk_batches(documents: List[dict]):
+    batch = []
+    batch_bytes = 0
+    for document in documents:
+        document_bytes = len(json.dumps(document))
+        if batch and (
+            len(batch) >= BULK_MAX_DOCUMENTS
+            or batch_bytes + document_bytes > BULK_MAX_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        batch.append(document)
+        batch_bytes += document_bytes
+
+    if batch:
+        yield batch
+
+
+def _bulk_index_batch(client, index_name: str, documents: List[dict]):
+    # Serverless vector collections do not accept custom document ids
+    operations = [
+        [{"index": {"_index": index_name}}, document] for document in documents
+    ]
+
+    return _send_bulk(client, operations)
 
-        client.index(index=index_name, body=add_body)
 
-    return {"removed_vectors": removed_vectors, "added_vectors": len(chunk_ids)}
+def _send_bulk(client, operations: List[List[dict]]):
+    succeeded = 0
+    pending = operations
 
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        if attempt > 0:
+            time.sleep(BULK_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
 
-def clean_chunks_open_search(workspace_id: str, document_id: str):
-    index_name = workspace_id.replace("-", "")
+        body = [line for operation in pending for line in operation]
+        response = client.bulk(body=body)
+
+        retry = []
+        for operation, item in zip(pending, response["items"]):
+            action, result = next(iter(item.items()))
+            status = result.get("status", 500)
+
+            if status < 300:
+                succeeded += 1
+            elif status in BULK_RETRYABLE_STATUS:
+                retry.append(operation)
+            elif action == "delete" and status == 404:
+                continue
+            else:
+                print(f"Bulk {action} failed: {result}")
+
+        if not retry:
+            return succeeded
+
+        pending = retry
+
+    print(
+        f"Bulk request failed for {len(pending)} items after {BULK_MAX_RETRIES} retries"
+    )
+
+    return succeeded
+
+
+def clean_chunks_open_search(workspace: dict, document_id: str):
+    return delete_chunks_open_search(workspace, document_id=document_id)
+
+
+def delete_chunks_open_search(workspace: dict, document_id: Optional[str] = None):
+    """
+    Deletes the chunks of a workspace (or of one of its documents), paging
+    through the matches with search_after and removing each page with a
+    bulk request. Returns the number of chunks actually deleted.
+    """
+    workspace_id = workspace["workspace_id"]
+    index_name = get_index_name(workspace)
     client = get_open_search_client()
 
+    filter_clauses = [{"term": {"workspace_id": workspace_id}}]
+    if document_id is not None:
+        filter_clauses.append({"term": {"document_id": document_id}})
+
     query = {
-        "query": {
-            "bool": {
-                "must": [
-                    {"term": {"workspace_id": workspace_id}},
-                    {"term": {"document_id": document_id}},
-                ]
-            }
-        }
+        "size": DELETE_PAGE_SIZE,
+        "_source": False,
+        "sort": [{"chunk_id": "asc"}],
+        "query": {"bool": {"filter": filter_clauses}},
     }
 
-    response = client.search(index=index_name, body=query)
-    docs = response["hits"]["hits"]
-    removed_vectors = len(docs)
+    removed_vectors = 0
+    while True:
+        response = client.search(index=index_name, body=query)
+        docs = response["hits"]["hits"]
+        if not docs:
+            break
+
+        operations = [
+            [{"delete": {"_index": index_name, "_id": doc["_id"]}}] for doc in docs
+        ]
+        removed_vectors += _send_bulk(client, operations)
+
+        if len(docs) < DELETE_PAGE_SIZE:
+            break
 
-    for doc in docs:
-        client.delete(index=index_name, id=doc["_id"], ignore=[400, 404])
+        query["search_after"] = docs[-1]["sort"]
 
     return removed_vectors
@@ -1,5 +1,6 @@
 import os
 import boto3
+import threading
 import urllib.parse
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
@@ -9,20 +10,37 @@ OPEN_SEARCH_COLLECTION_ENDPOINT = os.environ.get("OPEN_SEARCH_COLLECTION_ENDPOIN
 
 port = 443
 timeout = 300
+pool_maxsize = 16
+
+_client = None
+_client_lock = threading.Lock()
 
 
 def get_open_search_client():
+    # The client is shared by the whole process so warm Lambdas reuse
+    # the pooled keep-alive connections instead of a TLS handshake per call.
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_open_search_client()
+
+    return _client
+
+
+def _create_open_search_client():
     service = "aoss"
     session = boto3.Session()
     credentials = session.get_credentials()
     host = urllib.parse.urlparse(OPEN_SEARCH_COLLECTION_ENDPOINT).hostname
 
+    # Requests are signed with the current credentials, which botocore
+    # refreshes before they expire.
     awsauth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
         session.region_name,
         service,
-        session_token=credentials.token,
+        refreshable_credentials=credentials,
     )
 
     opensearch = OpenSearch(
@@ -31,6 +49,7 @@ def get_open_search_client():
         use_ssl=True,
         verify_certs=True,
         connection_class=RequestsHttpConnection,
+        pool_maxsize=pool_maxsize,
         timeout=timeout,
     )
 
@@ -1,14 +1,24 @@
 from .client import get_open_search_client
+from .profiles import get_workspace_search_profile
+from .vectors import (
+    RESCORE_VECTOR_FIELD,
+    get_rescore_vector_field,
+    get_rescore_vector_mapping,
+    get_vector_mapping,
+)
+from .utils import get_index_name, is_shared
 
 
 def create_workspace_index(workspace: dict):
-    workspace_id = workspace["workspace_id"]
-    index_name = workspace_id.replace("-", "")
-    embeddings_model_dimensions = workspace["embeddings_model_dimensions"]
+    index_name = get_index_name(workspace)
 
     client = get_open_search_client()
+    if is_shared(workspace) and client.indices.exists(index_name):
+        print(f"Using shared index {index_name}")
+        return
 
-    ef_search = 512
+    _, search_params = get_workspace_search_profile(workspace)
+    ef_search = search_params["ef_search"]
     index_body = {
         "settings": {
             "index": {
@@ -18,23 +28,17 @@ def create_workspace_index(workspace: dict):
         },
         "mappings": {
             "properties": {
-                "content_embeddings": {
-                    "type": "knn_vector",
-                    "dimension": int(embeddings_model_dimensions),
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "l2",
-                        "engine": "nmslib",
-                        "parameters": {"ef_construction": 512, "m": 16},
-                    },
-                },
+                "content_embeddings": get_vector_mapping(workspace, search_params),
                 "chunk_id": {"type": "keyword"},
                 "workspace_id": {"type": "keyword"},
                 "document_id": {"type": "keyword"},
                 "document_sub_id": {"type": "keyword"},
                 "document_type": {"type": "keyword"},
                 "document_sub_type": {"type": "keyword"},
-                "path": {"type": "text"},
+                "path": {
+                    "type": "text",
+                    "fields": {"keyword": {"type": "keyword", "ignore_above": 1024}},
+                },
                 "language": {"type": "keyword"},
                 "title": {"type": "text"},
                 "content": {"type": "text"},
@@ -48,7 +52,15 @@ def create_workspace_index(workspace: dict):
         },
     }
 
-    response = client.indices.create(index_name, body=index_body)
+    if get_rescore_vector_field(workspace) == RESCORE_VECTOR_FIELD:
+        index_body["mappings"]["properties"][
+            RESCORE_VECTOR_FIELD
+        ] = get_rescore_vector_mapping()
+
+    # Another workspace may be creating the same shared index
+    response = client.indices.create(
+        index_name, body=index_body, ignore=400 if is_shared(workspace) else ()
+    )
 
     print("Created workspace index")
     print(response)
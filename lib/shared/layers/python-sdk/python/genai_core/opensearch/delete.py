@@ -1,6 +1,8 @@
 import os
 import boto3
 from .client import get_open_search_client
+from .chunks import delete_chunks_open_search
+from .utils import get_index_name, is_shared
 import genai_core.utils.delete_files_with_prefix
 
 
@@ -16,7 +18,7 @@ dynamodb = boto3.resource("dynamodb")
 
 def delete_open_search_workspace(workspace: dict):
     workspace_id = workspace["workspace_id"]
-    index_name = workspace_id.replace("-", "")
+    index_name = get_index_name(workspace)
 
     genai_core.utils.delete_files_with_prefix.delete_files_with_prefix(
         UPLOAD_BUCKET_NAME, workspace_id
@@ -26,7 +28,10 @@ def delete_open_search_workspace(workspace: dict):
     )
 
     client = get_open_search_client()
-    if client.indices.exists(index_name):
+    if is_shared(workspace):
+        removed_vectors = delete_chunks_open_search(workspace)
+        print(f"Deleted {removed_vectors} chunks from {index_name}.")
+    elif client.indices.exists(index_name):
         client.indices.delete(index=index_name)
         print(f"Index {index_name} deleted.")
 
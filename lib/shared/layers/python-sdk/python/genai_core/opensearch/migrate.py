@@ -0,0 +1,88 @@
+import os
+import boto3
+from datetime import datetime
+from .client import get_open_search_client
+from .create import create_workspace_index
+from .chunks import bulk_index_open_search
+from .utils import (
+    SHARED_LAYOUT_ENGINES,
+    STORAGE_LAYOUT_SHARED,
+    get_index_name,
+    is_shared,
+)
+
+WORKSPACES_TABLE_NAME = os.environ.get("WORKSPACES_TABLE_NAME")
+
+WORKSPACE_OBJECT_TYPE = "workspace"
+MIGRATE_PAGE_SIZE = 500
+
+dynamodb = boto3.resource("dynamodb")
+
+
+def migrate_workspace_to_shared(workspace: dict):
+    """
+    Copies the chunks of a workspace index into the matching shared index
+    and deletes the workspace index. nmslib workspaces move to lucene, which
+    supports filtering by workspace inside the knn search. Readers keep
+    using the old index until the workspace item is updated, pause
+    ingestion into the workspace while the migration runs.
+    """
+    workspace_id = workspace["workspace_id"]
+
+    if workspace["engine"] != "opensearch" or is_shared(workspace):
+        return False
+
+    aoss_engine = workspace.get("aoss_engine", "nmslib")
+    if aoss_engine not in SHARED_LAYOUT_ENGINES:
+        aoss_engine = "lucene"
+
+    shared_workspace = {
+        **workspace,
+        "storage_layout": STORAGE_LAYOUT_SHARED,
+        "aoss_engine": aoss_engine,
+    }
+    create_workspace_index(shared_workspace)
+
+    client = get_open_search_client()
+    source_index = get_index_name(workspace)
+    target_index = get_index_name(shared_workspace)
+
+    query = {
+        "size": MIGRATE_PAGE_SIZE,
+        "sort": [{"chunk_id": "asc"}],
+        "query": {"match_all": {}},
+    }
+
+    moved_vectors = 0
+    while True:
+        response = client.search(index=source_index, body=query)
+        docs = response["hits"]["hits"]
+        if not docs:
+            break
+
+        documents = [doc["_source"] for doc in docs]
+        moved_vectors += bulk_index_open_search(client, target_index, documents)
+
+        if len(docs) < MIGRATE_PAGE_SIZE:
+            break
+
+        query["search_after"] = docs[-1]["sort"]
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    workspaces_table = dynamodb.Table(WORKSPACES_TABLE_NAME)
+    workspaces_table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET storage_layout=:storageLayoutValue, aoss_engine=:aossEngineValue, updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":storageLayoutValue": STORAGE_LAYOUT_SHARED,
+            ":aossEngineValue": aoss_engine,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    if client.indices.exists(source_index):
+        client.indices.delete(index=source_index)
+
+    print(f"Migrated {moved_vectors} vectors of workspace {workspace_id}")
+
+    return True
@@ -0,0 +1,77 @@
+from typing import Optional
+from genai_core.types import CommonError
+
+DEFAULT_SEARCH_PROFILE = "balanced"
+# Indexes created before search profiles were introduced use these settings
+LEGACY_SEARCH_PROFILE = "legacy"
+
+# ef_construction and m are fixed when the index is created, k, candidates
+# (the number of hits requested from the vector query) and ef_search can be
+# changed per query.
+SEARCH_PROFILES = {
+    "fast": {
+        "k": 10,
+        "candidates": 10,
+        "ef_search": 64,
+        "ef_construction": 128,
+        "m": 16,
+    },
+    "balanced": {
+        "k": 25,
+        "candidates": 25,
+        "ef_search": 256,
+        "ef_construction": 256,
+        "m": 16,
+    },
+    "high_recall": {
+        "k": 50,
+        "candidates": 50,
+        "ef_search": 512,
+        "ef_construction": 512,
+        "m": 16,
+    },
+    # The fixed settings of the first indexes, queries keep returning the
+    # same number of results for them
+    "legacy": {
+        "k": 5,
+        "candidates": 25,
+        "ef_search": 512,
+        "ef_construction": 512,
+        "m": 16,
+    },
+}
+
+
+def get_search_profile_params(name: str):
+    if name not in SEARCH_PROFILES:
+        raise CommonError(f"Invalid search profile {name}")
+
+    return dict(SEARCH_PROFILES[name])
+
+
+def get_workspace_search_profile(
+    workspace: dict, name: Optional[str] = None, query_ef_search: bool = True
+):
+    """
+    Returns the name and parameters of the profile used to query the
+    workspace. The index time parameters (ef_construction and m) always come
+    from the workspace, a profile requested for the query only changes the
+    query time ones. ef_search is kept from the workspace as well when the
+    engine only supports it as an index setting (query_ef_search=False).
+    """
+    workspace_name = workspace.get("search_profile", LEGACY_SEARCH_PROFILE)
+    workspace_params = workspace.get("search_params")
+    if workspace_params is None:
+        workspace_params = get_search_profile_params(workspace_name)
+
+    params = {key: int(value) for key, value in workspace_params.items()}
+    if name is None or name == workspace_name:
+        return workspace_name, params
+
+    query_params = get_search_profile_params(name)
+    params["k"] = query_params["k"]
+    params["candidates"] = query_params["candidates"]
+    if query_ef_search:
+        params["ef_search"] = query_params["ef_search"]
+
+    return name, params
@@ -1,12 +1,63 @@
 import genai_core.embeddings
-import genai_core.cross_encoder
-from typing import List
+import genai_core.rerank
+from typing import List, Optional
 from .client import get_open_search_client
+from .profiles import get_workspace_search_profile
+from .utils import get_index_name, is_shared
+from .vectors import (
+    METRIC_SPACE_TYPES,
+    RESCORE_OVERSAMPLE_FACTOR,
+    RESCORE_VECTOR_FIELD,
+    get_rescore_vector_field,
+    get_workspace_vector_options,
+    is_quantized,
+    prepare_vectors,
+    rescore,
+)
 from aws_lambda_powertools import Logger
-from genai_core.types import CommonError, Task
+from genai_core.types import CommonError, RerankOptions, SearchFilter, Task
 
 logger = Logger()
 
+# Engines supporting filters inside the knn query (filtering during the
+# graph search instead of after the top k have been selected).
+EFFICIENT_FILTER_ENGINES = ["faiss", "lucene"]
+# Engines without efficient filtering (nmslib) apply filters to the top k
+# nearest neighbors, so a selective filter can leave few or no hits. Their
+# k is raised to this many times the requested hits when a filter is set,
+# trading latency for recall. Filters expected to leave fewer hits than
+# requested, or matching few documents, use an exact search instead.
+POST_FILTER_K_FACTOR = 4
+# Filtered searches on engines without efficient filtering are exact up
+# to this many matching documents (see _is_selective_filter).
+EXACT_SEARCH_MAX_DOCS = 20000
+# Upper bound of k in knn queries
+MAX_K = 10000
+# Engines accepting ef_search in the knn query, nmslib only reads it from
+# the index settings.
+QUERY_EF_SEARCH_ENGINES = ["faiss", "lucene"]
+
+RECORD_FIELDS = [
+    "chunk_id",
+    "workspace_id",
+    "document_id",
+    "document_sub_id",
+    "document_type",
+    "document_sub_type",
+    "path",
+    "language",
+    "title",
+    "content",
+    "content_complement",
+    "metadata",
+]
+# Fields only loaded for the final items when the full response is not
+# requested, see _load_lazy_fields.
+LAZY_FIELDS = ["path", "title", "content", "content_complement", "metadata"]
+# Never returned by the search requests, the stored vectors are large and
+# not needed by the callers.
+EXCLUDED_FIELDS = ["content_embeddings", RESCORE_VECTOR_FIELD]
+
 
 def query_workspace_open_search(
     workspace_id: str,
@@ -15,16 +66,23 @@ def query_workspace_open_search(
     limit: int,
     full_response: bool,
     threshold: float = 0.0,
+    filters: Optional[SearchFilter] = None,
+    search_profile: Optional[str] = None,
+    rerank: Optional[RerankOptions] = None,
 ):
-    index_name = workspace_id.replace("-", "")
+    index_name = get_index_name(workspace)
 
     embeddings_model_provider = workspace["embeddings_model_provider"]
     embeddings_model_name = workspace["embeddings_model_name"]
-    cross_encoder_model_provider = workspace["cross_encoder_model_provider"]
-    cross_encoder_model_name = workspace["cross_encoder_model_name"]
     hybrid_search = workspace["hybrid_search"]
     languages = workspace["languages"]
-    vector_search_limit = 25
+    aoss_engine, metric, _ = get_workspace_vector_options(workspace)
+    rescore_vectors = is_quantized(workspace) and workspace.get("rescore", True)
+    query_ef_search = aoss_engine in QUERY_EF_SEARCH_ENGINES
+    search_profile, search_params = get_workspace_search_profile(
+        workspace, search_profile, query_ef_search=query_ef_search
+    )
+    vector_search_limit = search_params["candidates"]
     keyword_search_limit = 25
 
     vector_search_records = []
@@ -37,12 +95,11 @@ def query_workspace_open_search(
     if selected_model is None:
         raise CommonError("Embeddings model not found")
 
-    # cross_encoder_model = genai_core.cross_encoder.get_cross_encoder_model(
-    #     cross_encoder_model_provider, cross_encoder_model_name
-    # )
-
-    # if cross_encoder_model is None:
-    #     raise CommonError("Cross encoder model not found")
+    rerank_options = genai_core.rerank.get_rerank_options(rerank)
+    rerank_enabled = genai_core.rerank.is_rerank_enabled(rerank_options)
+    cross_encoder_model = genai_core.rerank.get_cross_encoder_model(
+        workspace, rerank_options
+    )
 
     query_embeddings = genai_core.embeddings.generate_embeddings(
         selected_model, [query], Task.RETRIEVE
@@ -51,21 +108,85 @@ def query_workspace_open_search(
     items = []
 
     client = get_open_search_client()
-    vector_search_records = vector_query(
-        client, index_name, query_embeddings, vector_search_limit
+    filter_clauses = _get_filter_clauses(filters)
+    if is_shared(workspace):
+        filter_clauses.insert(0, {"term": {"workspace_id": workspace_id}})
+
+    lazy_fields = not full_response
+    source_fields = RECORD_FIELDS
+    if lazy_fields:
+        # The cross encoder ranks on content, it is loaded up front then
+        source_fields = [
+            field
+            for field in RECORD_FIELDS
+            if field not in LAZY_FIELDS or (field == "content" and rerank_enabled)
+        ]
+
+    # Quantized indexes fetch more candidates with their stored vectors and
+    # keep the best ones by exact score, see _rescore_records.
+    oversample_factor = RESCORE_OVERSAMPLE_FACTOR if rescore_vectors else 1
+    efficient_filter = aoss_engine in EFFICIENT_FILTER_ENGINES
+    exact_search = (
+        len(filter_clauses) > 0
+        and not efficient_filter
+        and _is_selective_filter(
+            client, index_name, filter_clauses, search_params["k"], vector_search_limit
+        )
     )
-    vector_search_records = _convert_records("vector_search", vector_search_records)
-    items.extend(vector_search_records)
+    if exact_search:
+        vector_body = get_exact_vector_query_body(
+            prepare_vectors(workspace, [query_embeddings])[0],
+            METRIC_SPACE_TYPES[metric],
+            vector_search_limit * oversample_factor,
+            filter_clauses=filter_clauses,
+            source_fields=source_fields,
+        )
+    else:
+        vector_body = get_vector_query_body(
+            prepare_vectors(workspace, [query_embeddings])[0],
+            vector_search_limit * oversample_factor,
+            k=search_params["k"] * oversample_factor,
+            ef_search=search_params["ef_search"] if query_ef_search else None,
+            filter_clauses=filter_clauses,
+            efficient_filter=efficient_filter,
+            source_fields=source_fields,
+        )
+    if rescore_vectors:
+        vector_body["_source"] = {
+            "includes": [*source_fields, get_rescore_vector_field(workspace)]
+        }
 
     if hybrid_search:
-        keyword_search_records = keyword_query(
-            client, index_name, query, keyword_search_limit
+        keyword_body = get_keyword_query_body(
+            query,
+            keyword_search_limit,
+            filter_clauses=filter_clauses,
+            source_fields=source_fields,
         )
 
+        vector_search_records, keyword_search_records = multi_query(
+            client, index_name, [vector_body, keyword_body]
+        )
         keyword_search_records = _convert_records(
             "keyword_search", keyword_search_records
         )
-        items.extend(keyword_search_records)
+    else:
+        vector_search_records = _search(client, index_name, vector_body)
+
+    if exact_search and metric == "cosine":
+        # knn_score scores cosinesimil as 1 + cosine, the knn query as
+        # (1 + cosine) / 2
+        for record in vector_search_records:
+            record["_score"] = record["_score"] / 2
+
+    if rescore_vectors:
+        vector_search_records = _rescore_records(
+            workspace, query_embeddings, vector_search_records, vector_search_limit
+        )
+
+    vector_search_records = _convert_records("vector_search", vector_search_records)
+    items.extend(vector_search_records)
+    items.extend(keyword_search_records)
 
     unique_items = dict({})
     for item in items:
@@ -96,24 +217,21 @@ def query_workspace_open_search(
                 item["keyword_search_score"] = current["keyword_search_score"]
 
     unique_items = list(unique_items.values())
+    if hybrid_search:
+        _set_hybrid_scores(unique_items, vector_search_records, keyword_search_records)
+
     unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
-    # score_dict = dict({})
-    # if len(unique_items) > 0:
-    #     passages = [record["content"] for record in unique_items]
-    #     passage_scores = genai_core.cross_encoder.rank_passages(
-    #         cross_encoder_model, query, passages
-    #     )
-
-    #     for i in range(len(unique_items)):
-    #         score = passage_scores[i]
-    #         unique_items[i]["score"] = score
-    #         score_dict[unique_items[i]["chunk_id"]] = score
-    # unique_items = sorted(unique_items, key=lambda x: x["score"], reverse=True)
-
-    # for record in vector_search_records:
-    #     record["score"] = score_dict[record["chunk_id"]]
-    # for record in keyword_search_records:
-    #     record["score"] = score_dict[record["chunk_id"]]
+
+    unique_items, rerank_mode = genai_core.rerank.rerank_items(
+        cross_encoder_model, query, unique_items, rerank_options
+    )
+    if rerank_mode != genai_core.rerank.RERANK_MODE_NONE:
+        score_dict = {item["chunk_id"]: item["score"] for item in unique_items}
+
+        for record in vector_search_records:
+            record["score"] = score_dict[record["chunk_id"]]
+        for record in keyword_search_records:
+            record["score"] = score_dict[record["chunk_id"]]
 
     if full_response:
         unique_items = unique_items[:limit]
@@ -121,12 +239,15 @@ def query_workspace_open_search(
             "engine": "opensearch",
             "supported_languages": languages,
             "items": unique_items,
-            "vector_search_metric": "l2",
+            "vector_search_metric": metric,
+            "rerank_mode": rerank_mode,
+            "search_profile": search_profile,
+            "search_params": search_params,
             "vector_search_items": vector_search_records,
             "keyword_search_items": keyword_search_records,
         }
     else:
-        ret_items = list(filter(lambda val: val["score"] > threshold, unique_items))[
+        ret_items = genai_core.rerank.filter_by_threshold(unique_items, threshold)[
             :limit
         ]
         if len(ret_items) < limit:
@@ -142,9 +263,13 @@ def query_workspace_open_search(
                 )[: (limit - len(ret_items))]
             )
 
+        if lazy_fields:
+            _load_lazy_fields(client, index_name, ret_items)
+
         ret_value = {
             "engine": "opensearch",
             "supported_languages": languages,
+            "rerank_mode": rerank_mode,
             "items": ret_items,
         }
 
@@ -191,10 +316,141 @@ def _convert_records(source: str, records: List[dict]):
     return converted_records
 
 
-def vector_query(client, index_name: str, vector: List[float], size: int = 25):
-    query = {"query": {"knn": {"content_embeddings": {"vector": vector, "k": 5}}}}
+def _rescore_records(
+    workspace: dict, query_vector: List[float], records: List[dict], size: int
+):
+    if len(records) == 0:
+        return records
+
+    field = get_rescore_vector_field(workspace)
+    stored_vectors = [record["_source"].pop(field) for record in records]
+    scores = rescore(workspace, query_vector, stored_vectors)
+    for record, score in zip(records, scores):
+        record["_score"] = score
+
+    records = sorted(records, key=lambda x: x["_score"], reverse=True)
+
+    return records[:size]
+
+
+def get_vector_query_body(
+    vector: List[float],
+    size: int = 25,
+    k: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    filter_clauses: Optional[List[dict]] = None,
+    efficient_filter: bool = False,
+    source_fields: Optional[List[str]] = None,
+):
+    knn_query = {"vector": vector, "k": k if k is not None else size}
+    if ef_search is not None:
+        knn_query["method_parameters"] = {"ef_search": ef_search}
+
+    if filter_clauses and efficient_filter:
+        knn_query["filter"] = {"bool": {"filter": filter_clauses}}
+        query = {"query": {"knn": {"content_embeddings": knn_query}}}
+    elif filter_clauses:
+        knn_query["k"] = min(max(knn_query["k"], size) * POST_FILTER_K_FACTOR, MAX_K)
+        query = {
+            "query": {
+                "bool": {
+                    "must": [{"knn": {"content_embeddings": knn_query}}],
+                    "filter": filter_clauses,
+                }
+            }
+        }
+    else:
+        query = {"query": {"knn": {"content_embeddings": knn_query}}}
+
+    query["size"] = size
+    query["_source"] = {"excludes": EXCLUDED_FIELDS}
+    if source_fields is not None:
+        query["_source"]["includes"] = source_fields
+
+    return query
+
+
+def get_exact_vector_query_body(
+    vector: List[float],
+    space_type: str,
+    size: int = 25,
+    filter_clauses: Optional[List[dict]] = None,
+    source_fields: Optional[List[str]] = None,
+):
+    # Scores every document matching the filters, no graph search
+    query = {
+        "query": {
+            "script_score": {
+                "query": {"bool": {"filter": filter_clauses or []}},
+                "script": {
+                    "lang": "knn",
+                    "source": "knn_score",
+                    "params": {
+                        "field": "content_embeddings",
+                        "query_value": vector,
+                        "space_type": space_type,
+                    },
+                },
+            }
+        }
+    }
+
+    query["size"] = size
+    query["_source"] = {"excludes": EXCLUDED_FIELDS}
+    if source_fields is not None:
+        query["_source"]["includes"] = source_fields
+
+    return query
+
+
+def get_keyword_query_body(
+    text: str,
+    size: int = 25,
+    filter_clauses: Optional[List[dict]] = None,
+    source_fields: Optional[List[str]] = None,
+):
+    if filter_clauses:
+        query = {
+            "query": {
+                "bool": {
+                    "must": [{"match": {"content": text}}],
+                    "filter": filter_clauses,
+                }
+            }
+        }
+    else:
+        query = {"query": {"match": {"content": text}}}
+
+    query["size"] = size
+    query["_source"] = {"excludes": EXCLUDED_FIELDS}
+    if source_fields is not None:
+        query["_source"]["includes"] = source_fields
+
+    return query
 
-    response = client.search(index=index_name, body=query, size=size)
+
+def multi_query(client, index_name: str, bodies: List[dict]):
+    # All the queries are sent in a single _msearch round trip
+    request = []
+    for body in bodies:
+        request.append({"index": index_name})
+        request.append(body)
+
+    response = client.msearch(body=request)
+
+    ret_value = []
+    for current in response["responses"]:
+        if "error" in current:
+            raise CommonError(f"OpenSearch query failed: {current['error']}")
+
+        hits = current["hits"]["hits"]
+        ret_value.append(hits if hits is not None else [])
+
+    return ret_value
+
+
+def _search(client, index_name: str, body: dict):
+    response = client.search(index=index_name, body=body)
 
     ret_value = response["hits"]["hits"]
     ret_value = ret_value if ret_value is not None else []
@@ -202,12 +458,134 @@ def vector_query(client, index_name: str, vector: List[float], size: int = 25):
     return ret_value
 
 
-def keyword_query(client, index_name: str, text: str, size: int = 25):
-    query = {"query": {"match": {"content": text}}}
+def _is_selective_filter(
+    client, index_name: str, filter_clauses: List[dict], k: int, size: int
+):
+    """
+    Tells whether the filters match few documents, or too few of the index
+    for the post-filtered knn query to return size hits on average.
+    """
+    count_body = {"size": 0, "track_total_hits": True}
+    matching_hits, index_hits = _count_hits(
+        client,
+        index_name,
+        [
+            {**count_body, "query": {"bool": {"filter": filter_clauses}}},
+            {**count_body, "query": {"match_all": {}}},
+        ],
+    )
+    if matching_hits <= EXACT_SEARCH_MAX_DOCS:
+        return True
+
+    post_filter_k = min(max(k, size) * POST_FILTER_K_FACTOR, MAX_K)
 
-    response = client.search(index=index_name, body=query, size=size)
+    return post_filter_k * matching_hits / max(index_hits, 1) < size
 
-    ret_value = response["hits"]["hits"]
-    ret_value = ret_value if ret_value is not None else []
 
-    return ret_value
\ No newline at end of file
+def _count_hits(client, index_name: str, bodies: List[dict]):
+    request = []
+    for body in bodies:
+        request.append({"index": index_name})
+        request.append(body)
+
+    response = client.msearch(body=request)
+
+    ret_value = []
+    for current in response["responses"]:
+        if "error" in current:
+            raise CommonError(f"OpenSearch query failed: {current['error']}")
+
+        ret_value.append(current["hits"]["total"]["value"])
+
+    return ret_value
+
+
+def _set_hybrid_scores(
+    items: List[dict],
+    vector_search_records: List[dict],
+    keyword_search_records: List[dict],
+):
+    # knn and BM25 scores are not on the same scale, each result list is
+    # min-max normalized and the item score is the arithmetic mean (a chunk
+    # missing from one of the lists gets 0 for it).
+    vector_scores = _normalize_scores(vector_search_records)
+    keyword_scores = _normalize_scores(keyword_search_records)
+
+    for item in items:
+        chunk_id = item["chunk_id"]
+        item["score"] = (
+            vector_scores.get(chunk_id, 0.0) + keyword_scores.get(chunk_id, 0.0)
+        ) / 2
+
+
+def _normalize_scores(records: List[dict]):
+    if len(records) == 0:
+        return {}
+
+    scores = [record["score"] for record in records]
+    min_score = min(scores)
+    max_score = max(scores)
+
+    ret_value = {}
+    for record in records:
+        if max_score == min_score:
+            normalized = 1.0
+        else:
+            normalized = (record["score"] - min_score) / (max_score - min_score)
+
+        ret_value[record["chunk_id"]] = max(
+            normalized, ret_value.get(record["chunk_id"], 0.0)
+        )
+
+    return ret_value
+
+
+def _load_lazy_fields(client, index_name: str, items: List[dict]):
+    chunk_ids = list(set([item["chunk_id"] for item in items]))
+    if len(chunk_ids) == 0:
+        return
+
+    query = {
+        "query": {"bool": {"filter": [{"terms": {"chunk_id": chunk_ids}}]}},
+        "_source": {
+            "includes": ["chunk_id", *LAZY_FIELDS],
+            "excludes": EXCLUDED_FIELDS,
+        },
+    }
+
+    response = client.search(index=index_name, body=query, size=len(chunk_ids))
+    hits = response["hits"]["hits"] or []
+
+    lazy_values = dict({})
+    for hit in hits:
+        current = hit["_source"]
+        lazy_values[current.get("chunk_id")] = current
+
+    for item in items:
+        current = lazy_values.get(item["chunk_id"])
+        if current is None:
+            continue
+
+        for field in LAZY_FIELDS:
+            item[field] = current.get(field)
+
+
+def _get_filter_clauses(filters: Optional[SearchFilter]):
+    clauses = []
+
+    if filters is None:
+        return clauses
+
+    if filters.document_ids is not None:
+        clauses.append({"terms": {"document_id": filters.document_ids}})
+
+    if filters.document_types is not None:
+        clauses.append({"terms": {"document_type": filters.document_types}})
+
+    if filters.document_sub_types is not None:
+        clauses.append({"terms": {"document_sub_type": filters.document_sub_types}})
+
+    if filters.path_prefix:
+        clauses.append({"prefix": {"path.keyword": filters.path_prefix}})
+
+    return clauses
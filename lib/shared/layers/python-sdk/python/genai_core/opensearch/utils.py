@@ -0,0 +1,31 @@
+from .profiles import get_workspace_search_profile
+from .vectors import get_workspace_vector_options
+
+STORAGE_LAYOUT_INDEX = "index"
+STORAGE_LAYOUT_SHARED = "shared"
+
+# The shared layout relies on filtering by workspace_id inside the knn
+# search, which only these engines support.
+SHARED_LAYOUT_ENGINES = ["faiss", "lucene"]
+
+
+def is_shared(workspace: dict):
+    return workspace.get("storage_layout", STORAGE_LAYOUT_INDEX) == (
+        STORAGE_LAYOUT_SHARED
+    )
+
+
+def get_index_name(workspace: dict):
+    # Shared workspaces are stored together with the workspaces having the
+    # same vector field definition (the knn mapping is fixed per index).
+    # Other workspaces have an index of their own.
+    if is_shared(workspace):
+        engine, metric, vector_encoding = get_workspace_vector_options(workspace)
+        _, search_params = get_workspace_search_profile(workspace)
+        dimensions = int(workspace["embeddings_model_dimensions"])
+        m = search_params["m"]
+        ef_construction = search_params["ef_construction"]
+
+        return f"workspace_chunks_{dimensions}_{engine}_{metric}_{vector_encoding}_{m}_{ef_construction}"
+
+    return workspace["workspace_id"].replace("-", "")
@@ -0,0 +1,164 @@
+import numpy as np
+from typing import List
+from genai_core.types import CommonError
+
+DEFAULT_ENGINE = "nmslib"
+DEFAULT_METRIC = "l2"
+DEFAULT_VECTOR_ENCODING = "float"
+# Candidates fetched per final hit when rescoring a quantized index
+RESCORE_OVERSAMPLE_FACTOR = 2
+
+METRIC_SPACE_TYPES = {
+    "l2": "l2",
+    "cosine": "cosinesimil",
+    "inner": "innerproduct",
+}
+
+ENGINE_METRICS = {
+    "nmslib": ["l2", "cosine"],
+    "faiss": ["l2", "inner"],
+    "lucene": ["l2", "cosine", "inner"],
+}
+
+ENGINE_VECTOR_ENCODINGS = {
+    "nmslib": ["float"],
+    "faiss": ["float", "fp16"],
+    "lucene": ["float", "byte"],
+}
+
+BYTE_SCALE = 127
+# Byte encoded indexes keep the full precision vectors in this field, only
+# stored in _source, for rescoring. fp16 is an encoding of the index alone,
+# _source keeps the float vectors of content_embeddings.
+RESCORE_VECTOR_FIELD = "content_embeddings_float"
+
+
+def validate_vector_options(engine: str, metric: str, vector_encoding: str):
+    if engine not in ENGINE_METRICS:
+        raise CommonError(f"Invalid engine {engine}")
+
+    if metric not in ENGINE_METRICS[engine]:
+        raise CommonError(f"Metric {metric} is not supported by {engine}")
+
+    if vector_encoding not in ENGINE_VECTOR_ENCODINGS[engine]:
+        raise CommonError(
+            f"Vector encoding {vector_encoding} is not supported by {engine}"
+        )
+
+
+def get_workspace_vector_options(workspace: dict):
+    engine = workspace.get("aoss_engine", DEFAULT_ENGINE)
+    metric = workspace.get("metric", DEFAULT_METRIC)
+    vector_encoding = workspace.get("vector_encoding", DEFAULT_VECTOR_ENCODING)
+
+    return engine, metric, vector_encoding
+
+
+def is_quantized(workspace: dict):
+    _, _, vector_encoding = get_workspace_vector_options(workspace)
+
+    return vector_encoding != "float"
+
+
+def get_vector_mapping(workspace: dict, search_params: dict):
+    engine, metric, vector_encoding = get_workspace_vector_options(workspace)
+    validate_vector_options(engine, metric, vector_encoding)
+
+    method = {
+        "name": "hnsw",
+        "space_type": METRIC_SPACE_TYPES[metric],
+        "engine": engine,
+        "parameters": {
+            "ef_construction": search_params["ef_construction"],
+            "m": search_params["m"],
+        },
+    }
+
+    mapping = {
+        "type": "knn_vector",
+        "dimension": int(workspace["embeddings_model_dimensions"]),
+        "method": method,
+    }
+
+    if vector_encoding == "fp16":
+        method["parameters"]["encoder"] = {
+            "name": "sq",
+            "parameters": {"type": "fp16"},
+        }
+    elif vector_encoding == "byte":
+        mapping["data_type"] = "byte"
+
+    return mapping
+
+
+def get_rescore_vector_field(workspace: dict):
+    _, _, vector_encoding = get_workspace_vector_options(workspace)
+    if vector_encoding == "byte":
+        return RESCORE_VECTOR_FIELD
+
+    return "content_embeddings"
+
+
+def get_rescore_vector_mapping():
+    return {"type": "float", "index": False, "doc_values": False}
+
+
+def prepare_vectors(workspace: dict, vectors: List[List[float]]):
+    """
+    Converts embeddings to the representation stored in the index. Inner
+    product and byte encoded indexes get unit length vectors, so inner
+    product ranks like cosine similarity and the byte range is used evenly.
+    """
+    _, metric, vector_encoding = get_workspace_vector_options(workspace)
+
+    if metric != "inner" and vector_encoding != "byte":
+        return vectors
+
+    ret_value = _normalize(np.array(vectors, dtype=np.float32))
+    if vector_encoding == "byte":
+        ret_value = np.clip(np.rint(ret_value * BYTE_SCALE), -128, 127).astype(int)
+
+    return ret_value.tolist()
+
+
+def prepare_rescore_vectors(workspace: dict, vectors: List[List[float]]):
+    # The unit length float vectors quantized by prepare_vectors
+    if get_rescore_vector_field(workspace) != RESCORE_VECTOR_FIELD:
+        return None
+
+    return _normalize(np.array(vectors, dtype=np.float32)).tolist()
+
+
+def rescore(workspace: dict, query_vector: List[float], stored_vectors: List[list]):
+    """
+    Computes exact scores between the float query vector and the full
+    precision stored vectors (see get_rescore_vector_field), using the score
+    formulas of the OpenSearch knn plugin so rescored hits stay on the same
+    scale.
+    """
+    _, metric, vector_encoding = get_workspace_vector_options(workspace)
+
+    query = np.array(query_vector, dtype=np.float32)
+    stored = np.array(stored_vectors, dtype=np.float32)
+
+    if metric == "inner" or vector_encoding == "byte":
+        query = _normalize(query[np.newaxis, :])[0]
+
+    if metric == "l2":
+        distances = np.sum((stored - query) ** 2, axis=1)
+        scores = 1 / (1 + distances)
+    elif metric == "cosine":
+        norms = np.linalg.norm(stored, axis=1) * np.linalg.norm(query)
+        similarities = (stored @ query) / np.where(norms == 0, 1, norms)
+        scores = (1 + similarities) / 2
+    else:
+        products = stored @ query
+        scores = np.where(products >= 0, products + 1, 1 / (1 - products))
+
+    return scores.tolist()
+
+
+def _normalize(vectors: np.ndarray):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return vectors / np.where(norms == 0, 1, norms)
@@ -0,0 +1,170 @@
+import time
+import genai_core.cross_encoder
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from genai_core.types import CrossEncoderModel, RerankOptions
+
+RERANK_MODE_FULL = "full"
+RERANK_MODE_PARTIAL = "partial"
+RERANK_MODE_NONE = "none"
+
+RERANK_BATCH_SIZE = 8
+RERANK_MAX_WORKERS = 4
+RRF_K = 60
+
+
+def get_rerank_options(rerank: Optional[dict]) -> RerankOptions:
+    # Every engine reranks all the candidates unless the caller sets a
+    # budget or disables it
+    if rerank is None:
+        return RerankOptions()
+
+    if isinstance(rerank, RerankOptions):
+        return rerank
+
+    return RerankOptions(**rerank)
+
+
+def is_rerank_enabled(options: RerankOptions):
+    return options.budget_ms != 0 and options.max_candidates > 0
+
+
+def get_cross_encoder_model(workspace: dict, options: RerankOptions):
+    """
+    Returns the cross encoder of the workspace when reranking is enabled.
+    A model that cannot be resolved leaves the items in their first stage
+    order instead of failing the query.
+    """
+    if not is_rerank_enabled(options):
+        return None
+
+    model = genai_core.cross_encoder.get_cross_encoder_model(
+        workspace["cross_encoder_model_provider"],
+        workspace["cross_encoder_model_name"],
+    )
+    if model is None:
+        print(
+            f"Cross encoder {workspace['cross_encoder_model_name']} not found, "
+            "keeping the first stage order"
+        )
+
+    return model
+
+
+def filter_by_threshold(items: List[dict], threshold: float):
+    """
+    Drops items scoring threshold or less. When items were reranked the
+    threshold applies to their cross encoder score only, the unscored items
+    (left out by the budget) follow unfiltered as first stage scores are on
+    another scale. Without reranking it applies to the first stage score.
+    """
+    if any(item.get("rerank_score") is not None for item in items):
+        return [
+            item
+            for item in items
+            if item["rerank_score"] is None or item["rerank_score"] > threshold
+        ]
+
+    return [item for item in items if item["score"] > threshold]
+
+
+def fuse_ranks(*records_lists: List[dict]):
+    # Reciprocal rank fusion of the first stage result lists, used to order
+    # the candidates before (and beyond) reranking.
+    scores = dict({})
+    for records in records_lists:
+        for rank, record in enumerate(records):
+            chunk_id = record["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+
+    return scores
+
+
+def rerank_items(
+    model: Optional[CrossEncoderModel],
+    query: str,
+    items: List[dict],
+    options: RerankOptions,
+):
+    """
+    Reranks items (ordered by their first stage score) with the cross
+    encoder. At most max_candidates top items are scored, in parallel
+    batches, and batches not done within budget_ms are dropped. Scored items
+    come first ordered by cross encoder score, which replaces their score.
+    The others follow in their first stage order and keep their first stage
+    score. rerank_score holds the cross encoder score, None when not scored.
+    Returns the items and the mode that ran.
+    """
+    for item in items:
+        item["rerank_score"] = None
+
+    candidates = items[: max(options.max_candidates, 0)]
+    if model is None or len(candidates) == 0 or not is_rerank_enabled(options):
+        return items, RERANK_MODE_NONE
+
+    started = time.time()
+    deadline = None
+    if options.budget_ms is not None:
+        deadline = started + options.budget_ms / 1000
+
+    batches = [
+        candidates[idx : idx + RERANK_BATCH_SIZE]
+        for idx in range(0, len(candidates), RERANK_BATCH_SIZE)
+    ]
+
+    scores = dict({})
+    executor = ThreadPoolExecutor(max_workers=RERANK_MAX_WORKERS)
+    try:
+        futures = {
+            executor.submit(_rank_batch, model, query, batch): batch
+            for batch in batches
+        }
+
+        pending = set(futures.keys())
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    batch_scores = future.result()
+                except Exception as error:
+                    print(f"Rerank batch failed: {error}")
+                    continue
+
+                for item, score in zip(futures[future], batch_scores):
+                    scores[item["chunk_id"]] = score
+    finally:
+        # Batches still running are abandoned, not waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    scored = []
+    unscored = []
+    for item in items:
+        chunk_id = item["chunk_id"]
+        if chunk_id in scores:
+            item["score"] = scores[chunk_id]
+            item["rerank_score"] = scores[chunk_id]
+            scored.append(item)
+        else:
+            unscored.append(item)
+
+    scored = sorted(scored, key=lambda x: x["score"], reverse=True)
+
+    mode = RERANK_MODE_FULL
+    if len(scored) == 0:
+        mode = RERANK_MODE_NONE
+    elif len(scored) < len(items):
+        mode = RERANK_MODE_PARTIAL
+
+    return scored + unscored, mode
+
+
+def _rank_batch(model: CrossEncoderModel, query: str, batch: List[dict]):
+    passages = [item["content"] or "" for item in batch]
+
+    return genai_core.cross_encoder.rank_passages(model, query, passages)
@@ -1,14 +1,135 @@
 import genai_core.types
 import genai_core.workspaces
 import genai_core.embeddings
+import genai_core.rerank
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
 from genai_core.aurora import query_workspace_aurora
 from genai_core.opensearch import query_workspace_open_search
 from genai_core.kendra import query_workspace_kendra
 
+FEDERATED_MAX_WORKSPACES = 5
+FEDERATED_SEARCH_TIMEOUT = 10.0
+FEDERATED_SOURCE_OK = "ok"
+FEDERATED_SOURCE_TIMEOUT = "timeout"
+FEDERATED_SOURCE_ERROR = "error"
+
 
 def semantic_search(
-    workspace_id: str, query: str, limit: int = 5, full_response: bool = False
+    workspace_id: str,
+    query: str,
+    limit: int = 5,
+    full_response: bool = False,
+    filters: Optional[dict] = None,
+    search_profile: Optional[str] = None,
+    rerank: Optional[dict] = None,
+):
+    workspace = _get_ready_workspace(workspace_id)
+    search_filter = get_search_filter(filters)
+    rerank_options = genai_core.rerank.get_rerank_options(rerank)
+
+    return _query_workspace(
+        workspace,
+        query,
+        limit,
+        full_response,
+        search_filter=search_filter,
+        search_profile=search_profile,
+        rerank_options=rerank_options,
+    )
+
+
+def federated_search(
+    workspace_ids: List[str],
+    query: str,
+    limit: int = 5,
+    filters: Optional[dict] = None,
+    rerank: Optional[dict] = None,
+    timeout: float = FEDERATED_SEARCH_TIMEOUT,
 ):
+    """
+    Queries several workspaces (of any engine) concurrently and fuses their
+    items with reciprocal rank fusion. Sources failing or not answering
+    within timeout seconds are reported in sources and left out, the items
+    of the other sources are still returned.
+    """
+    workspace_ids = list(dict.fromkeys(workspace_ids))
+    if len(workspace_ids) == 0:
+        raise genai_core.types.CommonError("No workspaces to search")
+
+    if len(workspace_ids) > FEDERATED_MAX_WORKSPACES:
+        raise genai_core.types.CommonError(
+            f"At most {FEDERATED_MAX_WORKSPACES} workspaces can be searched"
+        )
+
+    # Workspaces are loaded up front, only the engine queries run in threads
+    workspaces = [_get_ready_workspace(workspace_id) for workspace_id in workspace_ids]
+    search_filter = get_search_filter(filters)
+    rerank_options = genai_core.rerank.get_rerank_options(rerank)
+
+    sources = []
+    results = []
+    executor = ThreadPoolExecutor(max_workers=len(workspaces))
+    try:
+        futures = {
+            executor.submit(
+                _query_workspace,
+                workspace,
+                query,
+                limit,
+                False,
+                search_filter=search_filter,
+                rerank_options=rerank_options,
+            ): workspace
+            for workspace in workspaces
+        }
+
+        done, not_done = wait(futures.keys(), timeout=timeout)
+        for future, workspace in futures.items():
+            source = {
+                "workspace_id": workspace["workspace_id"],
+                "engine": workspace["engine"],
+                "status": FEDERATED_SOURCE_OK,
+                "items": 0,
+            }
+
+            if future in not_done:
+                source["status"] = FEDERATED_SOURCE_TIMEOUT
+            else:
+                try:
+                    items = future.result().get("items", [])
+                    source["items"] = len(items)
+                    results.append(items)
+                except Exception as error:
+                    print(f"Search failed for {workspace['workspace_id']}: {error}")
+                    source["status"] = FEDERATED_SOURCE_ERROR
+
+            sources.append(source)
+    finally:
+        # Slow sources are not waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    fused_scores = genai_core.rerank.fuse_ranks(*results)
+    items = dict({})
+    for source_items in results:
+        for item in source_items:
+            items.setdefault(item["chunk_id"], item)
+
+    items = sorted(
+        items.values(), key=lambda x: fused_scores[x["chunk_id"]], reverse=True
+    )[:limit]
+    for item in items:
+        item["source_score"] = item["score"]
+        item["score"] = fused_scores[item["chunk_id"]]
+
+    return {
+        "engine": "federated",
+        "items": items,
+        "sources": sources,
+    }
+
+
+def _get_ready_workspace(workspace_id: str):
     workspace = genai_core.workspaces.get_workspace(workspace_id)
 
     if not workspace:
@@ -17,19 +138,90 @@ def semantic_search(
     if workspace["status"] != "ready":
         raise genai_core.types.CommonError("Workspace is not ready")
 
+    return workspace
+
+
+def _query_workspace(
+    workspace: dict,
+    query: str,
+    limit: int,
+    full_response: bool,
+    search_filter: Optional[genai_core.types.SearchFilter] = None,
+    search_profile: Optional[str] = None,
+    rerank_options: Optional[genai_core.types.RerankOptions] = None,
+):
+    workspace_id = workspace["workspace_id"]
+
     if workspace["engine"] == "aurora":
         return query_workspace_aurora(
-            workspace_id, workspace, query, limit, full_response
+            workspace_id,
+            workspace,
+            query,
+            limit,
+            full_response,
+            filters=search_filter,
+            rerank=rerank_options,
         )
     elif workspace["engine"] == "opensearch":
         return query_workspace_open_search(
-            workspace_id, workspace, query, limit, full_response
+            workspace_id,
+            workspace,
+            query,
+            limit,
+            full_response,
+            filters=search_filter,
+            search_profile=search_profile,
+            rerank=rerank_options,
         )
     elif workspace["engine"] == "kendra":
         return query_workspace_kendra(
-            workspace_id, workspace, query, limit, full_response
+            workspace_id,
+            workspace,
+            query,
+            limit,
+            full_response,
+            filters=search_filter,
         )
 
     raise genai_core.types.CommonError(
         "Semantic search is not supported for this workspace"
     )
+
+
+def get_search_filter(
+    filters: Optional[dict],
+) -> Optional[genai_core.types.SearchFilter]:
+    if not filters:
+        return None
+
+    if isinstance(filters, genai_core.types.SearchFilter):
+        search_filter = filters
+    else:
+        search_filter = genai_core.types.SearchFilter(**filters)
+
+    if search_filter.document_ids is not None and len(search_filter.document_ids) == 0:
+        raise genai_core.types.CommonError("Filter document_ids must not be empty")
+
+    if (
+        search_filter.document_types is not None
+        and len(search_filter.document_types) == 0
+    ):
+        raise genai_core.types.CommonError("Filter document_types must not be empty")
+
+    if (
+        search_filter.document_sub_types is not None
+        and len(search_filter.document_sub_types) == 0
+    ):
+        raise genai_core.types.CommonError(
+            "Filter document_sub_types must not be empty"
+        )
+
+    if (
+        search_filter.document_ids is None
+        and search_filter.document_types is None
+        and search_filter.document_sub_types is None
+        and not search_filter.path_prefix
+    ):
+        return None
+
+    return search_filter
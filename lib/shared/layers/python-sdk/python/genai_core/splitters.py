@@ -0,0 +1,196 @@
+import re
+import bisect
+from typing import List
+from genai_core.types import CommonError
+
+# Separators chunks can end after, strongest first
+SEPARATOR_RANKS = {"\n\n": 0, "\n": 1, ". ": 2, " ": 3, "\t": 3}
+SEPARATOR_LEVELS = 4
+# A chunk ends at the strongest boundary that keeps it at least this full
+MIN_CHUNK_FILL = 0.5
+TIKTOKEN_ENCODING = "cl100k_base"
+# Tokens are estimated as words and punctuation, long words counting one
+# token every ESTIMATED_TOKEN_CHARS characters, when tiktoken is missing
+ESTIMATED_TOKEN_CHARS = 4
+
+_boundary_pattern = re.compile(r"\n\n|\n|\. |[ \t]")
+_token_pattern = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+
+class LinearTextSplitter:
+    """
+    Splits text in one pass over its separators, strongest first (blank
+    lines, lines, sentences, words), with chunk_overlap between consecutive
+    chunks. Unlike RecursiveCharacterTextSplitter no text is split again for
+    every separator level, so the work is linear in the text. Sizes are
+    measured in characters, or in tokens with use_tokens. Chunks are stripped
+    substrings of the text.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, use_tokens=False):
+        if chunk_size <= 0 or chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise CommonError("Chunk overlap must be smaller than the chunk size")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.use_tokens = use_tokens
+
+    def split_text(self, text: str) -> List[str]:
+        positions = []
+        ranks = []
+        for match in _boundary_pattern.finditer(text):
+            positions.append(match.end())
+            ranks.append(SEPARATOR_RANKS[match.group()])
+
+        if self.use_tokens:
+            token_starts = get_token_starts(text)
+        else:
+            token_starts = None
+
+        measures = _get_measures(positions, token_starts)
+        text_measure = len(token_starts) if token_starts is not None else len(text)
+
+        chunks = []
+        start = 0
+        start_measure = 0
+        end = 0
+        idx = 0
+        while True:
+            latest = [None] * SEPARATOR_LEVELS
+            while (
+                idx < len(positions)
+                and measures[idx] - start_measure <= self.chunk_size
+            ):
+                latest[ranks[idx]] = idx
+                idx += 1
+
+            if idx == len(positions) and text_measure - start_measure <= (
+                self.chunk_size
+            ):
+                _add_chunk(chunks, text[start:])
+                break
+
+            # A chunk must reach past the end of the previous one, or it
+            # would only repeat the overlap
+            latest = [
+                latest_idx
+                if latest_idx is not None and positions[latest_idx] > end
+                else None
+                for latest_idx in latest
+            ]
+            cut = self._get_cut(latest, measures, start_measure)
+            if cut is not None:
+                cut_position = positions[cut]
+                cut_measure = measures[cut]
+            else:
+                # No separator in reach, the text is cut where the size ends
+                cut_measure = start_measure + self.chunk_size
+                cut_position = _get_position(cut_measure, token_starts)
+
+            _add_chunk(chunks, text[start:cut_position])
+            end = cut_position
+
+            # The next chunk starts at the earliest boundary within the
+            # overlap, or right at the cut
+            next_start = cut_position
+            next_measure = cut_measure
+            if cut is not None:
+                back = cut
+                while (
+                    back > 0
+                    and positions[back - 1] > start
+                    and cut_measure - measures[back - 1] <= self.chunk_overlap
+                ):
+                    back -= 1
+
+                next_start = positions[back]
+                next_measure = measures[back]
+                idx = back + 1
+            else:
+                if self.chunk_overlap > 0:
+                    next_measure = cut_measure - self.chunk_overlap
+                    next_start = _get_position(next_measure, token_starts)
+
+                idx = bisect.bisect_right(positions, next_start)
+
+            start = next_start
+            start_measure = next_measure
+
+        return chunks
+
+    def _get_cut(self, latest: list, measures: List[int], start_measure: int):
+        min_measure = start_measure + self.chunk_size * MIN_CHUNK_FILL
+        for idx in latest:
+            if idx is not None and measures[idx] >= min_measure:
+                return idx
+
+        candidates = [idx for idx in latest if idx is not None]
+        if len(candidates) == 0:
+            return None
+
+        return max(candidates)
+
+
+def get_token_starts(text: str) -> List[int]:
+    """
+    Returns the offset of the first character of every token of the text,
+    using tiktoken when it is installed.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        _, offsets = encoding.decode_with_offsets(tokens)
+
+        return offsets
+
+    starts = []
+    for match in _token_pattern.finditer(text):
+        starts.extend(range(match.start(), match.end(), ESTIMATED_TOKEN_CHARS))
+
+    return starts
+
+
+def _get_encoding():
+    global _encoding
+
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception as error:
+            print(f"Estimating token counts, tiktoken is not available: {error}")
+            _encoding = False
+
+    return _encoding or None
+
+
+def _get_measures(positions: List[int], token_starts):
+    if token_starts is None:
+        return positions
+
+    # Tokens starting before every boundary, boundaries and token starts are
+    # both sorted so one pointer walks them together
+    measures = []
+    token_idx = 0
+    for position in positions:
+        while token_idx < len(token_starts) and token_starts[token_idx] < position:
+            token_idx += 1
+
+        measures.append(token_idx)
+
+    return measures
+
+
+def _get_position(measure: int, token_starts):
+    if token_starts is None:
+        return measure
+
+    return token_starts[measure]
+
+
+def _add_chunk(chunks: List[str], text: str):
+    text = text.strip()
+    if text:
+        chunks.append(text)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -27,6 +27,20 @@ class Workspace(BaseModel):
     engine: str
 
 
+class SearchFilter(BaseModel):
+    # Values inside a field are OR-ed, fields are AND-ed together.
+    document_ids: Optional[List[str]] = None
+    document_types: Optional[List[str]] = None
+    document_sub_types: Optional[List[str]] = None
+    path_prefix: Optional[str] = None
+
+
+class RerankOptions(BaseModel):
+    # None means no time limit, 0 disables reranking.
+    budget_ms: Optional[int] = None
+    max_candidates: int = 50
+
+
 class Provider(Enum):
     BEDROCK = "bedrock"
     OPENAI = "openai"
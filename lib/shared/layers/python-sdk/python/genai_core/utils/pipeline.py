@@ -0,0 +1,91 @@
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List
+
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Callable[[Iterator], Iterable]],
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+):
+    """
+    Runs the source and every stage in its own thread. A stage takes the
+    iterator of the items produced by the previous one and yields its own,
+    consecutive stages are connected by queues of at most queue_size items so
+    a slow stage holds back the ones before it. The last stage runs in the
+    calling thread and its items are returned. The first error raised by any
+    stage stops the pipeline and is raised again.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stop = threading.Event()
+    errors = []
+
+    def produce(items: Iterable, output: queue.Queue):
+        try:
+            for item in items:
+                if not _put(output, item, stop):
+                    return
+
+            _put(output, _DONE, stop)
+        except Exception as error:
+            errors.append(error)
+            stop.set()
+        finally:
+            # Lets generators clean up right away when the pipeline stops
+            if hasattr(items, "close"):
+                items.close()
+
+    threads = [threading.Thread(target=produce, args=(source, queues[0]))]
+    for idx, stage in enumerate(stages[:-1]):
+        items = stage(_consume(queues[idx], stop))
+        threads.append(threading.Thread(target=produce, args=(items, queues[idx + 1])))
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    results = []
+    try:
+        for result in stages[-1](_consume(queues[-1], stop)):
+            results.append(result)
+    except Exception as error:
+        errors.append(error)
+    finally:
+        # Stages still running (only after an error) give up on their queues
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+def _put(output: queue.Queue, item, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=PIPELINE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def _consume(input: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            item = input.get(timeout=PIPELINE_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+
+        if item is _DONE:
+            return
+
+        yield item
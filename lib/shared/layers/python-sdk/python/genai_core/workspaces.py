@@ -3,6 +3,11 @@ import json
 import uuid
 import boto3
 import genai_core.embeddings
+import genai_core.parameters
+import genai_core.kendra.ingestion
+import genai_core.opensearch.profiles
+import genai_core.opensearch.utils
+import genai_core.opensearch.vectors
 from datetime import datetime
 from genai_core.types import Task
 
@@ -89,6 +94,21 @@ def set_status(workspace_id: str, status: str):
     return response
 
 
+def set_tsvector_languages(workspace_id: str, tsvector_languages: list[str]):
+    timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    response = table.update_item(
+        Key={"workspace_id": workspace_id, "object_type": WORKSPACE_OBJECT_TYPE},
+        UpdateExpression="SET tsvector_languages=:tsvectorLanguagesValue, updated_at=:timestampValue",
+        ExpressionAttributeValues={
+            ":tsvectorLanguagesValue": tsvector_languages,
+            ":timestampValue": timestamp,
+        },
+    )
+
+    return response
+
+
 def create_workspace_aurora(
     workspace_name: str,
     embeddings_model_provider: str,
@@ -115,12 +135,17 @@ def create_workspace_aurora(
     # Verify that the embeddings model
     genai_core.embeddings.generate_embeddings(embeddings_model, ["test"], Task.STORE)
 
+    config = genai_core.parameters.get_config()
+    aurora_config = config.get("rag", {}).get("engines", {}).get("aurora", {})
+    storage_layout = aurora_config.get("storageLayout", "table")
+
     item = {
         "workspace_id": workspace_id,
         "object_type": WORKSPACE_OBJECT_TYPE,
         "format_version": 1,
         "name": workspace_name,
         "engine": "aurora",
+        "storage_layout": storage_layout,
         "status": "submitted",
         "embeddings_model_provider": embeddings_model_provider,
         "embeddings_model_name": embeddings_model_name,
@@ -131,6 +156,8 @@ def create_workspace_aurora(
         "metric": metric,
         "has_index": has_index,
         "hybrid_search": hybrid_search,
+        "tsvector_columns": hybrid_search,
+        "versioned_chunks": True,
         "chunking_strategy": chunking_strategy,
         "chunk_size": chunk_size,
         "chunk_overlap": chunk_overlap,
@@ -170,9 +197,31 @@ def create_workspace_open_search(
     chunking_strategy: str,
     chunk_size: int,
     chunk_overlap: int,
+    search_profile: str = genai_core.opensearch.profiles.DEFAULT_SEARCH_PROFILE,
+    aoss_engine: str = genai_core.opensearch.vectors.DEFAULT_ENGINE,
+    metric: str = genai_core.opensearch.vectors.DEFAULT_METRIC,
+    vector_encoding: str = genai_core.opensearch.vectors.DEFAULT_VECTOR_ENCODING,
+    rescore: bool = True,
 ):
     workspace_id = str(uuid.uuid4())
     timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    search_params = genai_core.opensearch.profiles.get_search_profile_params(
+        search_profile
+    )
+    genai_core.opensearch.vectors.validate_vector_options(
+        aoss_engine, metric, vector_encoding
+    )
+
+    config = genai_core.parameters.get_config()
+    opensearch_config = config.get("rag", {}).get("engines", {}).get("opensearch", {})
+    storage_layout = opensearch_config.get("storageLayout", "index")
+    if (
+        storage_layout == genai_core.opensearch.utils.STORAGE_LAYOUT_SHARED
+        and aoss_engine not in genai_core.opensearch.utils.SHARED_LAYOUT_ENGINES
+    ):
+        raise genai_core.types.CommonError(
+            f"Engine {aoss_engine} is not supported by the shared storage layout"
+        )
 
     embeddings_model = genai_core.embeddings.get_embeddings_model(
         embeddings_model_provider, embeddings_model_name
@@ -188,6 +237,7 @@ def create_workspace_open_search(
         "format_version": 1,
         "name": workspace_name,
         "engine": "opensearch",
+        "storage_layout": storage_layout,
         "status": "submitted",
         "embeddings_model_provider": embeddings_model_provider,
         "embeddings_model_name": embeddings_model_name,
@@ -195,8 +245,12 @@ def create_workspace_open_search(
         "cross_encoder_model_provider": cross_encoder_model_provider,
         "cross_encoder_model_name": cross_encoder_model_name,
         "languages": languages,
-        "metric": "l2",
-        "aoss_engine": "nmslib",
+        "metric": metric,
+        "aoss_engine": aoss_engine,
+        "vector_encoding": vector_encoding,
+        "rescore": rescore,
+        "search_profile": search_profile,
+        "search_params": search_params,
         "hybrid_search": hybrid_search,
         "chunking_strategy": chunking_strategy,
         "chunk_size": chunk_size,
@@ -233,6 +287,9 @@ def create_workspace_kendra(
     kendra_index_id = kendra_index["id"]
     kendra_index_external = kendra_index["external"]
     use_all_data = use_all_data if not kendra_index_external else True
+    kendra_ingestion = genai_core.kendra.ingestion.INGESTION_DATA_SOURCE
+    if not kendra_index_external:
+        kendra_ingestion = genai_core.kendra.ingestion.get_kendra_ingestion_mode()
 
     item = {
         "workspace_id": workspace_id,
@@ -244,6 +301,7 @@ def create_workspace_kendra(
         "kendra_index_id": kendra_index_id,
         "kendra_index_external": kendra_index_external,
         "kendra_use_all_data": use_all_data,
+        "kendra_ingestion": kendra_ingestion,
         "documents": 0,
         "vectors": 0,
         "size_in_bytes": 0,
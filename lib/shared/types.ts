@@ -107,9 +107,11 @@ export interface SystemConfig {
     engines: {
       aurora: {
         enabled: boolean;
+        storageLayout?: "table" | "partitioned";
       };
       opensearch: {
         enabled: boolean;
+        storageLayout?: "index" | "shared";
       };
       kendra: {
         enabled: boolean;
@@ -121,6 +123,7 @@ export interface SystemConfig {
           roleArn?: string;
         }[];
         enterprise?: boolean;
+        ingestion?: "dataSource" | "direct";
       };
     };
     embeddingsModels: {
@@ -134,6 +137,8 @@ export interface SystemConfig {
       name: string;
       default?: boolean;
     }[];
+    // Plain text documents up to this size skip the file import workflow
+    inlineImportMaxBytes?: number;
   };
 }
 
@@ -0,0 +1,138 @@
+"""
+Compares the chunking strategies of genai_core on the same text: chunks per
+second and the distribution of chunk sizes, in characters and in tokens.
+
+Usage:
+    python scripts/benchmark_splitters.py [--file document.txt] [--size 5000000]
+        [--chunk-size 1000] [--chunk-overlap 200] [--runs 3]
+
+Without --file a synthetic document of --size characters is generated.
+Requires langchain (and optionally tiktoken) to be installed.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "lib",
+        "shared",
+        "layers",
+        "python-sdk",
+        "python",
+    )
+)
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from genai_core.splitters import LinearTextSplitter, get_token_starts
+
+WORDS = [
+    "the",
+    "embedding",
+    "workspace",
+    "of",
+    "retrieval",
+    "a",
+    "document",
+    "is",
+    "chunk",
+    "and",
+    "vector",
+    "to",
+    "internationalization",
+    "search",
+    "model",
+]
+
+
+def generate_text(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+            sentences.append(" ".join(words).capitalize() + ".")
+
+        paragraph = " ".join(sentences)
+        if rng.random() < 0.3:
+            paragraph = paragraph.replace(". ", ".\n")
+
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+
+    return "\n\n".join(paragraphs)[:size]
+
+
+def get_splitters(chunk_size: int, chunk_overlap: int):
+    return {
+        "recursive": RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
+        ),
+        "linear": LinearTextSplitter(chunk_size, chunk_overlap),
+        "linear_tokens": LinearTextSplitter(chunk_size, chunk_overlap, use_tokens=True),
+    }
+
+
+def describe(values):
+    values = sorted(values)
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    return (
+        f"min {values[0]:>6} p10 {percentile(10):>6} p50 {percentile(50):>6} "
+        f"p90 {percentile(90):>6} max {values[-1]:>6} "
+        f"mean {statistics.mean(values):>8.1f} stdev {statistics.pstdev(values):>7.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file")
+    parser.add_argument("--size", type=int, default=5_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            text = file.read()
+    else:
+        text = generate_text(args.size)
+
+    print(
+        f"Text: {len(text)} characters, chunk size {args.chunk_size}, "
+        f"overlap {args.chunk_overlap}, best of {args.runs} runs"
+    )
+
+    for name, splitter in get_splitters(args.chunk_size, args.chunk_overlap).items():
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            chunks = splitter.split_text(text)
+            timings.append(time.perf_counter() - started)
+
+        elapsed = min(timings)
+        print()
+        print(
+            f"{name}: {len(chunks)} chunks in {elapsed:.3f}s, "
+            f"{len(chunks) / elapsed:,.0f} chunks/s, "
+            f"{len(text) / elapsed / 1_000_000:.1f}M chars/s"
+        )
+        print(f"  characters  {describe([len(chunk) for chunk in chunks])}")
+        print(
+            f"  tokens      "
+            f"{describe([len(get_token_starts(chunk)) for chunk in chunks])}"
+        )
+
+
+if __name__ == "__main__":
+    main()